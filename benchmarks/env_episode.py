@@ -0,0 +1,55 @@
+"""
+SchedulerEnv の1エピソードあたりの所要時間を計測するベンチマーク
+
+修正前の step（毎ステップ全体評価とスケジュールのコピー）を再現した LegacyStepEnv と比較する。
+
+    python -m benchmarks.env_episode --episodes 200
+"""
+
+import argparse
+import time
+
+from extra import evalShift
+from scheduling_env_v2 import SchedulerEnv
+
+
+class LegacyStepEnv(SchedulerEnv):
+    # 修正前の step と同じく、途中のステップでも全体評価とスケジュールのコピーを行う（比較用）
+    def step(self, action):
+        obs, reward, done, truncated, info = super().step(action)
+        if not done:
+            reward = -evalShift(self.schedule)
+            info = {"schedule": self.schedule.tolist()}
+        return obs, reward, done, truncated, info
+
+
+def run_episodes(env: SchedulerEnv, n_episodes: int) -> float:
+    """
+    マスク上で選択可能な最初の行動を選び続けてエピソードを回し、1エピソードあたりの秒数を返します
+    """
+    start = time.perf_counter()
+    for _ in range(n_episodes):
+        obs, _ = env.reset()
+        done = False
+        while not done:
+            action = int(obs["action_mask"].argmax())
+            obs, reward, terminated, truncated, info = env.step(action)
+            done = terminated or truncated
+    return (time.perf_counter() - start) / n_episodes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--episodes", type=int, default=200)
+    args = parser.parse_args()
+
+    current = run_episodes(SchedulerEnv(), args.episodes)
+    legacy = run_episodes(LegacyStepEnv(), max(1, args.episodes // 10))
+    print(f"steps/episode : {SchedulerEnv().total_steps}")
+    print(f"current       : {current * 1e3:.3f} ms/episode")
+    print(f"legacy        : {legacy * 1e3:.3f} ms/episode")
+    print(f"speedup       : {legacy / current:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
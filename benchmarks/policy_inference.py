@@ -0,0 +1,89 @@
+"""
+学習済みの方策で1つのシフト表を作るまでの所要時間を計測するベンチマーク
+
+SB3 のモデルで SchedulerEnv を1ステップずつ model.predict で進める場合と、
+policy_export で書き出した方策を policy_runner.PolicyRunner で実行する場合（TorchScript / ONNX）を比べる。
+PolicyRunner はマスクをかけずに実行し、model.predict(deterministic=True) と同じシフト表になることも確かめる。
+
+    python -m benchmarks.policy_inference --model-path logs/best_model.zip --episodes 20
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from consts import load_problem_instance
+from eval_scheduler import ENV_CLASSES, load_model
+from policy_export import export_policy
+from policy_runner import PolicyRunner
+
+
+def predict_schedule(model, env) -> np.ndarray:
+    # model.predict で1エピソードを実行したシフト表
+    obs, _ = env.reset()
+    done = False
+    while not done:
+        action, _ = model.predict(obs, deterministic=True)
+        obs, reward, terminated, truncated, info = env.step(action)
+        done = terminated or truncated
+    return np.asarray(info["schedule"], dtype=np.uint8)
+
+
+def time_per_call(fn, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-path", default="logs/best_model.zip")
+    parser.add_argument("--algo", choices=["a2c", "ppo"], default=None)
+    parser.add_argument("--instance", default=None)
+    parser.add_argument("--action-mode", choices=list(ENV_CLASSES), default="cell")
+    parser.add_argument("--rich-obs", action="store_true")
+    parser.add_argument("--episodes", type=int, default=20)
+    args = parser.parse_args()
+
+    instance = None if args.instance is None else load_problem_instance(args.instance)
+    model = load_model(args.model_path, args.algo)
+    env_class = ENV_CLASSES[args.action_mode]
+    env = env_class(instance, rich_observation=True) if args.rich_obs else env_class(instance)
+    expected = predict_schedule(model, env)
+    rows = [("model.predict", time_per_call(lambda: predict_schedule(model, env), args.episodes), None, True)]
+
+    formats = ["torchscript"]
+    try:
+        import onnx  # noqa: F401
+        import onnxruntime  # noqa: F401
+
+        formats.append("onnx")
+    except ImportError:
+        print("onnx / onnxruntime がないので ONNX は計測しません")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in formats:
+            path = os.path.join(tmp, f"policy.{fmt}")
+            export_policy(model, path, fmt, args.action_mode, args.rich_obs)
+            start = time.perf_counter()
+            runner = PolicyRunner(path, instance)
+            schedule = runner.rollout(masked=False)[0]
+            first = time.perf_counter() - start
+            same = bool(np.array_equal(schedule, expected))
+            rows.append((f"{fmt}", time_per_call(lambda: runner.rollout(masked=False), args.episodes), first, same))
+            rows.append((f"{fmt} (masked)", time_per_call(lambda: runner.rollout(), args.episodes), None, None))
+
+    base = rows[0][1]
+    print(f"{'':22s} {'ms/schedule':>12s} {'speedup':>8s} {'load+first ms':>14s}  same as predict")
+    for name, seconds, first, same in rows:
+        first_text = "" if first is None else f"{first * 1e3:.1f}"
+        same_text = "" if same is None else str(same)
+        print(f"{name:22s} {seconds * 1e3:12.3f} {base / seconds:7.1f}x {first_text:>14s}  {same_text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+scheduler_service をこのプロセス内で起動し、同時に送ったリクエストのレイテンシ・スループットを計測するベンチマーク
+
+max_batch_size を変えて、リクエストをまとめる効果を比べる。
+
+    python -m benchmarks.service_load --requests 500 --concurrency 64 --batch-sizes 1 8 32
+    python -m benchmarks.service_load --policy logs/policy.pt
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from scheduler_service import SchedulerService, request, serve
+
+
+async def run_load(service: SchedulerService, n_requests: int, concurrency: int, payload: dict) -> dict:
+    # 空いているポートで起動し、concurrency 個ずつ同時にリクエストを送る
+    server = await serve(service, port=0)
+    port = server.sockets[0].getsockname()[1]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            status, _ = await request("127.0.0.1", port, "POST", "/schedule", payload)
+            return status
+
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*(one() for _ in range(n_requests)))
+    elapsed = time.perf_counter() - start
+    _, metrics = await request("127.0.0.1", port, "GET", "/metrics")
+    server.close()
+    await server.wait_closed()
+    await service.stop()
+    return {"elapsed": elapsed, "ok": sum(s == 200 for s in statuses), **metrics}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--policy", default=None)
+    parser.add_argument("--instance", default="instances/default.json")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--n-samples", type=int, default=4)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with open(args.instance, encoding="utf-8") as f:
+        spec = json.load(f)
+    payload = {"instance": spec, "n_samples": args.n_samples, "deterministic": False}
+
+    print(f"{'max_batch':>9s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'mean batch':>10s} {'ok':>5s}")
+    for batch_size in args.batch_sizes:
+        service = SchedulerService(args.policy, max_batch_size=batch_size, max_wait_ms=args.max_wait_ms, seed=0)
+        result = asyncio.run(run_load(service, args.requests, args.concurrency, payload))
+        latency = result["latency_ms"]
+        print(
+            f"{batch_size:9d} {args.requests / result['elapsed']:8.1f} {latency['p50']:8.2f} {latency['p95']:8.2f} "
+            f"{result['mean_batch_size']:10.2f} {result['ok']:5d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+評価・環境・個体生成の性能をインスタンスの規模ごとに計測するベンチマーク
+
+計測項目:
+    eval_shift        evalShift の1回あたりの秒数（中央値、キャッシュにない個体）
+    get_penalties     get_penalties の1回あたりの秒数（中央値）
+    env_step          SchedulerEnv.step の1秒あたりの回数
+    env_reset         SchedulerEnv.reset の1秒あたりの回数
+    dummy_vec_env     DummyVecEnv で回したときの1秒あたりのエピソード数
+    generate_individual  Variables.generate_individual の1秒あたりの個体数
+    generate_population  generate_population で 1000 個ずつ作ったときの1秒あたりの個体数
+
+インスタンスは既定インスタンスを広げたもの（--instances scaled）か、
+consts.instance_generator の人工インスタンス（--instances synthetic）を使う。
+結果は JSON に書き出し、--compare で以前の結果と比べて悪化した項目を検出できる。
+
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --sizes 9x14 100x90 --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from stable_baselines3.common.vec_env import DummyVecEnv
+
+from consts import ProblemInstance
+from consts.instance_generator import generate_instance
+from consts.instance_loader import compile_spec, read_spec
+from extra import evalShift, generate_population, get_penalties, get_penalty_cache, get_penalty_engine
+from scheduling_env_v2 import SchedulerEnv
+from variables import Variables
+
+# (社員数, 日数)。先頭が consts の既定インスタンスと同じ規模
+DEFAULT_SIZES = [(9, 14), (50, 28), (100, 90), (300, 180), (500, 365)]
+
+BENCHMARKS = ["eval_shift", "get_penalties", "env_step", "env_reset", "dummy_vec_env", "generate_individual", "generate_population"]
+
+# 値が小さいほど良い項目（それ以外は大きいほど良い）
+LOWER_IS_BETTER = {"eval_shift", "get_penalties"}
+
+DEFAULT_SPEC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instances", "default.json")
+
+
+def make_instance(n_employees: int, n_days: int) -> ProblemInstance:
+    """
+    既定インスタンスの仕様を社員数・日数だけ広げたインスタンスを作成します
+    必要人数は社員数に比例させる
+    """
+    spec = read_spec(DEFAULT_SPEC)
+    base_employees = spec["employees"]
+    scale = max(1, round(n_employees / len(base_employees)))
+    spec["horizon"]["n_days"] = n_days
+    spec["employees"] = [dict(base_employees[i % len(base_employees)], id=f"e{i}", label=f"E{i}") for i in range(n_employees)]
+    for shift in spec["shifts"]:
+        shift["min_worker"] *= scale
+        shift["max_worker"] *= scale
+    return compile_spec(spec)
+
+
+def make_synthetic_instance(n_employees: int, n_days: int) -> ProblemInstance:
+    # サイクルの開始日・スキル・NGシフト・希望休がばらついた人工インスタンス（seed 固定）
+    return generate_instance(n_employees, n_days, n_work_days_choices=(4, 5), seed=0)
+
+
+INSTANCE_FACTORIES = {"scaled": make_instance, "synthetic": make_synthetic_instance}
+
+
+def measure(fn, min_time: float, min_repeats: int = 3) -> list[float]:
+    """
+    min_time 秒以上かつ min_repeats 回以上 fn を呼び、1回ごとの秒数を返します
+    """
+    times = []
+    start = time.perf_counter()
+    while len(times) < min_repeats or time.perf_counter() - start < min_time:
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return times
+
+
+def measure_uncached(fn, engine, min_time: float) -> list[float]:
+    # 同じ個体を繰り返し評価するので、評価そのものの時間を測るためにキャッシュを止めておく
+    cache = get_penalty_cache(engine)
+    maxsize = cache.maxsize
+    cache.resize(0)
+    try:
+        return measure(fn, min_time)
+    finally:
+        cache.resize(maxsize)
+
+
+def bench_eval_shift(instance: ProblemInstance, min_time: float) -> tuple[float, str, int]:
+    engine = get_penalty_engine(instance)
+    individual = Variables.generate_individual(instance)
+    times = measure_uncached(lambda: evalShift(individual, engine=engine), engine, min_time)
+    return statistics.median(times), "s/call", len(times)
+
+
+def bench_get_penalties(instance: ProblemInstance, min_time: float) -> tuple[float, str, int]:
+    engine = get_penalty_engine(instance)
+    individual = Variables.generate_individual(instance)
+    times = measure_uncached(lambda: get_penalties(individual, engine=engine), engine, min_time)
+    return statistics.median(times), "s/call", len(times)
+
+
+def bench_env_step(instance: ProblemInstance, min_time: float) -> tuple[float, str, int]:
+    env = SchedulerEnv(instance)
+    # マスク上で選択可能な最初の行動を選び続ける
+    actions = env.action_mask_table.argmax(axis=1).tolist()
+
+    def episode():
+        env.reset()
+        t = time.perf_counter()
+        for step in range(env.total_steps):
+            env.step(actions[step])
+        return time.perf_counter() - t
+
+    n_steps, elapsed = 0, 0.0
+    while n_steps < 3 * env.total_steps or elapsed < min_time:
+        elapsed += episode()
+        n_steps += env.total_steps
+    return n_steps / elapsed, "steps/s", n_steps
+
+
+def bench_env_reset(instance: ProblemInstance, min_time: float) -> tuple[float, str, int]:
+    env = SchedulerEnv(instance)
+    times = measure(env.reset, min_time, min_repeats=100)
+    return len(times) / sum(times), "resets/s", len(times)
+
+
+def bench_dummy_vec_env(instance: ProblemInstance, min_time: float, n_envs: int = 2) -> tuple[float, str, int]:
+    env = DummyVecEnv([lambda: SchedulerEnv(instance) for _ in range(n_envs)])
+    # すべての環境は同時にエピソードを終えるので、行動はステップ番号から決められる
+    actions = np.repeat(env.envs[0].action_mask_table.argmax(axis=1)[:, None], n_envs, axis=1)
+    total_steps = env.envs[0].total_steps
+
+    def episode():
+        env.reset()
+        for step in range(total_steps):
+            env.step(actions[step])
+
+    times = measure(episode, min_time, min_repeats=1)
+    env.close()
+    return n_envs * len(times) / sum(times), "episodes/s", n_envs * len(times)
+
+
+def bench_generate_individual(instance: ProblemInstance, min_time: float) -> tuple[float, str, int]:
+    random.seed(0)
+    times = measure(lambda: Variables.generate_individual(instance), min_time)
+    return len(times) / sum(times), "individuals/s", len(times)
+
+
+def bench_generate_population(instance: ProblemInstance, min_time: float, batch_size: int = 1000) -> tuple[float, str, int]:
+    rng = np.random.default_rng(0)
+    times = measure(lambda: generate_population(batch_size, instance, rng=rng, dtype=np.uint8), min_time)
+    return batch_size * len(times) / sum(times), "individuals/s", batch_size * len(times)
+
+
+BENCH_FUNCS = {
+    "eval_shift": bench_eval_shift,
+    "get_penalties": bench_get_penalties,
+    "env_step": bench_env_step,
+    "env_reset": bench_env_reset,
+    "dummy_vec_env": bench_dummy_vec_env,
+    "generate_individual": bench_generate_individual,
+    "generate_population": bench_generate_population,
+}
+
+
+def run_suite(sizes: list[tuple[int, int]], benchmarks: list[str], min_time: float, instances: str = "scaled", verbose: bool = True) -> list[dict]:
+    """
+    各規模のインスタンスについてベンチマークを実行し、結果のリストを返します
+    """
+    results = []
+    for n_employees, n_days in sizes:
+        instance = INSTANCE_FACTORIES[instances](n_employees, n_days)
+        for name in benchmarks:
+            value, unit, n = BENCH_FUNCS[name](instance, min_time)
+            result = {"benchmark": name, "size": f"{n_employees}x{n_days}", "instances": instances, "n_employees": n_employees, "n_days": n_days, "value": value, "unit": unit, "n": n}
+            results.append(result)
+            if verbose:
+                print(f"{result['size']:>8} {name:<20} {value:>14.6g} {unit}", flush=True)
+    return results
+
+
+def environment_info() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """
+    baseline と比べて tolerance（割合）を超えて悪化した項目の説明を返します
+    """
+    baseline_values = {(r["benchmark"], r["size"], r.get("instances", "scaled")): r["value"] for r in baseline}
+    regressions = []
+    for r in results:
+        key = (r["benchmark"], r["size"], r["instances"])
+        if key not in baseline_values:
+            continue
+        old, new = baseline_values[key], r["value"]
+        # 悪化の割合（正なら悪化）
+        change = (new - old) / old if r["benchmark"] in LOWER_IS_BETTER else (old - new) / old
+        status = "REGRESSION" if change > tolerance else "ok"
+        print(f"{r['size']:>8} {r['benchmark']:<20} {old:>12.6g} -> {new:<12.6g} {r['unit']:<14} {status}")
+        if change > tolerance:
+            regressions.append(f"{r['benchmark']} {r['size']}: {old:.6g} -> {new:.6g} {r['unit']}")
+    return regressions
+
+
+def parse_size(value: str) -> tuple[int, int]:
+    n_employees, n_days = value.lower().split("x")
+    return int(n_employees), int(n_days)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=DEFAULT_SIZES, help="社員数x日数（例: 9x14 500x365）")
+    parser.add_argument("--benchmarks", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--instances", choices=list(INSTANCE_FACTORIES), default="scaled", help="scaled: 既定インスタンスを広げたもの / synthetic: 人工インスタンス")
+    parser.add_argument("--min-time", type=float, default=1.0, help="各項目の最低計測時間（秒）")
+    parser.add_argument("--output", default="bench_results.json", help="結果を書き出す JSON")
+    parser.add_argument("--compare", default=None, help="比較する以前の結果の JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="この割合を超えて悪化したら失敗とする")
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes, args.benchmarks, args.min_time, instances=args.instances)
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment_info(), "min_time": args.min_time, "results": results}, f, indent=2)
+    print(f"結果を {args.output} に保存しました。")
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("悪化した項目:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,3 +4,5 @@ from .employee import Employee
 from .shift import Shift
 from .skill import Skill
 from .work_cycle import WorkCycle
+from .problem_instance import ProblemInstance, get_problem_instance
+from .instance_loader import load_problem_instance
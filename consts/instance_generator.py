@@ -0,0 +1,183 @@
+"""
+規模や制約の強さを指定して、人工的な問題インスタンスを作成するモジュール
+
+作成するのは instance_loader と同じ形式の仕様（辞書）で、compile_spec で ProblemInstance になる。
+同じ引数・同じ seed なら常に同じインスタンスになる。
+
+    python -m consts.instance_generator --employees 300 --days 90 --seed 0 --output instances/synth-300x90.json
+"""
+
+import argparse
+import json
+from datetime import date, timedelta
+
+import numpy as np
+
+from .instance_loader import compile_spec
+from .problem_instance import ProblemInstance
+
+# 休みの後に並べるシフトの id とラベル（足りない分は W<番号> とする）
+WORK_SHIFT_IDS = ["D", "N", "S"]
+WORK_SHIFT_LABELS = {"D": "日", "N": "夜", "S": "時"}
+
+
+def generate_spec(
+    n_employees: int,
+    n_days: int,
+    n_shifts: int = 4,
+    n_skills: int = 2,
+    skill_prob: float = 0.8,
+    n_work_days_choices: tuple[int, ...] = (5,),
+    n_rest_days: int = 2,
+    stagger_cycles: bool = True,
+    forbidden_shift_prob: float = 0.05,
+    holiday_rate: float = 0.03,
+    forbidden_transition_prob: float = 0.3,
+    coverage_tightness: float = 0.5,
+    start: str = "2024-04-01",
+    seed: int = 0,
+) -> dict:
+    """
+    人工的な問題インスタンスの仕様を作成します
+
+    Args:
+        n_employees (int): 社員数
+        n_days (int): 日数
+        n_shifts (int): 休みを含むシフトの種類数（2以上）
+        n_skills (int): スキルの種類数。先頭以外の勤務シフトは、いずれかのスキルがないと入れない
+        skill_prob (float): 各社員が各スキルを持つ確率
+        n_work_days_choices (tuple[int, ...]): サイクル内の労働日数の候補（社員ごとに一様に選ぶ）
+        n_rest_days (int): サイクル内の休日数
+        stagger_cycles (bool): True なら社員ごとにサイクルの開始日をずらす
+        forbidden_shift_prob (float): 各社員・各勤務シフトが個別のNGシフトになる確率
+        holiday_rate (float): 各社員・各日が希望休になる確率
+        forbidden_transition_prob (float): 勤務シフトの各組 (前サイクル, 今サイクル) が遷移NGになる確率
+        coverage_tightness (float): 0 より大きく 1 以下。1 に近いほど最小・最大人数の幅が狭い
+        start (str): 初日（ISO 形式）
+        seed (int): 乱数のシード
+
+    Returns:
+        dict: instance_loader の仕様（JSON にそのまま書き出せる）
+    """
+    if n_shifts < 2:
+        raise ValueError(f"Invalid n_shifts: {n_shifts}. n_shifts must be >= 2")
+    if not 0 < coverage_tightness <= 1:
+        raise ValueError(f"Invalid coverage_tightness: {coverage_tightness}. Valid range is (0, 1]")
+
+    rng = np.random.default_rng(seed)
+    start_date = date.fromisoformat(start)
+    n_work_shifts = n_shifts - 1
+    work_ids = [WORK_SHIFT_IDS[i] if i < len(WORK_SHIFT_IDS) else f"W{i}" for i in range(n_work_shifts)]
+
+    # 先頭の勤務シフトはスキル不要、それ以外は順にいずれかのスキルを要求する
+    skill_names = [chr(ord("a") + k) if k < 26 else f"k{k}" for k in range(n_skills)]
+    skills = {name: [] for name in skill_names}
+    if n_skills > 0:
+        for i, shift_id in enumerate(work_ids[1:]):
+            skills[skill_names[i % n_skills]].append(shift_id)
+
+    # 遷移NG。先頭の勤務シフトへはどこからでも遷移できるようにして、行き詰まりを防ぐ
+    forbidden_transitions = [
+        [previous, current]
+        for previous in work_ids
+        for current in work_ids[1:]
+        if rng.random() < forbidden_transition_prob
+    ]
+
+    employees = []
+    n_work_days_list = []
+    for e in range(n_employees):
+        n_work_days = int(rng.choice(n_work_days_choices))
+        n_cycle_days = n_work_days + n_rest_days
+        offset = int(rng.integers(n_cycle_days)) if stagger_cycles else 0
+        emp_skills = [name for name in skill_names if rng.random() < skill_prob]
+        # 先頭の勤務シフトは必ず入れるようにしておく
+        forbidden_shifts = [shift_id for shift_id in work_ids[1:] if rng.random() < forbidden_shift_prob]
+        holidays = [(start_date + timedelta(days=int(d))).isoformat() for d in np.flatnonzero(rng.random(n_days) < holiday_rate)]
+        employees.append(
+            {
+                "id": f"e{e}",
+                "label": f"E{e}",
+                "skills": emp_skills,
+                "n_work_days": n_work_days,
+                "n_rest_days": n_rest_days,
+                "cycle_start": (start_date - timedelta(days=offset)).isoformat(),
+                "forbidden_shifts": forbidden_shifts,
+                "holidays": holidays,
+            }
+        )
+        n_work_days_list.append(n_work_days)
+
+    # 必要人数は、1日あたりの平均の勤務・休み人数を中心に coverage_tightness で幅を決める
+    work_ratio = float(np.mean([w / (w + n_rest_days) for w in n_work_days_list])) if n_employees else 0.0
+    expected = [n_employees * (1 - work_ratio)] + [n_employees * work_ratio / n_work_shifts] * n_work_shifts
+    shifts = []
+    for shift_id, mean in zip(["O"] + work_ids, expected):
+        shifts.append(
+            {
+                "id": shift_id,
+                "label": "休" if shift_id == "O" else WORK_SHIFT_LABELS.get(shift_id, shift_id),
+                "min_worker": int(np.floor(mean * coverage_tightness)),
+                "max_worker": min(n_employees, int(np.ceil(mean / coverage_tightness))),
+            }
+        )
+
+    return {
+        "horizon": {"start": start_date.isoformat(), "n_days": n_days},
+        "shifts": shifts,
+        "rest_shift": "O",
+        "forbidden_transitions": forbidden_transitions,
+        "skills": skills,
+        "employees": employees,
+    }
+
+
+def generate_instance(n_employees: int, n_days: int, **kwargs) -> ProblemInstance:
+    """
+    generate_spec の仕様から問題インスタンスを作成します（引数は generate_spec と同じ）
+    """
+    return compile_spec(generate_spec(n_employees, n_days, **kwargs))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, required=True)
+    parser.add_argument("--days", type=int, required=True)
+    parser.add_argument("--shifts", type=int, default=4)
+    parser.add_argument("--skills", type=int, default=2)
+    parser.add_argument("--skill-prob", type=float, default=0.8)
+    parser.add_argument("--n-work-days", type=int, nargs="+", default=[5])
+    parser.add_argument("--n-rest-days", type=int, default=2)
+    parser.add_argument("--no-stagger", action="store_true", help="全員のサイクルの開始日を揃える")
+    parser.add_argument("--forbidden-shift-prob", type=float, default=0.05)
+    parser.add_argument("--holiday-rate", type=float, default=0.03)
+    parser.add_argument("--forbidden-transition-prob", type=float, default=0.3)
+    parser.add_argument("--coverage-tightness", type=float, default=0.5)
+    parser.add_argument("--start", default="2024-04-01")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="仕様を書き出す JSON")
+    args = parser.parse_args()
+
+    spec = generate_spec(
+        args.employees,
+        args.days,
+        n_shifts=args.shifts,
+        n_skills=args.skills,
+        skill_prob=args.skill_prob,
+        n_work_days_choices=tuple(args.n_work_days),
+        n_rest_days=args.n_rest_days,
+        stagger_cycles=not args.no_stagger,
+        forbidden_shift_prob=args.forbidden_shift_prob,
+        holiday_rate=args.holiday_rate,
+        forbidden_transition_prob=args.forbidden_transition_prob,
+        coverage_tightness=args.coverage_tightness,
+        start=args.start,
+        seed=args.seed,
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(spec, f, ensure_ascii=False, indent=1)
+    print(f"{args.employees} 人 x {args.days} 日のインスタンスを {args.output} に保存しました。")
+
+
+if __name__ == "__main__":
+    main()
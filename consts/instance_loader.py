@@ -0,0 +1,237 @@
+"""
+ファイル（JSON / YAML、社員一覧は CSV も可）から問題インスタンスを読み込むモジュール
+
+読み込んだインスタンスは内容のハッシュをキーにした .npz に保存しておき、
+次回以降やワーカープロセスではその .npz を読むだけで済ませる。
+
+仕様ファイルの例（JSON）::
+
+    {
+        "horizon": {"start": "2024-04-01", "n_days": 14},
+        "shifts": [
+            {"id": "O", "label": "休", "min_worker": 1, "max_worker": 2},
+            {"id": "D", "label": "日", "min_worker": 1, "max_worker": 2}
+        ],
+        "rest_shift": "O",
+        "forbidden_transitions": [["N", "N"]],
+        "skills": {"a": ["S"], "b": ["N"]},
+        "employees": [
+            {"id": "a", "label": "A", "skills": ["a", "b"], "n_work_days": 5, "cycle_start": "2024-04-01",
+             "forbidden_shifts": [], "holidays": ["2024-04-03"]}
+        ]
+    }
+
+"employees" には CSV ファイルのパス（仕様ファイルからの相対パス）も指定できる。
+CSV の列は id, label, skills, n_work_days, n_rest_days, cycle_start, forbidden_shifts, holidays で、
+リストの列は ";" 区切りで書く。skills 以外の列は省略可。
+"""
+
+import csv
+import hashlib
+import json
+import os
+from datetime import date, timedelta
+
+import numpy as np
+
+from .day import Day
+from .employee import Employee
+from .problem_instance import ProblemInstance
+from .shift import Shift
+
+# 仕様の解釈やキャッシュの形式を変えたら上げる（古いキャッシュを使わないようにする）
+CACHE_VERSION = 1
+
+
+def load_problem_instance(path: str, cache_dir: str | None = None, use_cache: bool = True) -> ProblemInstance:
+    """
+    仕様ファイルから問題インスタンスを読み込みます
+
+    Args:
+        path (str): 仕様ファイル（.json / .yaml / .yml）のパス
+        cache_dir (str | None): .npz キャッシュの保存先。None なら仕様ファイルと同じ場所の .instance_cache
+        use_cache (bool): False ならキャッシュを読まず、書きもしない
+
+    Returns:
+        ProblemInstance: 問題インスタンス
+    """
+    spec = read_spec(path)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    if not use_cache:
+        return compile_spec(spec, base_dir=base_dir)
+
+    if cache_dir is None:
+        cache_dir = os.path.join(base_dir, ".instance_cache")
+    stem = os.path.splitext(os.path.basename(path))[0]
+    cache_path = os.path.join(cache_dir, f"{stem}-{spec_hash(path, spec)[:16]}.npz")
+    if os.path.exists(cache_path):
+        return ProblemInstance.load_npz(cache_path)
+
+    instance = compile_spec(spec, base_dir=base_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    # 複数のワーカーが同時に書いても壊れないよう、一時ファイルに書いてから置き換える
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+    instance.save_npz(tmp_path)
+    os.replace(tmp_path, cache_path)
+    return instance
+
+
+def read_spec(path: str) -> dict:
+    """
+    仕様ファイル（JSON / YAML）を読み込みます
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, encoding="utf-8") as f:
+        if ext == ".json":
+            return json.load(f)
+        if ext in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("YAML の仕様ファイルを読むには PyYAML が必要です（pip install pyyaml）")
+            return yaml.safe_load(f)
+    raise ValueError(f"Invalid spec file: {path}. Valid extensions are .json, .yaml, .yml")
+
+
+def spec_hash(path: str, spec: dict) -> str:
+    """
+    仕様ファイルと、そこから参照している CSV の内容から SHA-256 を計算します
+    """
+    h = hashlib.sha256(f"v{CACHE_VERSION}".encode())
+    with open(path, "rb") as f:
+        h.update(f.read())
+    if isinstance(spec.get("employees"), str):
+        with open(os.path.join(os.path.dirname(os.path.abspath(path)), spec["employees"]), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def compile_spec(spec: dict, base_dir: str = ".") -> ProblemInstance:
+    """
+    仕様の辞書から問題インスタンスを作成します
+
+    Args:
+        spec (dict): 仕様（モジュールの説明を参照）
+        base_dir (str): 社員一覧の CSV を探すディレクトリ
+
+    Returns:
+        ProblemInstance: 問題インスタンス
+    """
+    days = _parse_days(spec)
+    day_idx = {d: i for i, d in enumerate(days)}
+    day_ordinals = np.array([d.to_date().toordinal() for d in days], dtype=np.int64)
+
+    shift_specs = spec["shifts"]
+    shifts = [Shift(id=str(s["id"])) for s in shift_specs]
+    shift_idx = {s.id: i for i, s in enumerate(shifts)}
+    rest_id = str(spec.get("rest_shift", "O"))
+    if rest_id not in shift_idx:
+        raise ValueError(f"Invalid rest_shift: {rest_id}. Valid ids are {list(shift_idx)}")
+
+    forbidden_transitions = np.zeros((len(shifts), len(shifts)), dtype=bool)
+    for s_previous, s_current in spec.get("forbidden_transitions", []):
+        forbidden_transitions[_shift_index(shift_idx, s_previous), _shift_index(shift_idx, s_current)] = True
+
+    # スキル名 -> そのスキルがないと入れないシフト
+    skill_specs = spec.get("skills", {})
+    skill_names = list(skill_specs)
+    skill_required = np.zeros((len(skill_names), len(shifts)), dtype=bool)
+    for k, name in enumerate(skill_names):
+        for s in skill_specs[name]:
+            skill_required[k, _shift_index(shift_idx, s)] = True
+
+    employee_specs = read_employees(spec, base_dir)
+
+    E, D, S = len(employee_specs), len(days), len(shifts)
+    skills = np.zeros((E, len(skill_names)), dtype=bool)
+    employee_forbidden = np.zeros((E, S), dtype=bool)
+    holidays = np.zeros((E, D), dtype=bool)
+    n_work_days = np.empty(E, dtype=np.int64)
+    n_rest_days = np.empty(E, dtype=np.int64)
+    cycle_start = np.empty(E, dtype=np.int64)
+    for e, emp in enumerate(employee_specs):
+        emp_skills = emp.get("skills", skill_names)
+        for name in emp_skills:
+            if name not in skill_specs:
+                raise ValueError(f"Invalid skill: {name}. Valid skills are {skill_names}")
+            skills[e, skill_names.index(name)] = True
+        for s in emp.get("forbidden_shifts", []):
+            employee_forbidden[e, _shift_index(shift_idx, s)] = True
+        for h in emp.get("holidays", []):
+            holiday = _parse_day(h)
+            if holiday in day_idx:
+                holidays[e, day_idx[holiday]] = True
+        n_work_days[e] = int(emp.get("n_work_days", 5))
+        n_rest_days[e] = int(emp.get("n_rest_days", 2))
+        cycle_start[e] = _parse_day(emp.get("cycle_start", days[0])).to_date().toordinal()
+
+    # スキルがないと入れないシフトのうち、持っていないスキルのもの
+    skill_forbidden = (~skills).astype(np.int64) @ skill_required.astype(np.int64) > 0
+    day_in_cycle = (day_ordinals[None, :] - cycle_start[:, None]) % (n_work_days + n_rest_days)[:, None]
+
+    return ProblemInstance(
+        employees=[Employee(id=str(emp["id"])) for emp in employee_specs],
+        days=days,
+        shifts=shifts,
+        day_in_cycle=day_in_cycle,
+        n_work_days=n_work_days,
+        n_rest_days=n_rest_days,
+        skills=skills,
+        skill_forbidden=skill_forbidden,
+        employee_forbidden=employee_forbidden,
+        holidays=holidays,
+        min_worker=[int(s.get("min_worker", 0)) for s in shift_specs],
+        max_worker=[int(s.get("max_worker", E)) for s in shift_specs],
+        forbidden_transitions=forbidden_transitions,
+        rest_shift_idx=shift_idx[rest_id],
+        employee_labels=[str(emp.get("label", emp["id"])) for emp in employee_specs],
+        shift_labels=[str(s.get("label", s["id"])) for s in shift_specs],
+        skill_names=skill_names,
+    )
+
+
+def read_employees(spec: dict, base_dir: str = ".") -> list[dict]:
+    """
+    仕様の "employees"（社員のリスト、または CSV ファイルのパス）を社員ごとの辞書のリストで返します
+    """
+    employee_specs = spec["employees"]
+    if isinstance(employee_specs, str):
+        return _read_employee_csv(os.path.join(base_dir, employee_specs))
+    return list(employee_specs)
+
+
+def _parse_day(value) -> Day:
+    if isinstance(value, Day):
+        return value
+    if isinstance(value, date):
+        return Day(year=value.year, month=value.month, day=value.day)
+    d = date.fromisoformat(str(value))
+    return Day(year=d.year, month=d.month, day=d.day)
+
+
+def _parse_days(spec: dict) -> list[Day]:
+    if "days" in spec:
+        return [_parse_day(d) for d in spec["days"]]
+    horizon = spec["horizon"]
+    start = _parse_day(horizon["start"]).to_date()
+    return [_parse_day(start + timedelta(days=i)) for i in range(int(horizon["n_days"]))]
+
+
+def _shift_index(shift_idx: dict[str, int], id) -> int:
+    try:
+        return shift_idx[str(id)]
+    except KeyError:
+        raise ValueError(f"Invalid shift id: {id}. Valid ids are {list(shift_idx)}")
+
+
+def _read_employee_csv(path: str) -> list[dict]:
+    list_columns = ("skills", "forbidden_shifts", "holidays")
+    employees = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            emp = {key: value for key, value in row.items() if value not in (None, "")}
+            for key in list_columns:
+                if key in row and row[key] is not None:
+                    emp[key] = [v.strip() for v in row[key].split(";") if v.strip()]
+            employees.append(emp)
+    return employees
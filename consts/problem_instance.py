@@ -0,0 +1,240 @@
+import copy
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+
+from .day import Day
+from .employee import Employee
+from .shift import Shift
+
+
+class ProblemInstance:
+    """
+    社員・日・シフトの定義と、評価や環境で繰り返し参照する配列をまとめた問題インスタンス
+
+    consts の get_instances() や各プロパティは呼ぶたびにリストや辞書を作り直すので、
+    ループの中ではこちらを使う。get_problem_instance() で一度だけ作成して使い回す。
+
+    Attributes:
+        employees (tuple[Employee, ...]): 社員
+        days (tuple[Day, ...]): 日
+        shifts (tuple[Shift, ...]): シフト
+        employee_idx (dict[Employee, int]): 社員 -> idx
+        day_idx (dict[Day, int]): 日 -> idx
+        shift_idx (dict[Shift, int]): シフト -> idx
+        rest_shift_idx (int): 休みシフト（"O"）の idx
+        day_in_cycle (np.ndarray): (E, D) 各日がサイクル開始から何日目か
+        n_work_days (np.ndarray): (E,) サイクル内の労働日数
+        n_rest_days (np.ndarray): (E,) サイクル内の休日数
+        n_cycle_days (np.ndarray): (E,) サイクルの総日数
+        work_day_mask (np.ndarray): (E, D) 労働日なら True
+        rest_day_mask (np.ndarray): (E, D) 休日なら True
+        cycle_end_rest_to_rest (np.ndarray): (E, D) サイクル終了日（休->休）なら True
+        cycle_end_work_to_rest (np.ndarray): (E, D) サイクル終了日（働->休）なら True
+        skills (np.ndarray): (E, K) 各スキル（skill_names の順）を持っていれば True
+        skill_names (tuple[str, ...]): スキル名（consts では "a", "b"）
+        skill_forbidden (np.ndarray): (E, S) スキル上割り当てられないシフトなら True
+        employee_forbidden (np.ndarray): (E, S) 社員個別のNGシフトなら True
+        forbidden_mask (np.ndarray): (E, S) スキルか個別の理由で割り当てられないシフトなら True
+        holidays (np.ndarray): (E, D) 希望休なら True
+        weekend (np.ndarray): (D,) 土日なら True
+        min_worker (np.ndarray): (S,) 各シフトの最小人数
+        max_worker (np.ndarray): (S,) 各シフトの最大人数
+        forbidden_transitions (np.ndarray): (S, S) 前サイクル -> 今サイクルの遷移NGなら True
+        fixed_shifts (np.ndarray): (E, D) 割り当てを固定したセルのシフト idx。固定しないセルは -1
+        action_masks (np.ndarray): (E, D, S) 選択可能なシフトなら 1 の uint8 配列（読み取り専用）
+    """
+
+    def __init__(
+        self,
+        employees: tuple[Employee, ...],
+        days: tuple[Day, ...],
+        shifts: tuple[Shift, ...],
+        day_in_cycle: np.ndarray,
+        n_work_days: np.ndarray,
+        n_rest_days: np.ndarray,
+        skills: np.ndarray,
+        skill_forbidden: np.ndarray,
+        employee_forbidden: np.ndarray,
+        holidays: np.ndarray,
+        min_worker: np.ndarray,
+        max_worker: np.ndarray,
+        forbidden_transitions: np.ndarray,
+        rest_shift_idx: int,
+        employee_labels: tuple[str, ...],
+        shift_labels: tuple[str, ...],
+        skill_names: tuple[str, ...] = ("a", "b"),
+        fixed_shifts: np.ndarray | None = None,
+    ):
+        self.employees = tuple(employees)
+        self.days = tuple(days)
+        self.shifts = tuple(shifts)
+        self.employee_idx = {e: i for i, e in enumerate(self.employees)}
+        self.day_idx = {d: i for i, d in enumerate(self.days)}
+        self.shift_idx = {s: i for i, s in enumerate(self.shifts)}
+        self.n_employees = len(self.employees)
+        self.n_days = len(self.days)
+        self.n_shifts = len(self.shifts)
+        self.rest_shift_idx = int(rest_shift_idx)
+        self.employee_labels = tuple(employee_labels)
+        self.shift_labels = tuple(shift_labels)
+        self.skill_names = tuple(skill_names)
+
+        # 労働日・休日のサイクル
+        self.day_in_cycle = np.asarray(day_in_cycle, dtype=np.int64)
+        self.n_work_days = np.asarray(n_work_days, dtype=np.int64)
+        self.n_rest_days = np.asarray(n_rest_days, dtype=np.int64)
+        self.n_cycle_days = self.n_work_days + self.n_rest_days
+        self.work_day_mask = self.day_in_cycle < self.n_work_days[:, None]
+        self.rest_day_mask = ~self.work_day_mask
+        self.cycle_end_work_to_rest = self.day_in_cycle == (self.n_cycle_days - 1)[:, None]
+        self.cycle_end_rest_to_rest = self.day_in_cycle == (self.n_cycle_days - 2)[:, None]
+
+        # スキル・NGシフト・希望休
+        self.skills = np.asarray(skills, dtype=bool)
+        self.skill_forbidden = np.asarray(skill_forbidden, dtype=bool)
+        self.employee_forbidden = np.asarray(employee_forbidden, dtype=bool)
+        self.forbidden_mask = self.skill_forbidden | self.employee_forbidden
+        self.holidays = np.asarray(holidays, dtype=bool)
+
+        # 日・シフトの情報
+        self.weekend = np.array([d.is_weekend for d in self.days], dtype=bool)
+        self.min_worker = np.asarray(min_worker, dtype=np.int64)
+        self.max_worker = np.asarray(max_worker, dtype=np.int64)
+        self.forbidden_transitions = np.asarray(forbidden_transitions, dtype=bool)
+        if fixed_shifts is None:
+            fixed_shifts = np.full((self.n_employees, self.n_days), -1)
+        self.fixed_shifts = np.asarray(fixed_shifts, dtype=np.int64)
+        self.action_masks = self._build_action_masks()
+
+    def _build_action_masks(self) -> np.ndarray:
+        # (社員, 日) ごとに選択可能なシフトのマスク（SchedulerEnv のアクションマスク）
+        # 休日は休みのみ、労働日は休み・スキル上NG・個別NG以外のシフトを許容する
+        # 割り当てを固定したセルは、そのシフトのみを許容する
+        action_masks = np.broadcast_to(~self.forbidden_mask[:, None, :], (self.n_employees, self.n_days, self.n_shifts)).copy()
+        action_masks[..., self.rest_shift_idx] = False
+        action_masks[self.rest_day_mask] = False
+        action_masks[self.rest_day_mask, self.rest_shift_idx] = True
+        fixed = self.fixed_shifts >= 0
+        action_masks[fixed] = np.arange(self.n_shifts)[None, :] == self.fixed_shifts[fixed][:, None]
+        action_masks = action_masks.astype(np.uint8)
+        action_masks.setflags(write=False)
+        return action_masks
+
+    def with_fixed_shifts(self, fixed_shifts: np.ndarray) -> "ProblemInstance":
+        """
+        fixed_shifts（(E, D)、固定しないセルは -1）のセルの割り当てを固定したインスタンスを返します
+        固定したセルのアクションマスクはそのシフトだけになる（ローリングホライズンで前の期間の日を固定するのに使う）
+        """
+        instance = copy.copy(self)
+        instance.fixed_shifts = np.asarray(fixed_shifts, dtype=np.int64)
+        instance.action_masks = instance._build_action_masks()
+        return instance
+
+    @classmethod
+    def from_consts(cls) -> "ProblemInstance":
+        """
+        consts に定義された社員・日・シフトからインスタンスを作成します
+        """
+        employees = Employee.get_instances()
+        days = Day.get_instances()
+        shifts = Shift.get_instances()
+        shift_idx = {s: i for i, s in enumerate(shifts)}
+
+        work_cycles = [e.work_cycle for e in employees]
+        day_in_cycle = [[wc.check_day_in_cycle(current_day=d) for d in days] for wc in work_cycles]
+
+        forbidden_transitions = np.zeros((len(shifts), len(shifts)), dtype=bool)
+        for s_previous, s_current in Shift.get_forbidden_transitions():
+            forbidden_transitions[shift_idx[s_previous], shift_idx[s_current]] = True
+
+        return cls(
+            employees=employees,
+            days=days,
+            shifts=shifts,
+            day_in_cycle=day_in_cycle,
+            n_work_days=[wc.n_work_days for wc in work_cycles],
+            n_rest_days=[wc.n_rest_days for wc in work_cycles],
+            skills=[[e.skill.a, e.skill.b] for e in employees],
+            skill_forbidden=[[s in e.skill.forbidden_shifts for s in shifts] for e in employees],
+            employee_forbidden=[[s in e.forbidden_shifts for s in shifts] for e in employees],
+            holidays=[[e.check_is_holiday(d) for d in days] for e in employees],
+            min_worker=[s.min_worker for s in shifts],
+            max_worker=[s.max_worker for s in shifts],
+            forbidden_transitions=forbidden_transitions,
+            rest_shift_idx=shift_idx[Shift.init(id="O")],
+            employee_labels=[e.label for e in employees],
+            shift_labels=[s.label for s in shifts],
+        )
+
+    def save_npz(self, path: str) -> None:
+        """
+        インスタンスを .npz に保存します（load_npz で読み込めます）
+        """
+        np.savez(
+            path,
+            employee_ids=np.array([e.id for e in self.employees], dtype=str),
+            day_ordinals=np.array([d.to_date().toordinal() for d in self.days], dtype=np.int64),
+            shift_ids=np.array([s.id for s in self.shifts], dtype=str),
+            day_in_cycle=self.day_in_cycle,
+            n_work_days=self.n_work_days,
+            n_rest_days=self.n_rest_days,
+            skills=self.skills,
+            skill_forbidden=self.skill_forbidden,
+            employee_forbidden=self.employee_forbidden,
+            holidays=self.holidays,
+            min_worker=self.min_worker,
+            max_worker=self.max_worker,
+            forbidden_transitions=self.forbidden_transitions,
+            rest_shift_idx=np.int64(self.rest_shift_idx),
+            employee_labels=np.array(self.employee_labels, dtype=str),
+            shift_labels=np.array(self.shift_labels, dtype=str),
+            skill_names=np.array(self.skill_names, dtype=str),
+            fixed_shifts=self.fixed_shifts,
+        )
+
+    @classmethod
+    def load_npz(cls, path: str) -> "ProblemInstance":
+        """
+        save_npz で保存したインスタンスを読み込みます
+        """
+        with np.load(path, allow_pickle=False) as data:
+            days = []
+            for ordinal in data["day_ordinals"].tolist():
+                d = date.fromordinal(ordinal)
+                days.append(Day(year=d.year, month=d.month, day=d.day))
+            return cls(
+                employees=[Employee(id=id) for id in data["employee_ids"].tolist()],
+                days=days,
+                shifts=[Shift(id=id) for id in data["shift_ids"].tolist()],
+                day_in_cycle=data["day_in_cycle"],
+                n_work_days=data["n_work_days"],
+                n_rest_days=data["n_rest_days"],
+                skills=data["skills"],
+                skill_forbidden=data["skill_forbidden"],
+                employee_forbidden=data["employee_forbidden"],
+                holidays=data["holidays"],
+                min_worker=data["min_worker"],
+                max_worker=data["max_worker"],
+                forbidden_transitions=data["forbidden_transitions"],
+                rest_shift_idx=int(data["rest_shift_idx"]),
+                employee_labels=data["employee_labels"].tolist(),
+                shift_labels=data["shift_labels"].tolist(),
+                skill_names=data["skill_names"].tolist(),
+                fixed_shifts=data["fixed_shifts"] if "fixed_shifts" in data else None,
+            )
+
+    @property
+    def rest_shift(self) -> Shift:
+        return self.shifts[self.rest_shift_idx]
+
+    @property
+    def total_cells(self) -> int:
+        return self.n_employees * self.n_days
+
+
+@lru_cache(maxsize=None)
+def get_problem_instance() -> ProblemInstance:
+    # consts から作るインスタンスは一度だけ作成する
+    return ProblemInstance.from_consts()
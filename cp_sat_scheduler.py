@@ -0,0 +1,52 @@
+import argparse
+
+from consts import load_problem_instance
+from extra import CpSatSolver, show_shift
+from extra.local_search import DEFAULT_WEIGHTS, EVAL_SHIFT_WEIGHTS
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="OR-Tools の CP-SAT でシフト表を作成する（pip install ortools が必要）")
+    parser.add_argument("--instance", default=None, help="問題インスタンスの仕様ファイル（.json / .yaml）。省略時は consts の定義を使う")
+    parser.add_argument("--time-limit", type=float, default=10.0, help="秒数の上限")
+    parser.add_argument("--workers", type=int, default=8, help="CP-SAT の探索ワーカー数")
+    parser.add_argument("--objective", choices=["full", "evalshift"], default="full", help="full: 全ペナルティの重み付き和 / evalshift: 環境の報酬と同じ c1 + c4")
+    parser.add_argument("--weights", type=int, nargs=7, default=None, metavar="W", help="7種類のペナルティの重み（--objective より優先）")
+    parser.add_argument("--hint", default=None, help="初期解のヒントにする学習済みモデル（improve_schedule.py と同じく1エピソード実行する）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log", action="store_true", help="CP-SAT の探索ログを表示する")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    instance = None if args.instance is None else load_problem_instance(args.instance)
+    if args.weights is not None:
+        weights = tuple(args.weights)
+    else:
+        weights = DEFAULT_WEIGHTS if args.objective == "full" else EVAL_SHIFT_WEIGHTS
+
+    hint = None
+    if args.hint is not None:
+        from improve_schedule import rollout_policy
+        from scheduling_env_v2 import SchedulerEnv
+
+        hint = rollout_policy(args.hint, SchedulerEnv(instance))
+
+    solver = CpSatSolver(instance, weights=weights)
+    result = solver.solve(
+        time_limit=args.time_limit,
+        n_workers=args.workers,
+        hint=hint,
+        seed=args.seed,
+        on_solution=lambda elapsed, objective: print(f"{elapsed:7.2f}s  ペナルティ {objective}"),
+        log_search_progress=args.log,
+    )
+
+    print(f"{result.status}（{result.elapsed:.1f} 秒）")
+    if result.schedule is None:
+        raise SystemExit(1)
+    print(f"ペナルティ: {result.objective}（下界 {result.bound:g}）")
+    show_shift(result.schedule.ravel().tolist(), instance=instance)
+    for i, p in enumerate(result.penalties):
+        print(f"p{i+1}: {p}")
@@ -0,0 +1,48 @@
+import argparse
+
+from consts import load_problem_instance
+from eval_scheduler import ENV_CLASSES, load_model
+from extra import show_shift
+from extra.local_search import DEFAULT_WEIGHTS, EVAL_SHIFT_WEIGHTS
+from policy_decoder import PolicyDecoder
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="学習済みモデルの行動確率からビームサーチ・サンプリングでシフト表を作成する")
+    parser.add_argument("--model-path", default="logs/best_model.zip")
+    parser.add_argument("--algo", choices=["a2c", "ppo"], default=None, help="省略時はファイル名から判定する（a2c を含めば A2C、それ以外は PPO）")
+    parser.add_argument("--instance", default=None, help="問題インスタンスの仕様ファイル（.json / .yaml）。省略時は consts の定義を使う")
+    parser.add_argument("--action-mode", choices=list(ENV_CLASSES), default="cell", help="学習時と同じものを指定する")
+    parser.add_argument("--rich-obs", action="store_true", help="学習時に --rich-obs を指定したモデルのとき")
+    parser.add_argument("--decode", choices=["beam", "sample", "greedy"], default="beam", help="greedy はビーム幅 1 のビームサーチ（マスクを守った貪欲法）")
+    parser.add_argument("--beam-width", type=int, default=8)
+    parser.add_argument("--penalty-weight", type=float, default=1.0, help="ビームの順位づけでペナルティの下界にかける重み")
+    parser.add_argument("--upper-bound", type=int, default=None, help="下界がこの値を超えたビームを捨てる")
+    parser.add_argument("--n-samples", type=int, default=32)
+    parser.add_argument("--temperature", type=float, default=1.0)
+    parser.add_argument("--objective", choices=["full", "evalshift"], default="full", help="full: 全ペナルティの重み付き和 / evalshift: 環境の報酬と同じ c1 + c4")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.rich_obs and args.action_mode != "cell":
+        parser.error("--rich-obs は --action-mode cell のときのみ指定できます")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    instance = None if args.instance is None else load_problem_instance(args.instance)
+    weights = DEFAULT_WEIGHTS if args.objective == "full" else EVAL_SHIFT_WEIGHTS
+    model = load_model(args.model_path, args.algo)
+    decoder = PolicyDecoder(model, instance, env_class=ENV_CLASSES[args.action_mode], rich_observation=args.rich_obs, weights=weights)
+
+    if args.decode == "beam":
+        result = decoder.beam_search(args.beam_width, args.penalty_weight, args.upper_bound)
+    elif args.decode == "greedy":
+        result = decoder.beam_search(1, 0.0)
+    else:
+        result = decoder.sample(args.n_samples, args.temperature, seed=args.seed)
+
+    print(f"ペナルティ: {result.objective}（候補 {result.n_candidates}、対数確率 {result.log_prob:.2f}、{result.elapsed:.2f} 秒）")
+    show_shift(result.schedule.ravel().tolist(), instance=instance)
+    for i, p in enumerate(result.penalties):
+        print(f"p{i+1}: {p}")
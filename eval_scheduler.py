@@ -1,17 +1,209 @@
-from stable_baselines3 import PPO
-from scheduling.old.scheduling_env import SchedulerEnv
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
 
-env = SchedulerEnv()
+import numpy as np
+from stable_baselines3 import A2C, PPO
+from stable_baselines3.common.utils import set_random_seed
 
-model = PPO.load("logs/best_model.zip", env, verbose=1)
+from consts import get_problem_instance, load_problem_instance
+from extra import get_penalty_engine, show_shift
+from extra.local_search import DEFAULT_WEIGHTS
+from scheduling_cycle_env import SchedulerCycleEnv
+from scheduling_env_v2 import SchedulerEnv
+from scheduling_vec_env import SchedulerVecEnv
 
-obs = env.reset()
-done = False
-total_reward = 0
-while not done:
-    action, _ = model.predict(obs)
-    obs, reward, done, info = env.step(action)
-    total_reward += reward
-    print("Total reward:", total_reward)
+ALGOS = {"a2c": A2C, "ppo": PPO}
 
-env.render()
+# cell: 1ステップで1セル / cycle: 1ステップで社員の1サイクルの勤務日
+ENV_CLASSES = {"cell": SchedulerEnv, "cycle": SchedulerCycleEnv}
+
+# ワーカープロセスで使うモデル（_init_worker で一度だけ読み込む）
+_worker_model = None
+
+
+def load_model(model_path: str, algo: str | None = None, device: str = "cpu"):
+    """
+    学習済みモデルを読み込みます。algo を省略するとファイル名に "a2c" を含むかで A2C / PPO を選ぶ
+    """
+    if algo is None:
+        algo = "a2c" if "a2c" in os.path.basename(model_path).lower() else "ppo"
+    return ALGOS[algo].load(model_path, device=device)
+
+
+def rollout(
+    model,
+    instance_path: str | None,
+    n_episodes: int,
+    n_envs: int,
+    action_mode: str = "cell",
+    rich_observation: bool = False,
+    deterministic: bool = True,
+    seed: int | None = None,
+) -> dict:
+    """
+    SchedulerVecEnv で n_envs 個の環境をまとめて進め、model.predict も全環境分を1回で呼んで n_episodes 個のシフト表を作ります
+
+    Returns:
+        dict: "schedules" (n_episodes, E*D) の uint8 配列、"rewards" (n_episodes,)、"elapsed" 秒、
+            "started" / "finished" 開始・終了の時刻（time.time()。プロセスをまたいで比べられる）
+    """
+    if seed is not None:
+        set_random_seed(seed)
+    instance = None if instance_path is None else load_problem_instance(instance_path)
+    n_envs = max(min(n_envs, n_episodes), 1)
+    env = SchedulerVecEnv(n_envs, instance, env_class=ENV_CLASSES[action_mode], rich_observation=rich_observation)
+
+    started = time.time()
+    start = time.perf_counter()
+    schedules, rewards = [], []
+    obs = env.reset()
+    while len(schedules) < n_episodes:
+        actions, _ = model.predict(obs, deterministic=deterministic)
+        obs, step_rewards, dones, infos = env.step(actions)
+        # 全環境のエピソードの長さは同じなので、終わるときは全環境が同時に終わる
+        for k in np.flatnonzero(dones):
+            schedules.append(infos[k]["schedule"])
+            rewards.append(float(step_rewards[k]))
+    elapsed = time.perf_counter() - start
+    env.close()
+    return {
+        "schedules": np.stack(schedules[:n_episodes]),
+        "rewards": np.asarray(rewards[:n_episodes]),
+        "elapsed": elapsed,
+        "started": started,
+        "finished": started + elapsed,
+    }
+
+
+def _init_worker(model_path: str, algo: str | None) -> None:
+    global _worker_model
+    import torch
+
+    # プロセスごとにスレッドを取り合わないよう 1 スレッドにする
+    torch.set_num_threads(1)
+    _worker_model = load_model(model_path, algo)
+
+
+def _rollout_task(task: dict) -> dict:
+    return {"instance": task["instance_path"], **rollout(_worker_model, **task)}
+
+
+def split_tasks(instance_paths: list[str | None], n_episodes: int, n_workers: int, seed: int, **kwargs) -> list[dict]:
+    """
+    インスタンスごとの n_episodes を n_workers 個のタスクに分けます（タスクごとにシードを変える）
+    """
+    tasks = []
+    for instance_path in instance_paths:
+        chunks = [len(c) for c in np.array_split(np.arange(n_episodes), min(n_workers, n_episodes))]
+        for n in chunks:
+            tasks.append({"instance_path": instance_path, "n_episodes": n, "seed": seed + len(tasks), **kwargs})
+    return tasks
+
+
+def summarize(instance_path: str | None, results: list[dict], weights: tuple[int, ...] = DEFAULT_WEIGHTS) -> dict:
+    """
+    1つのインスタンスのロールアウト結果から、ペナルティの内訳・最良のシフト表・スループットをまとめます
+    スループットは、そのインスタンスの最初のタスクの開始から最後のタスクの終了までの実時間で割る
+    （ワーカーの所要秒数の合計で割ると、プロセス数によらず1ワーカーあたりの値になるため）
+    """
+    instance = get_problem_instance() if instance_path is None else load_problem_instance(instance_path)
+    schedules = np.concatenate([r["schedules"] for r in results])
+    rewards = np.concatenate([r["rewards"] for r in results])
+    wall = max(r["finished"] for r in results) - min(r["started"] for r in results)
+
+    penalties = get_penalty_engine(instance).evaluate_population(schedules)
+    objectives = penalties @ np.asarray(weights, dtype=np.int64)
+    best = int(np.argmin(objectives))
+    return {
+        "instance": instance_path or "consts",
+        "n_episodes": len(schedules),
+        "n_unique": len(np.unique(schedules, axis=0)),
+        "reward_mean": float(rewards.mean()),
+        "reward_max": float(rewards.max()),
+        "penalty_mean": {f"p{i+1}": float(v) for i, v in enumerate(penalties.mean(axis=0))},
+        "objective_mean": float(objectives.mean()),
+        "best_objective": int(objectives[best]),
+        "best_penalties": {f"p{i+1}": int(v) for i, v in enumerate(penalties[best])},
+        "best_schedule": schedules[best].reshape(instance.n_employees, instance.n_days).tolist(),
+        "wall_seconds": wall,
+        "worker_seconds": sum(r["elapsed"] for r in results),
+        "episodes_per_sec": len(schedules) / wall if wall > 0 else float("inf"),
+        "_instance": instance,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="学習済みモデルでシフト表を作り、ペナルティを評価する")
+    parser.add_argument("--model-path", default="logs/best_model.zip")
+    parser.add_argument("--algo", choices=list(ALGOS), default=None, help="省略時はファイル名から判定する（a2c を含めば A2C、それ以外は PPO）")
+    parser.add_argument("--instance", action="append", default=None, help="問題インスタンスの仕様ファイル（.json / .yaml）。複数指定可。省略時は consts の定義を使う")
+    parser.add_argument("--action-mode", choices=list(ENV_CLASSES), default="cell", help="学習時と同じものを指定する")
+    parser.add_argument("--rich-obs", action="store_true", help="学習時に --rich-obs を指定したモデルのとき")
+    parser.add_argument("--n-episodes", type=int, default=100, help="インスタンスごとのエピソード数")
+    parser.add_argument("--n-envs", type=int, default=32, help="1プロセスでまとめて進める環境の数（model.predict のバッチの大きさ）")
+    parser.add_argument("--n-workers", type=int, default=1, help="ロールアウトに使うプロセス数")
+    parser.add_argument("--sample", action="store_true", help="決定的な行動ではなく方策からサンプリングする（best-of-N 向け）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="結果（最良のシフト表を含む）を書き出す JSON")
+    parser.add_argument("--show", action="store_true", help="インスタンスごとの最良のシフト表を表示する")
+    args = parser.parse_args()
+    if args.rich_obs and args.action_mode != "cell":
+        parser.error("--rich-obs は --action-mode cell のときのみ指定できます")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # 同じインスタンスを重ねて指定したときは1つにまとめる
+    instance_paths = list(dict.fromkeys(args.instance or [None]))
+    tasks = split_tasks(
+        instance_paths,
+        args.n_episodes,
+        args.n_workers,
+        args.seed,
+        n_envs=args.n_envs,
+        action_mode=args.action_mode,
+        rich_observation=args.rich_obs,
+        deterministic=not args.sample,
+    )
+
+    # 問題インスタンスは親プロセスで一度読み込んでキャッシュの .npz を作っておく
+    for instance_path in instance_paths:
+        if instance_path is not None:
+            load_problem_instance(instance_path)
+
+    start = time.perf_counter()
+    if args.n_workers > 1:
+        start_method = "fork" if "fork" in mp.get_all_start_methods() else None
+        with mp.get_context(start_method).Pool(args.n_workers, initializer=_init_worker, initargs=(args.model_path, args.algo)) as pool:
+            results = pool.map(_rollout_task, tasks)
+    else:
+        model = load_model(args.model_path, args.algo)
+        results = [{"instance": task["instance_path"], **rollout(model, **task)} for task in tasks]
+    wall = time.perf_counter() - start
+
+    summaries = [summarize(path, [r for r in results if r["instance"] == path]) for path in instance_paths]
+    for summary in summaries:
+        print(f"[{summary['instance']}] {summary['n_episodes']} エピソード（異なるシフト表 {summary['n_unique']}）、{summary['episodes_per_sec']:.1f} エピソード/秒")
+        print(f"  報酬 平均 {summary['reward_mean']:.2f} / 最大 {summary['reward_max']:.2f}")
+        print("  ペナルティ平均 " + "  ".join(f"{k}: {v:.2f}" for k, v in summary["penalty_mean"].items()))
+        print(f"  最良 {summary['best_objective']}  " + "  ".join(f"{k}: {v}" for k, v in summary["best_penalties"].items()))
+        if args.show:
+            show_shift(np.ravel(summary["best_schedule"]).tolist(), instance=summary["_instance"])
+    n_total = sum(s["n_episodes"] for s in summaries)
+    print(f"合計 {n_total} エピソード、{wall:.2f} 秒（{n_total / wall:.1f} エピソード/秒）")
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            report = {
+                "model_path": args.model_path,
+                "deterministic": not args.sample,
+                "wall_seconds": wall,
+                "episodes_per_sec": n_total / wall,
+                "instances": [{k: v for k, v in s.items() if not k.startswith("_")} for s in summaries],
+            }
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"結果を {args.output} に書き出しました。")
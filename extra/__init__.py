@@ -1 +1,11 @@
-from .funcs import evalShift, show_shift, get_penalties
+from .funcs import evalShift, evalPopulation, show_shift, get_penalties, get_population_penalties, get_penalty_engine, get_penalty_cache
+from .penalty_engine import PenaltyEngine
+from .penalty_cache import PenaltyCache
+from .delta_evaluator import DeltaEvaluator
+from .local_search import LocalSearch, LocalSearchResult
+from .genetic import GeneticAlgorithm, GAResult
+from .cp_sat import CpSatSolver, CpSatResult
+from .population import generate_population
+from .rolling_horizon import RollingHorizonScheduler, CarryOver, PeriodResult
+from .profiler import Profiler, profiler
+from .repair import ScheduleRepair, RepairResult
@@ -0,0 +1,255 @@
+import time
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from consts import ProblemInstance, get_problem_instance
+from .funcs import get_penalty_engine
+from .local_search import DEFAULT_WEIGHTS
+
+
+class CpSatResult(NamedTuple):
+    """
+    Attributes:
+        schedule (np.ndarray | None): 見つかった最良のスケジュール (E, D)。解がなければ None
+        penalties (list[int] | None): その7種類のペナルティ（PenaltyEngine で計算し直したもの）
+        objective (int | None): その重み付きペナルティ
+        bound (float): 重み付きペナルティの下界（OPTIMAL なら objective と同じ）
+        status (str): "OPTIMAL" / "FEASIBLE" / "INFEASIBLE" / "UNKNOWN" など
+        history (list[tuple[float, int]]): 解が見つかるたびの (経過秒数, 重み付きペナルティ)
+        elapsed (float): 所要秒数
+    """
+
+    schedule: np.ndarray | None
+    penalties: list[int] | None
+    objective: int | None
+    bound: float
+    status: str
+    history: list[tuple[float, int]]
+    elapsed: float
+
+
+class CpSatSolver:
+    """
+    OR-Tools の CP-SAT で、Variables の count_* と同じ7種類のペナルティの重み付き和を最小化するクラス
+
+    ・変数は (社員, 日, シフト) ごとの 0-1 変数で、各セルはちょうど1つのシフト
+    ・ProblemInstance.action_masks で選択できないシフトは 0 に固定する（ハード制約）
+    ・ペナルティは PenaltyEngine と同じ定義の線形・論理制約で表し、weights で重み付けした和を目的関数にする
+      （p5 の区切りは区切り候補日に休みが入るかどうかで決まり、それはマスク（固定したセルを含む）で決まるので定数になる）
+    ・time_limit で打ち切った場合も、それまでの最良の解を返す（anytime）
+    ・hint に RL の方策や GA のシフト表を渡すと、探索の初期解のヒントにする
+
+    ortools はオプションの依存（pip install ortools）で、CpSatSolver を作るときに読み込む。
+    """
+
+    def __init__(self, instance: ProblemInstance | None = None, weights: tuple[int, ...] = DEFAULT_WEIGHTS):
+        """
+        Args:
+            instance (ProblemInstance | None): 問題インスタンス。None なら consts のインスタンス
+            weights (tuple[int, ...]): 7種類のペナルティの重み（整数）
+        """
+        try:
+            from ortools.sat.python import cp_model
+        except ImportError:
+            raise ImportError("CpSatSolver を使うには OR-Tools が必要です（pip install ortools）")
+        self._cp_model = cp_model
+        self.instance = get_problem_instance() if instance is None else instance
+        self.engine = get_penalty_engine(instance)
+        self.weights = tuple(int(w) for w in weights)
+        self.model, self.x, self.penalty_exprs = self._build()
+
+    def _build(self):
+        cp_model = self._cp_model
+        inst, engine = self.instance, self.engine
+        E, D, S = inst.n_employees, inst.n_days, inst.n_shifts
+        rest = inst.rest_shift_idx
+        masks = inst.action_masks.astype(bool)
+        model = cp_model.CpModel()
+
+        # x[e][d][s]: 社員 e の d 日目がシフト s なら 1
+        x = [[[model.NewBoolVar(f"x_{e}_{d}_{s}") for s in range(S)] for d in range(D)] for e in range(E)]
+        for e in range(E):
+            for d in range(D):
+                model.AddExactlyOne(x[e][d])
+                for s in np.flatnonzero(~masks[e, d]).tolist():
+                    model.Add(x[e][d][s] == 0)
+
+        # p1: 勤務日の休み / p2: スキル上NGのシフト / p3: 休日の休み以外
+        work = engine.work_day_mask
+        p1 = sum(x[e][d][rest] for e in range(E) for d in range(D) if work[e, d])
+        p2 = sum(x[e][d][s] for e in range(E) for d in range(D) if work[e, d] for s in np.flatnonzero(engine.skill_forbidden[e]).tolist())
+        p3 = sum(1 - x[e][d][rest] for e in range(E) for d in range(D) if not work[e, d])
+
+        # p4: サイクル（休->休か最終日で区切る）に n > 1 種類のシフトがあれば n * 最小のシフト idx
+        p4_terms = []
+        for e in range(E):
+            for c in np.unique(engine.cycle_id[e]).tolist():
+                days = np.flatnonzero(engine.cycle_id[e] == c).tolist()
+                p4_terms.append(self._ignore_cycle_penalty(model, [[x[e][d][s] for d in days] for s in range(S)], len(days)))
+        p4 = sum(p4_terms)
+
+        # p5: 休み以外のシフトが入った区切り候補日で区切った区間ごとに、遷移NGの組 (p, c) が両方あれば c の日数
+        p5_terms = []
+        transitions = list(zip(*np.nonzero(engine.forbidden_transitions)))
+        for e in range(E):
+            for days in self._transition_segments(e):
+                present = {}
+                for p, c in transitions:
+                    if p not in present:
+                        present[p] = model.NewBoolVar("")
+                        model.AddMaxEquality(present[p], [x[e][d][p] for d in days])
+                    n_current = sum(x[e][d][c] for d in days)
+                    term = model.NewIntVar(0, len(days), "")
+                    model.Add(term == n_current).OnlyEnforceIf(present[p])
+                    model.Add(term == 0).OnlyEnforceIf(present[p].Not())
+                    p5_terms.append(term)
+        p5 = sum(p5_terms)
+
+        # p6: 平日・休み以外のシフトの人数が min と max の間になければその差
+        p6_terms = []
+        for d in np.flatnonzero(engine.weekday_mask).tolist():
+            for s in range(S):
+                if s == rest:
+                    continue
+                n_workers = sum(x[e][d][s] for e in range(E))
+                shortage = model.NewIntVar(0, E, "")
+                excess = model.NewIntVar(0, E, "")
+                model.Add(n_workers + shortage - excess >= int(engine.min_worker[s]))
+                model.Add(n_workers + shortage - excess <= int(engine.max_worker[s]))
+                p6_terms += [shortage, excess]
+        p6 = sum(p6_terms)
+
+        # p7: サイクル（働->休で区切る、未完了のものは除く）に休みが1日もなければ 1
+        p7_terms = []
+        for e in range(E):
+            for c in np.unique(engine.rest_cycle_id[e][engine.rest_cycle_id[e] >= 0]).tolist():
+                has_rest = model.NewBoolVar("")
+                model.AddMaxEquality(has_rest, [x[e][d][rest] for d in np.flatnonzero(engine.rest_cycle_id[e] == c).tolist()])
+                p7_terms.append(1 - has_rest)
+        p7 = sum(p7_terms)
+
+        penalty_exprs = [p1, p2, p3, p4, p5, p6, p7]
+        model.Minimize(sum(w * p for w, p in zip(self.weights, penalty_exprs)))
+        return model, x, penalty_exprs
+
+    def _ignore_cycle_penalty(self, model, x_by_shift: list[list], n_days: int):
+        # present[s]: シフト s が1日以上ある / is_min[s]: s が登場するシフトで最小
+        present = []
+        for xs in x_by_shift:
+            var = model.NewBoolVar("")
+            model.AddMaxEquality(var, xs)
+            present.append(var)
+        n_kinds = model.NewIntVar(1, len(present), "")
+        model.Add(n_kinds == sum(present))
+        mixed = model.NewBoolVar("")
+        model.Add(n_kinds >= 2).OnlyEnforceIf(mixed)
+        model.Add(n_kinds <= 1).OnlyEnforceIf(mixed.Not())
+
+        penalty = model.NewIntVar(0, len(present) * (len(present) - 1), "")
+        model.Add(penalty == 0).OnlyEnforceIf(mixed.Not())
+        for s, var in enumerate(present):
+            is_min = model.NewBoolVar("")
+            model.AddBoolAnd([var] + [p.Not() for p in present[:s]]).OnlyEnforceIf(is_min)
+            model.AddBoolOr([var.Not()] + present[:s]).OnlyEnforceIf(is_min.Not())
+            model.Add(penalty == s * n_kinds).OnlyEnforceIf([is_min, mixed])
+        return penalty
+
+    def _transition_segments(self, e: int) -> list[list[int]]:
+        # Variables.count_ignore_shift_transition_constraint と同じ区切り方
+        # 区切り候補日（サイクル終了日（休->休）か最終日）は、休み以外のシフトが入ったときだけ区切りになる。
+        # 休みが入るかどうかはマスクで決まる（休日は休みのみ、勤務日は休み以外、固定したセルはそのシフトのみ）ので、
+        # 勤務日に休みを固定したセル（直した欠勤を引き継いだものなど）も区切りにならない。
+        # 最初の区切りまでと、最後の区切り以降の日は数えない
+        inst = self.instance
+        rest = inst.rest_shift_idx
+        masks = inst.action_masks[e].astype(bool)
+        segments, days, n_flush = [], [], 0
+        for d in range(inst.n_days):
+            days.append(d)
+            if not (inst.cycle_end_rest_to_rest[e, d] or d == inst.n_days - 1):
+                continue
+            can_rest = masks[d, rest]
+            can_work = masks[d].sum() > can_rest
+            if can_rest and can_work:
+                raise ValueError(f"社員 {e} の {d} 日目は休みかどうかがマスクで決まらないため、シフト遷移を定式化できません")
+            if can_rest:
+                continue
+            if n_flush > 0:
+                segments.append(days)
+            days = []
+            n_flush += 1
+        return segments
+
+    def solve(
+        self,
+        time_limit: float = 10.0,
+        n_workers: int = 8,
+        hint=None,
+        seed: int = 0,
+        on_solution: Callable[[float, int], None] | None = None,
+        log_search_progress: bool = False,
+    ) -> CpSatResult:
+        """
+        モデルを解きます
+
+        Args:
+            time_limit (float): 秒数の上限
+            n_workers (int): CP-SAT の探索ワーカー数
+            hint: 初期解のヒントにするスケジュール（長さ E*D のリスト、または (E, D) の配列）。
+                マスクで選択できないシフトのセルはヒントにしない
+            seed (int): 乱数のシード
+            on_solution (Callable[[float, int], None] | None): 解が見つかるたびに (経過秒数, 重み付きペナルティ) で呼ぶ関数
+            log_search_progress (bool): True なら CP-SAT の探索ログを表示する
+
+        Returns:
+            CpSatResult: 最良の解と下界
+        """
+        cp_model = self._cp_model
+        inst = self.instance
+        E, D, S = inst.n_employees, inst.n_days, inst.n_shifts
+
+        self.model.ClearHints()
+        if hint is not None:
+            hint = np.asarray(hint, dtype=np.int64).reshape(E, D)
+            masks = inst.action_masks
+            for e in range(E):
+                for d in range(D):
+                    if masks[e, d, hint[e, d]]:
+                        for s in range(S):
+                            self.model.AddHint(self.x[e][d][s], int(s == hint[e, d]))
+
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = time_limit
+        solver.parameters.num_workers = n_workers
+        solver.parameters.random_seed = seed
+        solver.parameters.log_search_progress = log_search_progress
+
+        history = []
+        start = time.perf_counter()
+
+        class _Callback(cp_model.CpSolverSolutionCallback):
+            def on_solution_callback(self):
+                elapsed, objective = time.perf_counter() - start, int(self.ObjectiveValue())
+                history.append((elapsed, objective))
+                if on_solution is not None:
+                    on_solution(elapsed, objective)
+
+        status = solver.Solve(self.model, _Callback())
+        elapsed = time.perf_counter() - start
+        status_name = solver.StatusName(status)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return CpSatResult(None, None, None, solver.BestObjectiveBound(), status_name, history, elapsed)
+
+        values = np.array([[[solver.Value(v) for v in row] for row in employee] for employee in self.x], dtype=np.int64)
+        schedule = values.argmax(axis=2)
+        penalties = self.engine.evaluate(schedule).tolist()
+        return CpSatResult(
+            schedule=schedule,
+            penalties=penalties,
+            objective=sum(w * p for w, p in zip(self.weights, penalties)),
+            bound=solver.BestObjectiveBound(),
+            status=status_name,
+            history=history,
+            elapsed=elapsed,
+        )
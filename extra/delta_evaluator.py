@@ -0,0 +1,193 @@
+import numpy as np
+
+from .funcs import get_penalty_engine
+from .penalty_engine import PenaltyEngine
+
+
+class DeltaEvaluator:
+    """
+    1セルずつ変更されるスケジュールのペナルティを差分で更新するクラス
+
+    サイクルごとのシフト数、(日, シフト) ごとの人数、サイクルごとの休み数を保持しておき、
+    (社員, 日) の1セルを変更したときに影響のある部分だけを計算し直す。
+    apply / delta は O(サイクル長 + S)（シフト遷移だけは対象社員のサイクル数 × S）で、
+    何回変更しても get_penalties と同じ値になる。
+
+    Attributes:
+        engine (PenaltyEngine): マスク類を参照する評価エンジン
+        penalties (list[int]): 現在のスケジュールの7種類のペナルティ（get_penalties と同じ順番）
+    """
+
+    def __init__(self, schedule, engine: PenaltyEngine | None = None):
+        """
+        Args:
+            schedule: (E, D) のシフト idx 配列、または長さ E*D の個体リスト
+            engine (PenaltyEngine | None): 評価エンジン。None なら consts から作ったものを使う
+        """
+        self.engine = get_penalty_engine() if engine is None else engine
+        eng = self.engine
+        E, D, S = eng.n_employees, eng.n_days, eng.n_shifts
+        self._rest = eng.rest_shift_idx
+        self._schedule = eng.to_schedule(schedule).tolist()
+
+        # 固定情報は Python のリストで持つ（1セルずつの参照は NumPy より速い）
+        self._work_day = eng.work_day_mask.tolist()
+        self._skill_forbidden = eng.skill_forbidden.tolist()
+        self._weekday = eng.weekday_mask.tolist()
+        self._min_worker = eng.min_worker.tolist()
+        self._max_worker = eng.max_worker.tolist()
+        self._cycle_id = eng.cycle_id.tolist()
+        self._rest_cycle_id = eng.rest_cycle_id.tolist()
+        # 休みのセルはシフト遷移の集計に入らないので、休みを含む遷移NGは除いておく
+        self._transitions = [
+            (int(s_previous), int(s_current))
+            for s_previous, s_current in zip(*np.nonzero(eng.forbidden_transitions))
+            if s_previous != self._rest and s_current != self._rest
+        ]
+        # 各サイクルの最終日（シフト遷移の区切り候補日）
+        self._cycle_last_day = [[d for d in range(D) if d == D - 1 or row[d + 1] != row[d]] for row in self._cycle_id]
+
+        # サイクルごとのシフト数、(日, シフト) ごとの人数、サイクルごとの休み数
+        self._cycle_counts = [[[0] * S for _ in last_days] for last_days in self._cycle_last_day]
+        self._coverage = [[0] * S for _ in range(D)]
+        self._rest_counts = [[0] * D for _ in range(E)]
+        for e, row in enumerate(self._schedule):
+            for d, s in enumerate(row):
+                self._cycle_counts[e][self._cycle_id[e][d]][s] += 1
+                self._coverage[d][s] += 1
+                if s == self._rest and self._rest_cycle_id[e][d] >= 0:
+                    self._rest_counts[e][self._rest_cycle_id[e][d]] += 1
+
+        self._transition_penalty = [self._employee_transition_penalty(e) for e in range(E)]
+        self.penalties = eng.evaluate(np.asarray(self._schedule)).tolist()
+
+    @property
+    def schedule(self) -> np.ndarray:
+        """
+        現在のスケジュールを (E, D) の配列で返します
+        """
+        return np.asarray(self._schedule, dtype=np.int64)
+
+    def shift_at(self, e: int, d: int) -> int:
+        return self._schedule[e][d]
+
+    def to_list(self) -> list[list[int]]:
+        """
+        現在のスケジュールのコピーを (E, D) のリストで返します（schedule より軽い）
+        """
+        return [row[:] for row in self._schedule]
+
+    def delta(self, e: int, d: int, new_shift: int) -> list[int]:
+        """
+        (社員 e, 日 d) のシフトを new_shift に変えたときのペナルティの変化量を返します（状態は変えない）
+
+        Returns:
+            list[int]: 7種類のペナルティの変化量
+        """
+        diff, _ = self._evaluate_change(e, d, new_shift)
+        return diff
+
+    def apply(self, e: int, d: int, new_shift: int) -> list[int]:
+        """
+        (社員 e, 日 d) のシフトを new_shift に変更し、ペナルティを更新します
+
+        Returns:
+            list[int]: 7種類のペナルティの変化量
+        """
+        old_shift = self._schedule[e][d]
+        diff, transition_penalty = self._evaluate_change(e, d, new_shift)
+        if old_shift == new_shift:
+            return diff
+
+        self._schedule[e][d] = new_shift
+        cycle_counts = self._cycle_counts[e][self._cycle_id[e][d]]
+        cycle_counts[old_shift] -= 1
+        cycle_counts[new_shift] += 1
+        self._coverage[d][old_shift] -= 1
+        self._coverage[d][new_shift] += 1
+        rest_cycle = self._rest_cycle_id[e][d]
+        if rest_cycle >= 0:
+            self._rest_counts[e][rest_cycle] += (new_shift == self._rest) - (old_shift == self._rest)
+        self._transition_penalty[e] = transition_penalty
+
+        self.penalties = [p + dp for p, dp in zip(self.penalties, diff)]
+        return diff
+
+    def _evaluate_change(self, e: int, d: int, new_shift: int) -> tuple[list[int], int]:
+        # 変化量と、変更後の社員 e のシフト遷移ペナルティを返す
+        old_shift = self._schedule[e][d]
+        if old_shift == new_shift:
+            return [0] * PenaltyEngine.N_PENALTIES, self._transition_penalty[e]
+
+        rest = self._rest
+        diff = [0] * PenaltyEngine.N_PENALTIES
+
+        # 勤務日の休み、スキル不足、休日のシフト
+        if self._work_day[e][d]:
+            diff[0] = (new_shift == rest) - (old_shift == rest)
+            diff[1] = self._skill_forbidden[e][new_shift] - self._skill_forbidden[e][old_shift]
+        else:
+            diff[2] = (new_shift != rest) - (old_shift != rest)
+
+        # 1サイクル1シフトとシフト遷移：サイクルのシフト数を一時的に書き換えて計算し直す
+        cycle_counts = self._cycle_counts[e][self._cycle_id[e][d]]
+        before = self._cycle_penalty(cycle_counts)
+        cycle_counts[old_shift] -= 1
+        cycle_counts[new_shift] += 1
+        self._schedule[e][d] = new_shift
+        diff[3] = self._cycle_penalty(cycle_counts) - before
+        transition_penalty = self._employee_transition_penalty(e)
+        diff[4] = transition_penalty - self._transition_penalty[e]
+        self._schedule[e][d] = old_shift
+        cycle_counts[old_shift] += 1
+        cycle_counts[new_shift] -= 1
+
+        # 人数制限（平日・休み以外のシフトのみ）
+        if self._weekday[d]:
+            coverage = self._coverage[d]
+            if old_shift != rest:
+                diff[5] += self._coverage_penalty(old_shift, coverage[old_shift] - 1) - self._coverage_penalty(old_shift, coverage[old_shift])
+            if new_shift != rest:
+                diff[5] += self._coverage_penalty(new_shift, coverage[new_shift] + 1) - self._coverage_penalty(new_shift, coverage[new_shift])
+
+        # サイクル内の休み
+        rest_cycle = self._rest_cycle_id[e][d]
+        if rest_cycle >= 0 and (old_shift == rest) != (new_shift == rest):
+            n_rest = self._rest_counts[e][rest_cycle]
+            n_rest_after = n_rest + (1 if new_shift == rest else -1)
+            diff[6] = (n_rest_after == 0) - (n_rest == 0)
+
+        return diff, transition_penalty
+
+    @staticmethod
+    def _cycle_penalty(counts: list[int]) -> int:
+        # サイクル内のシフトの種類数 n が2以上なら n * 最小 idx
+        kinds = [s for s, n in enumerate(counts) if n > 0]
+        if len(kinds) > 1:
+            return len(kinds) * kinds[0]
+        return 0
+
+    def _coverage_penalty(self, shift: int, n_worker: int) -> int:
+        if n_worker < self._min_worker[shift]:
+            return self._min_worker[shift] - n_worker
+        if n_worker > self._max_worker[shift]:
+            return n_worker - self._max_worker[shift]
+        return 0
+
+    def _employee_transition_penalty(self, e: int) -> int:
+        # 休み以外のシフトが入ったサイクル最終日で区切り、最初の区切りまでと最後の区切り以降は数えない
+        rest = self._rest
+        schedule_row = self._schedule[e]
+        segment = None
+        penalty = 0
+        for counts, last_day in zip(self._cycle_counts[e], self._cycle_last_day[e]):
+            if segment is not None:
+                segment = [n + m for n, m in zip(segment, counts)]
+            if schedule_row[last_day] == rest:
+                continue
+            if segment is not None:
+                for s_previous, s_current in self._transitions:
+                    if segment[s_previous] > 0:
+                        penalty += segment[s_current]
+            segment = [0] * len(counts)
+        return penalty
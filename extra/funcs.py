@@ -1,81 +1,82 @@
-from variables import Variables
-from consts import Employee, Day, Shift
-import pandas as pd
+from functools import lru_cache
 
+from consts import ProblemInstance, get_problem_instance
+from .penalty_cache import PenaltyCache
+from .penalty_engine import PenaltyEngine
+import numpy as np
+import pandas as pd
 
-# ペナルティ定義部分
-def evalShift(individual) -> int:
-    vars = Variables(individual)
-    # 勤務日に割り当てられた休みをカウント
-    c1 = vars.count_assigned_holiday_on_weekdays()
 
-    # 必要なスキルを持っていない人が割り当てられた回数をカウント
-    c2 = vars.count_assigned_not_have_required_skill()
+def get_penalty_engine(instance: ProblemInstance | None = None) -> PenaltyEngine:
+    # マスク類の作成は重いのでインスタンスごとに一度だけ行う（None なら consts のインスタンス）
+    # None を先に解決して、None と consts のインスタンスで同じエンジン（と同じキャッシュ）を使う
+    return _penalty_engine(get_problem_instance() if instance is None else instance)
 
-    # 休日にシフトが割り当てられている数をカウント
-    c3 = vars.count_assinged_shift_on_holiday()
 
-    # 1サイクルで1シフトの制約を無視した回数をカウント
-    c4 = vars.count_ignore_cycle()
+@lru_cache(maxsize=16)
+def _penalty_engine(instance: ProblemInstance) -> PenaltyEngine:
+    return PenaltyEngine.from_instance(instance)
 
-    # シフトの遷移制限を無視した回数をカウントする
-    c5 = vars.count_ignore_shift_transition_constraint()
 
-    # 各シフトの人数制限と割り当てられた人数の差分を取得する
-    c6 = vars.count_difference_need_and_actual()
+def get_penalty_cache(engine: PenaltyEngine | None = None) -> PenaltyCache:
+    # 評価エンジンごとに1つのキャッシュを evalShift と get_penalties で共有する
+    # 大きさは get_penalty_cache().resize(n) で変える（0 ならキャッシュしない）
+    return _penalty_cache(get_penalty_engine() if engine is None else engine)
 
-    # 1サイクルで1日以上休みがない人数をカウント
-    c7 = vars.count_not_assigned_holiday_on_cycle()
 
-    # return (c1 + c2 + c3 + c4 + 2 * c5 + c6 + c7,)
-    return c1 + c4
+@lru_cache(maxsize=16)
+def _penalty_cache(engine: PenaltyEngine) -> PenaltyCache:
+    return PenaltyCache(engine)
 
 
-def get_penalties(individual) -> list[int]:
-    vars = Variables(individual)
-
-    pena_list = []
-    # 勤務日に割り当てられた休みをカウント
-    pena_list.append(vars.count_assigned_holiday_on_weekdays())
+# ペナルティ定義部分
+def evalShift(individual, engine: PenaltyEngine | None = None) -> int:
+    # 計算済みならそれを使う。なければ c1 と c4 だけを計算してキャッシュに保存する（全ペナルティは計算しない）
+    # 後で同じシフト表に get_penalties を呼ぶと（終端の後の render など）、残りの5種類だけを計算する
+    # c1: 勤務日に割り当てられた休み、c4: 1サイクルで1シフトの制約を無視した回数
+    c1, c4 = get_penalty_cache(engine).subset(individual, (0, 3))
 
-    # 必要なスキルを持っていない人が割り当てられた回数をカウント
-    pena_list.append(vars.count_assigned_not_have_required_skill())
+    # その他のペナルティ（スキル、休日のシフト、遷移制限、人数制限、サイクル内の休み）は get_penalties を参照
+    # return (c1 + c2 + c3 + c4 + 2 * c5 + c6 + c7,)
+    return c1 + c4
 
-    # 休日にシフトが割り当てられている数をカウント
-    pena_list.append(vars.count_assinged_shift_on_holiday())
 
-    # 1サイクルで1シフトの制約を無視した回数をカウント
-    pena_list.append(vars.count_ignore_cycle())
+def get_penalties(individual, engine: PenaltyEngine | None = None) -> list[int]:
+    # 並びは Variables の count_* と同じ
+    # 勤務日の休み、スキル不足、休日のシフト、1サイクル1シフト、シフト遷移、人数制限、サイクル内の休み
+    engine = get_penalty_engine() if engine is None else engine
+    return list(get_penalty_cache(engine).penalties(individual))
 
-    # シフトの遷移制限を無視した回数をカウントする
-    pena_list.append(vars.count_ignore_shift_transition_constraint())
 
-    # 各シフトの人数制限と割り当てられた人数の差分を取得する
-    pena_list.append(vars.count_difference_need_and_actual())
+def get_population_penalties(population, chunk_size: int | None = None, engine: PenaltyEngine | None = None) -> np.ndarray:
+    # 個体群 (N, E*D) または (N, E, D) をまとめて評価し、(N, 7) のペナルティ配列を返す
+    # 並びは get_penalties と同じ。chunk_size を指定すると、その個体数ずつ評価してメモリを抑える
+    engine = get_penalty_engine() if engine is None else engine
+    return engine.evaluate_population(population, chunk_size=chunk_size)
 
-    # 1サイクルで1日以上休みがない人数をカウント
-    pena_list.append(vars.count_not_assigned_holiday_on_cycle())
 
-    return pena_list
+def evalPopulation(population, chunk_size: int | None = None, engine: PenaltyEngine | None = None) -> np.ndarray:
+    # 個体群について evalShift と同じ評価値 (c1 + c4) をまとめて計算し、(N,) の配列を返す
+    penalties = get_population_penalties(population, chunk_size=chunk_size, engine=engine)
+    return penalties[:, 0] + penalties[:, 3]
 
 
-def show_shift(indivisual):
+def show_shift(indivisual, instance: ProblemInstance | None = None):
+    instance = get_problem_instance() if instance is None else instance
     all_work = []
     index = 0
-    for e in range(Employee.get_n_instances()):
+    for e in range(instance.n_employees):
         emp_work = []
-        for d in range(Day.get_n_instances()):
-            emp_work.append(Shift.from_idx(indivisual[index]).label)
+        for d in range(instance.n_days):
+            emp_work.append(instance.shift_labels[indivisual[index]])
             index += 1
         all_work.append(emp_work)
 
     header = []
-    for d in Day.get_instances():
+    for d in instance.days:
         header.append(f"{d.day}({d.dow_label})")
 
-    names = []
-    for e in Employee.get_instances():
-        names.append(e.label)
+    names = list(instance.employee_labels)
 
     pd.set_option("display.unicode.east_asian_width", True)
     df_schedule = pd.DataFrame(all_work, columns=header, index=names)
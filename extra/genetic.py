@@ -0,0 +1,273 @@
+import csv
+import multiprocessing as mp
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from consts import ProblemInstance, get_problem_instance
+from .funcs import get_penalty_engine
+from .local_search import DEFAULT_WEIGHTS
+from .penalty_cache import PenaltyCache
+from .population import generate_population
+
+# ワーカープロセスで使う評価エンジン（_init_worker で設定する）
+_worker_engine = None
+
+
+def _init_worker(instance: ProblemInstance | None) -> None:
+    global _worker_engine
+    _worker_engine = get_penalty_engine(instance)
+
+
+def _evaluate_chunk(chunk: np.ndarray) -> np.ndarray:
+    return _worker_engine.evaluate_population(chunk)
+
+
+class GAResult(NamedTuple):
+    """
+    Attributes:
+        schedule (np.ndarray): 最良の個体 (E, D)
+        penalties (list[int]): その7種類のペナルティ
+        objective (int): その重み付きペナルティ
+        history (list[dict]): 世代ごとの統計（GeneticAlgorithm.LOG_FIELDS）
+        n_generations (int): 実行した世代数
+        elapsed (float): 所要秒数
+    """
+
+    schedule: np.ndarray
+    penalties: list[int]
+    objective: int
+    history: list[dict]
+    n_generations: int
+    elapsed: float
+
+
+class GeneticAlgorithm:
+    """
+    個体群を (N, E, D) の配列で持ち、世代ごとの操作をまとめて行う遺伝的アルゴリズム
+
+    ・初期個体群は generate_population で作り、固定したセル（fixed_shifts）はそのシフトにする（initial_population を渡すこともできる）
+    ・選択はトーナメント選択、エリートはそのまま次の世代に残す
+    ・交叉は社員の行ごと（"row"）か、社員・サイクルのブロックごと（"cycle"）に親を選ぶ一様交叉
+    ・突然変異は社員の1サイクルの勤務日を1つのシフトにまとめて変える
+      シフトはそのサイクルの勤務日のどの日でも選択可能なものから選び、なければいずれかの日で選択可能なものから選ぶ
+      （固定したセルなど、選んだシフトが選択できない日はそのままにする）
+    ・評価は PenaltyEngine.evaluate_population で個体群ごとに行い、n_workers > 1 ならプロセスに分ける
+      （1プロセスのときは PenaltyCache で評価済みの個体の計算を省く）
+
+    交叉・突然変異とも各セルは親のものか action_masks で選択可能なシフトなので、
+    初期個体群がマスクを満たしていれば子もマスクを満たす。
+    """
+
+    LOG_FIELDS = ["generation", "best", "mean", "std", "worst", "n_evaluations", "elapsed"]
+
+    def __init__(
+        self,
+        instance: ProblemInstance | None = None,
+        population_size: int = 200,
+        tournament_size: int = 3,
+        crossover: str = "row",
+        crossover_prob: float = 0.9,
+        mutation_prob: float = 0.3,
+        n_elites: int = 2,
+        weights: tuple[int, ...] = DEFAULT_WEIGHTS,
+        n_workers: int = 1,
+        seed: int | None = None,
+    ):
+        """
+        Args:
+            instance (ProblemInstance | None): 問題インスタンス。None なら consts のインスタンス
+            population_size (int): 個体数
+            tournament_size (int): トーナメントの大きさ
+            crossover (str): "row"（社員の行ごと）または "cycle"（社員・サイクルのブロックごと）
+            crossover_prob (float): 親の組を交叉する確率
+            mutation_prob (float): 子を突然変異させる確率
+            n_elites (int): そのまま次の世代に残す上位の個体数
+            weights (tuple[int, ...]): 7種類のペナルティの重み
+            n_workers (int): 評価に使うプロセス数
+            seed (int | None): 乱数のシード
+        """
+        if crossover not in ("row", "cycle"):
+            raise ValueError(f"Invalid crossover: {crossover}. Valid values are 'row', 'cycle'")
+        self.instance = get_problem_instance() if instance is None else instance
+        self.engine = get_penalty_engine(instance)
+        self.population_size = population_size
+        self.tournament_size = tournament_size
+        self.crossover = crossover
+        self.crossover_prob = crossover_prob
+        self.mutation_prob = mutation_prob
+        self.n_elites = n_elites
+        self.weights = np.asarray(weights, dtype=np.int64)
+        self.n_workers = n_workers
+        self.rng = np.random.default_rng(seed)
+        # 交叉も突然変異もしなかった子は親と同じなので、評価結果を使い回す
+        self.cache = PenaltyCache(self.engine, maxsize=4 * population_size)
+
+        inst = self.instance
+        self._cycle_id = self.engine.cycle_id
+        self._n_cycles = self._cycle_id[:, -1] + 1
+        self._work_day_mask = inst.work_day_mask
+        self._action_masks = inst.action_masks.astype(bool)
+        # 勤務日に選択可能なシフトがある社員
+        self._mutable = np.flatnonzero((self._action_masks & inst.work_day_mask[:, :, None]).any(axis=(1, 2)))
+
+    def initial_population(self) -> np.ndarray:
+        """
+        generate_population で (population_size, E, D) の初期個体群を作成します
+        """
+        population = generate_population(self.population_size, self.instance, rng=self.rng)
+        fixed = self.instance.fixed_shifts
+        return np.where(fixed >= 0, fixed, population)
+
+    def run(
+        self,
+        n_generations: int = 100,
+        time_budget: float | None = None,
+        initial_population: np.ndarray | None = None,
+        log_path: str | None = None,
+        verbose: bool = False,
+    ) -> GAResult:
+        """
+        遺伝的アルゴリズムを実行します
+
+        Args:
+            n_generations (int): 世代数の上限
+            time_budget (float | None): 秒数の上限
+            initial_population (np.ndarray | None): 初期個体群 (N, E, D) または (N, E*D)。None なら initial_population() で作る
+            log_path (str | None): 世代ごとの統計を書き出す CSV
+            verbose (bool): True なら世代ごとの統計を表示する
+
+        Returns:
+            GAResult: 最良の個体と世代ごとの統計
+        """
+        start = time.perf_counter()
+        E, D = self.instance.n_employees, self.instance.n_days
+        if initial_population is None:
+            population = self.initial_population()
+        else:
+            population = np.asarray(initial_population, dtype=np.int64).reshape(-1, E, D)
+
+        pool = None
+        if self.n_workers > 1:
+            start_method = "fork" if "fork" in mp.get_all_start_methods() else None
+            pool = mp.get_context(start_method).Pool(self.n_workers, initializer=_init_worker, initargs=(self.instance,))
+
+        log_file = None
+        writer = None
+        if log_path is not None:
+            log_file = open(log_path, "w", newline="")
+            writer = csv.DictWriter(log_file, fieldnames=self.LOG_FIELDS)
+            writer.writeheader()
+
+        history = []
+        n_evaluations = 0
+        try:
+            penalties = self._evaluate(population, pool)
+            n_evaluations += len(population)
+            generation = 0
+            while True:
+                fitness = penalties @ self.weights
+                stats = {
+                    "generation": generation,
+                    "best": int(fitness.min()),
+                    "mean": float(fitness.mean()),
+                    "std": float(fitness.std()),
+                    "worst": int(fitness.max()),
+                    "n_evaluations": n_evaluations,
+                    "elapsed": time.perf_counter() - start,
+                }
+                history.append(stats)
+                if writer is not None:
+                    writer.writerow(stats)
+                if verbose:
+                    print(f"gen {generation:5d}  best {stats['best']:8d}  mean {stats['mean']:10.2f}  std {stats['std']:8.2f}  {stats['elapsed']:7.2f}s")
+
+                if generation >= n_generations or stats["best"] == 0:
+                    break
+                if time_budget is not None and stats["elapsed"] >= time_budget:
+                    break
+
+                order = np.argsort(fitness, kind="stable")
+                elites = order[: self.n_elites]
+                offspring = self._make_offspring(population, fitness, len(population) - len(elites))
+                offspring_penalties = self._evaluate(offspring, pool)
+                n_evaluations += len(offspring)
+                population = np.concatenate([population[elites], offspring])
+                penalties = np.concatenate([penalties[elites], offspring_penalties])
+                generation += 1
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            if log_file is not None:
+                log_file.close()
+
+        best = int(np.argmin(fitness))
+        return GAResult(
+            schedule=population[best],
+            penalties=penalties[best].tolist(),
+            objective=int(fitness[best]),
+            history=history,
+            n_generations=generation,
+            elapsed=time.perf_counter() - start,
+        )
+
+    def _evaluate(self, population: np.ndarray, pool) -> np.ndarray:
+        if pool is None:
+            return self.cache.population_penalties(population)
+        # 送る量を減らすため uint8 にしてから分ける
+        chunks = np.array_split(population.astype(np.uint8), self.n_workers)
+        return np.concatenate(pool.map(_evaluate_chunk, chunks))
+
+    def _make_offspring(self, population: np.ndarray, fitness: np.ndarray, n_offspring: int) -> np.ndarray:
+        rng = self.rng
+        N, E, D = population.shape
+        n_pairs = (n_offspring + 1) // 2
+
+        # トーナメント選択
+        candidates = rng.integers(N, size=(2 * n_pairs, self.tournament_size))
+        parents = candidates[np.arange(2 * n_pairs), np.argmin(fitness[candidates], axis=1)]
+        parents1, parents2 = population[parents[:n_pairs]], population[parents[n_pairs:]]
+
+        # 交叉：どちらの親から受け継ぐかを行（社員）かサイクルごとに決める
+        if self.crossover == "row":
+            take_first = rng.random((n_pairs, E, 1)) < 0.5
+        else:
+            block = rng.random((n_pairs, E, int(self._n_cycles.max()))) < 0.5
+            take_first = np.take_along_axis(block, np.broadcast_to(self._cycle_id, (n_pairs, E, D)), axis=2)
+        no_crossover = rng.random(n_pairs) >= self.crossover_prob
+        take_first = take_first | no_crossover[:, None, None]
+        children = np.concatenate(
+            [
+                np.where(take_first, parents1, parents2),
+                np.where(take_first, parents2, parents1),
+            ]
+        )[:n_offspring]
+
+        self._mutate(children)
+        return children
+
+    def _mutate(self, children: np.ndarray) -> None:
+        # 社員の1サイクルの勤務日を、選択可能なシフトのうちランダムな1つにまとめて変える
+        rng = self.rng
+        if len(self._mutable) == 0:
+            return
+        targets = np.flatnonzero(rng.random(len(children)) < self.mutation_prob)
+        if len(targets) == 0:
+            return
+        e = rng.choice(self._mutable, size=len(targets))
+        cycle = (rng.random(len(targets)) * self._n_cycles[e]).astype(np.int64)
+        cells = (self._cycle_id[e] == cycle[:, None]) & self._work_day_mask[e]
+
+        # サイクルの勤務日のどの日でも選択可能なシフト。なければいずれかの日で選択可能なシフト
+        masks = self._action_masks[e] & cells[:, :, None]
+        common = np.where(cells[:, :, None], masks, True).all(axis=1) & cells.any(axis=1)[:, None]
+        allowed = np.where(common.any(axis=1)[:, None], common, masks.any(axis=1))
+        scores = np.where(allowed, rng.random(allowed.shape), -1.0)
+        new_shift = scores.argmax(axis=1)
+
+        # 選んだシフトが選択できるセルだけを変える（選択可能なシフトがないサイクルは変えない）
+        days = np.arange(cells.shape[1])
+        cells &= self._action_masks[e[:, None], days[None, :], new_shift[:, None]]
+        children[targets, e] = np.where(cells, new_shift[:, None], children[targets, e])
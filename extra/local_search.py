@@ -0,0 +1,241 @@
+import math
+import random
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from consts import ProblemInstance, get_problem_instance
+from .delta_evaluator import DeltaEvaluator
+from .funcs import get_penalty_engine
+
+# 7種類のペナルティの重み（evalShift のコメントにある全体評価 c1 + c2 + c3 + c4 + 2 * c5 + c6 + c7）
+DEFAULT_WEIGHTS = (1, 1, 1, 1, 2, 1, 1)
+
+# evalShift（SchedulerEnv の報酬）と同じ c1 + c4
+EVAL_SHIFT_WEIGHTS = (1, 0, 0, 1, 0, 0, 0)
+
+
+class LocalSearchResult(NamedTuple):
+    """
+    Attributes:
+        schedule (np.ndarray): 見つかった最良のスケジュール (E, D)
+        penalties (list[int]): その7種類のペナルティ
+        objective (int): その重み付きペナルティ
+        initial_objective (int): マスクに合わせた後の初期スケジュールの重み付きペナルティ
+        n_iters (int): 試した近傍の数
+        n_accepted (int): 受理した近傍の数
+        elapsed (float): 所要秒数
+    """
+
+    schedule: np.ndarray
+    penalties: list[int]
+    objective: int
+    initial_objective: int
+    n_iters: int
+    n_accepted: int
+    elapsed: float
+
+
+class LocalSearch:
+    """
+    焼きなまし法でスケジュールを改善するクラス
+
+    近傍は次の3種類で、いずれも ProblemInstance.action_masks（SchedulerEnv のアクションマスク）で
+    選択可能なシフトだけを使う。ペナルティは DeltaEvaluator で差分更新する。
+        cell   1セルのシフトを変更
+        cycle  ある社員の1サイクルの勤務日をまとめて同じシフトに変更
+        swap   同じ日の2人のシフトを入れ替え
+
+    マスクで選択できないシフトが入った初期スケジュールは、先にマスクに合わせて直してから探索する。
+    """
+
+    MOVES = ("cell", "cycle", "swap")
+
+    def __init__(
+        self,
+        instance: ProblemInstance | None = None,
+        weights: tuple[int, ...] = DEFAULT_WEIGHTS,
+        move_probs: tuple[float, float, float] = (0.6, 0.2, 0.2),
+        seed: int | None = None,
+    ):
+        """
+        Args:
+            instance (ProblemInstance | None): 問題インスタンス。None なら consts のインスタンス
+            weights (tuple[int, ...]): 7種類のペナルティの重み
+            move_probs (tuple[float, float, float]): cell / cycle / swap の近傍を選ぶ確率
+            seed (int | None): 乱数のシード
+        """
+        self.instance = get_problem_instance() if instance is None else instance
+        self.engine = get_penalty_engine(instance)
+        self.weights = tuple(weights)
+        self.move_probs = tuple(move_probs)
+        self.rng = random.Random(seed)
+
+        inst = self.instance
+        masks = inst.action_masks.astype(bool)
+        # (社員, 日) ごとに選択可能なシフト
+        self._allowed = [[np.flatnonzero(masks[e, d]).tolist() for d in range(inst.n_days)] for e in range(inst.n_employees)]
+        # 2つ以上のシフトから選べるセル
+        self._free_cells = [(e, d) for e in range(inst.n_employees) for d in range(inst.n_days) if len(self._allowed[e][d]) > 1]
+        self._free_by_day = [[e for e in range(inst.n_employees) if len(self._allowed[e][d]) > 1] for d in range(inst.n_days)]
+        self._swap_days = [d for d in range(inst.n_days) if len(self._free_by_day[d]) > 1]
+        # (社員, サイクル) ごとの選べるセルと、それらすべてで選択可能なシフト
+        self._cycles = []
+        for e in range(inst.n_employees):
+            cycle_days = {}
+            for d, c in enumerate(self.engine.cycle_id[e].tolist()):
+                if len(self._allowed[e][d]) > 1:
+                    cycle_days.setdefault(c, []).append(d)
+            for days in cycle_days.values():
+                common = set(self._allowed[e][days[0]]).intersection(*(self._allowed[e][d] for d in days[1:]))
+                if len(common) > 1:
+                    self._cycles.append((e, days, sorted(common)))
+
+    def repair(self, schedule) -> np.ndarray:
+        """
+        マスクで選択できないシフトを、選択可能なシフトに置き換えたスケジュールを返します
+        置き換え先は、同じ社員・同じサイクルで最も多い選択可能なシフト（なければ選択可能な最初のシフト）
+        """
+        schedule = self.engine.to_schedule(schedule).copy()
+        cycle_id = self.engine.cycle_id
+        for e in range(self.instance.n_employees):
+            for d in range(self.instance.n_days):
+                allowed = self._allowed[e][d]
+                if schedule[e, d] in allowed:
+                    continue
+                in_cycle = schedule[e, cycle_id[e] == cycle_id[e, d]]
+                counts = [(int(np.count_nonzero(in_cycle == s)), -i) for i, s in enumerate(allowed)]
+                schedule[e, d] = allowed[-max(counts)[1]]
+        return schedule
+
+    def improve(
+        self,
+        schedule,
+        time_budget: float = 10.0,
+        max_iters: int | None = None,
+        t_start: float = 2.0,
+        t_end: float = 0.05,
+    ) -> LocalSearchResult:
+        """
+        焼きなまし法でスケジュールを改善します
+
+        Args:
+            schedule: 初期スケジュール。(E, D) の配列または長さ E*D の個体リスト
+            time_budget (float): 探索する秒数
+            max_iters (int | None): 試す近傍の数の上限。指定すると温度はこの回数に対して下げる
+            t_start (float): 初期温度
+            t_end (float): 最終温度
+
+        Returns:
+            LocalSearchResult: 見つかった最良のスケジュールとペナルティ
+        """
+        start = time.perf_counter()
+        evaluator = DeltaEvaluator(self.repair(schedule), engine=self.engine)
+        weights = self.weights
+        rng = self.rng
+        moves = [self._move_cell, self._move_cycle, self._move_swap]
+        available = [bool(self._free_cells), bool(self._cycles), bool(self._swap_days)]
+        move_probs = [p if ok else 0.0 for p, ok in zip(self.move_probs, available)]
+
+        objective = initial_objective = self._objective(evaluator.penalties)
+        # best_schedule が None の間は、現在のスケジュールが最良
+        best_objective, best_schedule, best_penalties = objective, None, None
+        n_iters = n_accepted = 0
+        temperature = t_start
+        if sum(move_probs) == 0:
+            max_iters = 0
+
+        while max_iters is None or n_iters < max_iters:
+            # 温度の更新と時間の確認は 256 回ごとに行う
+            if n_iters % 256 == 0:
+                elapsed = time.perf_counter() - start
+                if elapsed >= time_budget or best_objective == 0:
+                    break
+                progress = n_iters / max_iters if max_iters is not None else elapsed / time_budget
+                temperature = t_start * (t_end / t_start) ** min(progress, 1.0)
+            n_iters += 1
+
+            changes = rng.choices(moves, weights=move_probs)[0](evaluator)
+            if not changes:
+                continue
+            # 1セルの変更は状態を変えずに差分を求め、複数セルの変更は適用してから判定する
+            single = len(changes) == 1
+            if single:
+                e, d, _, new_shift = changes[0]
+                diff = evaluator.delta(e, d, new_shift)
+            else:
+                diff = self._apply(evaluator, changes)
+            delta = sum(w * dp for w, dp in zip(weights, diff))
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                if delta > 0 and best_schedule is None:
+                    # 最良のスケジュールから離れる直前にだけ保存する
+                    best_schedule, best_penalties = self._before_copy(evaluator, changes, diff, applied=not single)
+                if single:
+                    evaluator.apply(e, d, new_shift)
+                objective += delta
+                n_accepted += 1
+                if objective < best_objective:
+                    best_objective, best_schedule = objective, None
+            elif not single:
+                self._revert(evaluator, changes)
+
+        if best_schedule is None:
+            best_schedule, best_penalties = evaluator.schedule, list(evaluator.penalties)
+        return LocalSearchResult(
+            schedule=np.asarray(best_schedule, dtype=np.int64),
+            penalties=best_penalties,
+            objective=best_objective,
+            initial_objective=initial_objective,
+            n_iters=n_iters,
+            n_accepted=n_accepted,
+            elapsed=time.perf_counter() - start,
+        )
+
+    def _objective(self, penalties: list[int]) -> int:
+        return sum(w * p for w, p in zip(self.weights, penalties))
+
+    """以下の近傍は [(社員, 日, 変更前のシフト, 変更後のシフト), ...] を返す（変更がなければ空）"""
+
+    def _move_cell(self, evaluator: DeltaEvaluator) -> list[tuple[int, int, int, int]]:
+        e, d = self.rng.choice(self._free_cells)
+        old_shift = evaluator.shift_at(e, d)
+        new_shift = self.rng.choice(self._allowed[e][d])
+        if new_shift == old_shift:
+            return []
+        return [(e, d, old_shift, new_shift)]
+
+    def _move_cycle(self, evaluator: DeltaEvaluator) -> list[tuple[int, int, int, int]]:
+        e, days, common = self.rng.choice(self._cycles)
+        new_shift = self.rng.choice(common)
+        return [(e, d, evaluator.shift_at(e, d), new_shift) for d in days if evaluator.shift_at(e, d) != new_shift]
+
+    def _move_swap(self, evaluator: DeltaEvaluator) -> list[tuple[int, int, int, int]]:
+        d = self.rng.choice(self._swap_days)
+        e1, e2 = self.rng.sample(self._free_by_day[d], 2)
+        s1, s2 = evaluator.shift_at(e1, d), evaluator.shift_at(e2, d)
+        if s1 == s2 or s2 not in self._allowed[e1][d] or s1 not in self._allowed[e2][d]:
+            return []
+        return [(e1, d, s1, s2), (e2, d, s2, s1)]
+
+    @staticmethod
+    def _apply(evaluator: DeltaEvaluator, changes: list[tuple[int, int, int, int]]) -> list[int]:
+        diff = [0] * len(evaluator.penalties)
+        for e, d, _, new_shift in changes:
+            diff = [x + y for x, y in zip(diff, evaluator.apply(e, d, new_shift))]
+        return diff
+
+    @staticmethod
+    def _revert(evaluator: DeltaEvaluator, changes: list[tuple[int, int, int, int]]) -> None:
+        for e, d, old_shift, _ in reversed(changes):
+            evaluator.apply(e, d, old_shift)
+
+    @staticmethod
+    def _before_copy(evaluator: DeltaEvaluator, changes: list[tuple[int, int, int, int]], diff: list[int], applied: bool) -> tuple[list[list[int]], list[int]]:
+        # 変更前のスケジュールとペナルティのコピー（評価器の状態は変えない）
+        rows = evaluator.to_list()
+        if not applied:
+            return rows, list(evaluator.penalties)
+        for e, d, old_shift, _ in changes:
+            rows[e][d] = old_shift
+        return rows, [p - dp for p, dp in zip(evaluator.penalties, diff)]
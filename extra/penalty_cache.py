@@ -0,0 +1,158 @@
+import hashlib
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+from .penalty_engine import PenaltyEngine
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class PenaltyCache:
+    """
+    スケジュールのバイト列のハッシュをキーに、7種類のペナルティを保持する LRU キャッシュ
+
+    evalShift は必要な c1 と c4 だけを計算して保存し（subset）、残りは未計算（None）のままにする。
+    get_penalties（penalties）はキャッシュにあればそれを使い、未計算の分だけを計算して埋める。
+    そのため、環境の終端の評価の後の render や EvalCallback は、同じシフト表の c1 と c4 を計算し直さない。
+    キーは uint8 にしたスケジュールの BLAKE2b（16バイト）なので、保持するのはキーとペナルティだけ。
+    maxsize が 0 のときは何も保持しない。
+
+    Attributes:
+        engine (PenaltyEngine): 評価エンジン
+        maxsize (int): 保持するスケジュールの数の上限
+        hits (int): キャッシュにあった（一部でも計算済みだった）回数
+        misses (int): キャッシュになく、計算した回数
+    """
+
+    def __init__(self, engine: PenaltyEngine, maxsize: int = 4096):
+        self.engine = engine
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, tuple[int | None, ...]] = OrderedDict()
+        # ペナルティの並びと同じ順番の、1種類ずつ計算する関数
+        self._counters = (
+            engine.count_assigned_holiday_on_weekdays,
+            engine.count_assigned_not_have_required_skill,
+            engine.count_assinged_shift_on_holiday,
+            engine.count_ignore_cycle,
+            engine.count_ignore_shift_transition_constraint,
+            engine.count_difference_need_and_actual,
+            engine.count_not_assigned_holiday_on_cycle,
+        )
+
+    def subset(self, individual, indices: tuple[int, ...]) -> tuple[int, ...]:
+        """
+        indices の位置のペナルティだけを返します（evalShift の c1 と c4 なら (0, 3)）
+        キャッシュになければその分だけを計算し、残りは未計算のまま保存する
+        """
+        schedule = np.asarray(individual, dtype=np.uint8)
+        key = self.key(schedule)
+        entries = self._entries
+        penalties = entries.get(key)
+        if penalties is None:
+            self.misses += 1
+            penalties = (None,) * PenaltyEngine.N_PENALTIES
+        else:
+            self.hits += 1
+            entries.move_to_end(key)
+            if all(penalties[i] is not None for i in indices):
+                return tuple(penalties[i] for i in indices)
+
+        penalties = self._fill(schedule, penalties, indices)
+        self._store(key, penalties)
+        return tuple(penalties[i] for i in indices)
+
+    def penalties(self, individual) -> tuple[int, ...]:
+        """
+        個体（長さ E*D のリスト、または (E, D) の配列）の7種類のペナルティを返します
+        """
+        schedule = np.asarray(individual, dtype=np.uint8)
+        key = self.key(schedule)
+        entries = self._entries
+        penalties = entries.get(key)
+        if penalties is None:
+            self.misses += 1
+            penalties = tuple(self.engine.evaluate(self.engine.to_schedule(schedule)).tolist())
+        else:
+            self.hits += 1
+            entries.move_to_end(key)
+            if None not in penalties:
+                return penalties
+            # evalShift が保存した途中の結果なら、足りない分だけを計算する
+            penalties = self._fill(schedule, penalties, range(PenaltyEngine.N_PENALTIES))
+        self._store(key, penalties)
+        return penalties
+
+    def population_penalties(self, population) -> np.ndarray:
+        """
+        個体群 (N, E*D) または (N, E, D) の (N, 7) のペナルティを返します
+        キャッシュにない個体だけをまとめて PenaltyEngine.evaluate_population で計算する
+        """
+        population = np.asarray(population, dtype=np.uint8).reshape(-1, self.engine.n_employees * self.engine.n_days)
+        result = np.empty((len(population), PenaltyEngine.N_PENALTIES), dtype=np.int64)
+        keys = [self.key(row) for row in population]
+        entries = self._entries
+        missing = []
+        for i, key in enumerate(keys):
+            penalties = entries.get(key)
+            if penalties is None or None in penalties:
+                missing.append(i)
+            else:
+                entries.move_to_end(key)
+                result[i] = penalties
+        self.hits += len(population) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            computed = self.engine.evaluate_population(population[missing])
+            result[missing] = computed
+            for i, penalties in zip(missing, computed.tolist()):
+                self._store(keys[i], tuple(penalties))
+        return result
+
+    @staticmethod
+    def key(schedule: np.ndarray) -> bytes:
+        # uint8 のスケジュールのバイト列のハッシュ
+        return hashlib.blake2b(np.ascontiguousarray(schedule, dtype=np.uint8).data, digest_size=16).digest()
+
+    def resize(self, maxsize: int) -> None:
+        # 上限を変え、超えた分は古いものから捨てる
+        self.maxsize = maxsize
+        while len(self._entries) > max(maxsize, 0):
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(hits=self.hits, misses=self.misses, maxsize=self.maxsize, currsize=len(self._entries))
+
+    def _fill(self, schedule: np.ndarray, penalties: tuple[int | None, ...], indices) -> tuple[int | None, ...]:
+        # indices の位置のうち未計算のものを計算して埋める
+        penalties = list(penalties)
+        missing = [i for i in indices if penalties[i] is None]
+        if missing:
+            schedule = self.engine.to_schedule(schedule)
+            for i in missing:
+                penalties[i] = self._counters[i](schedule)
+        return tuple(penalties)
+
+    def _store(self, key: bytes, penalties: tuple[int | None, ...]) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = penalties
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
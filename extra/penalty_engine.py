@@ -0,0 +1,284 @@
+import numpy as np
+from consts import ProblemInstance, get_problem_instance
+
+
+class PenaltyEngine:
+    """
+    Variables の count_* と同じ7種類のペナルティを NumPy の配列演算で計算するクラス
+
+    スケジュールは (社員数, 日数) の整数配列（各要素がシフト idx）として受け取る。
+    休日マスク・サイクル番号行列などの固定情報は生成時に一度だけ作成し、
+    評価時は bincount と遷移NG表の参照だけで計算する。
+
+    Attributes:
+        work_day_mask (np.ndarray): (E, D) 労働日なら True
+        rest_day_mask (np.ndarray): (E, D) 休日なら True
+        skill_forbidden (np.ndarray): (E, S) スキル上割り当てられないシフトなら True
+        weekday_mask (np.ndarray): (D,) 平日なら True
+        min_worker (np.ndarray): (S,) 各シフトの最小人数
+        max_worker (np.ndarray): (S,) 各シフトの最大人数
+        forbidden_transitions (np.ndarray): (S, S) 前サイクル -> 今サイクルの遷移NGなら True
+        rest_shift_idx (int): 休みシフト（"O"）の idx
+        cycle_id (np.ndarray): (E, D) サイクル終了日（休->休）か最終日で区切ったサイクル番号
+        rest_cycle_id (np.ndarray): (E, D) サイクル終了日（働->休）で区切ったサイクル番号。最後の未完了サイクルは -1
+    """
+
+    N_PENALTIES = 7
+
+    def __init__(
+        self,
+        work_day_mask: np.ndarray,
+        cycle_end_rest_to_rest: np.ndarray,
+        cycle_end_work_to_rest: np.ndarray,
+        skill_forbidden: np.ndarray,
+        weekend: np.ndarray,
+        min_worker: np.ndarray,
+        max_worker: np.ndarray,
+        forbidden_transitions: np.ndarray,
+        rest_shift_idx: int,
+    ):
+        self.work_day_mask = np.asarray(work_day_mask, dtype=bool)
+        self.rest_day_mask = ~self.work_day_mask
+        self.n_employees, self.n_days = self.work_day_mask.shape
+        self.skill_forbidden = np.asarray(skill_forbidden, dtype=bool)
+        self.n_shifts = self.skill_forbidden.shape[1]
+        self.weekday_mask = ~np.asarray(weekend, dtype=bool)
+        self.min_worker = np.asarray(min_worker, dtype=np.int64)
+        self.max_worker = np.asarray(max_worker, dtype=np.int64)
+        self.forbidden_transitions = np.asarray(forbidden_transitions, dtype=bool)
+        self.rest_shift_idx = int(rest_shift_idx)
+
+        cycle_end_rest_to_rest = np.asarray(cycle_end_rest_to_rest, dtype=bool)
+        cycle_end_work_to_rest = np.asarray(cycle_end_work_to_rest, dtype=bool)
+        final_day = np.zeros(self.n_days, dtype=bool)
+        final_day[-1] = True
+
+        E, D, S = self.n_employees, self.n_days, self.n_shifts
+        self._employee_col = np.arange(E, dtype=np.int64)[:, None]
+
+        # count_assigned_not_have_required_skill 用：(社員, シフト) を1次元に並べた参照表
+        self._skill_forbidden_flat = self.skill_forbidden.ravel()
+        self._skill_key = self._employee_col * S
+
+        # count_ignore_cycle 用：サイクル終了日（休->休）か最終日で区切ったサイクル番号行列
+        # 区切り日はそのサイクルに含まれる。集計はシフト優先の並び (S, E * サイクル数) で行う
+        cycle_flush = cycle_end_rest_to_rest | final_day[None, :]
+        cycle_id = np.cumsum(cycle_flush, axis=1) - cycle_flush
+        self.cycle_id = cycle_id
+        n_cycles = int(cycle_id.max()) + 1
+        self._n_cycle_rows = E * n_cycles
+        self._cycle_key = self._employee_col * n_cycles + cycle_id
+        self._shift_col = np.arange(S, dtype=np.int64)[:, None]
+
+        # count_ignore_shift_transition_constraint 用：休み以外のシフトが入った区切り候補日だけが実際の区切りになる
+        # 区切り候補日を社員ごとに詰めた (E, K) の位置と、各日より前にある候補日の数を持っておく
+        # 区切りごとの集計は (S, E, K + 1) で、区切り番号 0（最初の区切りまでと最後の区切り以降）は後で捨てる
+        n_candidates = cycle_flush.sum(axis=1)
+        K = int(n_candidates.max())
+        candidate_days = np.full((E, K), D - 1, dtype=np.int64)
+        self._candidate_valid = np.arange(K)[None, :] < n_candidates[:, None]
+        for e in range(E):
+            candidate_days[e, : n_candidates[e]] = np.flatnonzero(cycle_flush[e])
+        self._candidate_flat = self._employee_col * D + candidate_days
+        candidate_rank = np.cumsum(cycle_flush, axis=1) - cycle_flush
+        self._candidate_rank_flat = self._employee_col * K + candidate_rank
+        self._n_segments = K + 1
+        self._segment_row = self._employee_col * self._n_segments
+        self._transition_previous, self._transition_current = np.nonzero(self.forbidden_transitions)
+
+        # count_not_assigned_holiday_on_cycle 用：サイクル終了日（働->休）で区切る
+        # 最後の未完了サイクルは対象外なので、そのセルは末尾の捨てビンに向ける
+        rest_cycle_id = np.cumsum(cycle_end_work_to_rest, axis=1) - cycle_end_work_to_rest
+        n_rest_cycles = cycle_end_work_to_rest.sum(axis=1)
+        rest_cycle_valid = rest_cycle_id < n_rest_cycles[:, None]
+        self.rest_cycle_id = np.where(rest_cycle_valid, rest_cycle_id, -1)
+        self._n_rest_cycle_rows = E * D
+        self._rest_cycle_key = np.where(rest_cycle_valid, self._employee_col * D + rest_cycle_id, self._n_rest_cycle_rows) * 2
+        self._n_complete_rest_cycles = int(n_rest_cycles.sum())
+
+        # count_difference_need_and_actual 用：(日, シフト) のキーと対象シフト（休み以外）
+        self._day_key = (np.arange(D, dtype=np.int64) * S)[None, :]
+        self._coverage_shift_mask = np.ones(S, dtype=bool)
+        self._coverage_shift_mask[self.rest_shift_idx] = False
+
+    @classmethod
+    def from_instance(cls, instance: ProblemInstance | None = None) -> "PenaltyEngine":
+        """
+        問題インスタンスの配列からエンジンを作成します
+
+        Args:
+            instance (ProblemInstance | None): 問題インスタンス。None なら consts から作ったものを使う
+        """
+        if instance is None:
+            instance = get_problem_instance()
+        return cls(
+            work_day_mask=instance.work_day_mask,
+            cycle_end_rest_to_rest=instance.cycle_end_rest_to_rest,
+            cycle_end_work_to_rest=instance.cycle_end_work_to_rest,
+            skill_forbidden=instance.skill_forbidden,
+            weekend=instance.weekend,
+            min_worker=instance.min_worker,
+            max_worker=instance.max_worker,
+            forbidden_transitions=instance.forbidden_transitions,
+            rest_shift_idx=instance.rest_shift_idx,
+        )
+
+    def to_schedule(self, individual) -> np.ndarray:
+        """
+        個体（長さ E*D のリスト、社員ごとに日が並ぶ）を (E, D) の整数配列に変換します
+        """
+        return np.asarray(individual, dtype=np.int64).reshape(self.n_employees, self.n_days)
+
+    def count_assigned_holiday_on_weekdays(self, schedule: np.ndarray) -> int:
+        # 勤務日に割り当てられた休みをカウント
+        return int(self._count_assigned_holiday_on_weekdays(self._as_population(schedule))[0])
+
+    def count_assigned_not_have_required_skill(self, schedule: np.ndarray) -> int:
+        # 必要なスキルを持っていない人が割り当てられた回数をカウント
+        return int(self._count_assigned_not_have_required_skill(self._as_population(schedule))[0])
+
+    def count_assinged_shift_on_holiday(self, schedule: np.ndarray) -> int:
+        # 休日にシフトが割り当てられている数をカウント
+        return int(self._count_assinged_shift_on_holiday(self._as_population(schedule))[0])
+
+    def count_ignore_cycle(self, schedule: np.ndarray) -> int:
+        # 1サイクルで1シフトの制約を無視した回数をカウント
+        return int(self._count_ignore_cycle(self._as_population(schedule))[0])
+
+    def count_ignore_shift_transition_constraint(self, schedule: np.ndarray) -> int:
+        # シフトの遷移制限を無視した回数をカウントする
+        return int(self._count_ignore_shift_transition_constraint(self._as_population(schedule))[0])
+
+    def count_difference_need_and_actual(self, schedule: np.ndarray) -> int:
+        # 各シフトの人数制限と割り当てられた人数の差分を取得する
+        return int(self._count_difference_need_and_actual(self._as_population(schedule))[0])
+
+    def count_not_assigned_holiday_on_cycle(self, schedule: np.ndarray) -> int:
+        # 1サイクルで1日以上休みがない人数をカウント
+        return int(self._count_not_assigned_holiday_on_cycle(self._as_population(schedule))[0])
+
+    def evaluate(self, schedule: np.ndarray) -> np.ndarray:
+        """
+        7種類のペナルティを get_penalties と同じ順番で計算します
+
+        Args:
+            schedule (np.ndarray): (E, D) のシフト idx 配列
+
+        Returns:
+            np.ndarray: (7,) のペナルティ配列
+        """
+        return self._evaluate_population(self._as_population(schedule))[0]
+
+    def evaluate_population(self, population: np.ndarray, chunk_size: int | None = None) -> np.ndarray:
+        """
+        個体群のペナルティをまとめて計算します
+
+        Args:
+            population (np.ndarray): (N, E, D) のシフト idx 配列。(N, E * D) の個体リストも可
+            chunk_size (int | None): 一度に評価する個体数の上限。None なら全個体を一度に評価する
+                （作業用配列は個体数に比例するので、メモリを抑えたいときに指定する）
+
+        Returns:
+            np.ndarray: (N, 7) のペナルティ配列
+        """
+        population = np.asarray(population).reshape(-1, self.n_employees, self.n_days)
+        n_individuals = population.shape[0]
+        if chunk_size is None or chunk_size >= n_individuals:
+            return self._evaluate_population(population.astype(np.int64, copy=False))
+        if chunk_size < 1:
+            raise ValueError(f"Invalid chunk_size: {chunk_size}. chunk_size should be >= 1")
+
+        result = np.empty((n_individuals, self.N_PENALTIES), dtype=np.int64)
+        for start in range(0, n_individuals, chunk_size):
+            chunk = population[start : start + chunk_size].astype(np.int64, copy=False)
+            result[start : start + chunk_size] = self._evaluate_population(chunk)
+        return result
+
+    def _as_population(self, schedule: np.ndarray) -> np.ndarray:
+        return np.asarray(schedule, dtype=np.int64).reshape(1, self.n_employees, self.n_days)
+
+    def _evaluate_population(self, population: np.ndarray) -> np.ndarray:
+        return np.stack(
+            [
+                self._count_assigned_holiday_on_weekdays(population),
+                self._count_assigned_not_have_required_skill(population),
+                self._count_assinged_shift_on_holiday(population),
+                self._count_ignore_cycle(population),
+                self._count_ignore_shift_transition_constraint(population),
+                self._count_difference_need_and_actual(population),
+                self._count_not_assigned_holiday_on_cycle(population),
+            ],
+            axis=1,
+        )
+
+    """以下は (N, E, D) の int64 配列を受け取り、個体ごとの (N,) 配列を返す"""
+
+    def _count_assigned_holiday_on_weekdays(self, population: np.ndarray) -> np.ndarray:
+        return self._count_true(self.work_day_mask & (population == self.rest_shift_idx))
+
+    def _count_assigned_not_have_required_skill(self, population: np.ndarray) -> np.ndarray:
+        forbidden = self._skill_forbidden_flat[self._skill_key + population]
+        return self._count_true(self.work_day_mask & forbidden)
+
+    def _count_assinged_shift_on_holiday(self, population: np.ndarray) -> np.ndarray:
+        return self._count_true(self.rest_day_mask & (population != self.rest_shift_idx))
+
+    def _count_ignore_cycle(self, population: np.ndarray) -> np.ndarray:
+        # サイクルごとに登場したシフトの種類数 n と最小 idx を求め、n > 1 なら n * 最小 idx
+        N, S, R = population.shape[0], self.n_shifts, self._n_cycle_rows
+        key = self._individual_key(N, S * R) + population * R + self._cycle_key
+        present = np.bincount(key.ravel(), minlength=N * S * R).reshape(N, S, R) > 0
+        n_kinds = present.sum(axis=1, dtype=np.int64)
+        min_idx = np.where(present, self._shift_col, S).min(axis=1)
+        return np.where(n_kinds > 1, n_kinds * min_idx, 0).sum(axis=1)
+
+    def _count_ignore_shift_transition_constraint(self, population: np.ndarray) -> np.ndarray:
+        # Variables と同じく、休み以外のシフトが入ったサイクル終了日（または最終日）で区切り、
+        # 最初の区切りまでは数えず、以降は区切りごとの集計に遷移NG表を当てる
+        N, E, S = population.shape[0], self.n_employees, self.n_shifts
+        working = (population != self.rest_shift_idx).reshape(N, -1)
+        flush = working[:, self._candidate_flat] & self._candidate_valid
+        n_flush_until = np.cumsum(flush, axis=2)
+        n_flush_before = n_flush_until - flush
+        # 最後の区切り以降のセルも区切り番号 0 に寄せる
+        n_flush_before[n_flush_before == n_flush_until[..., -1:]] = 0
+        segment = n_flush_before.reshape(N, -1)[:, self._candidate_rank_flat]
+
+        # 休みのセル・区切り番号 0 のセルは、集計後にまとめて 0 にする
+        R = E * self._n_segments
+        key = self._individual_key(N, S * R) + population * R + self._segment_row + segment
+        counts = np.bincount(key.ravel(), minlength=N * S * R).reshape(N, S, E, self._n_segments)
+        counts[:, self.rest_shift_idx] = 0
+        counts[..., 0] = 0
+        violated = counts[:, self._transition_current] * (counts[:, self._transition_previous] > 0)
+        return violated.sum(axis=(1, 2, 3))
+
+    def _count_difference_need_and_actual(self, population: np.ndarray) -> np.ndarray:
+        # 平日・休み以外のシフトについて、人数が min と max の間に入っていなければその差分
+        N, D, S = population.shape[0], self.n_days, self.n_shifts
+        key = self._individual_key(N, D * S) + self._day_key + population
+        coverage = np.bincount(key.ravel(), minlength=N * D * S).reshape(N, D, S)
+        coverage = coverage[:, self.weekday_mask][..., self._coverage_shift_mask]
+        min_worker = self.min_worker[self._coverage_shift_mask]
+        max_worker = self.max_worker[self._coverage_shift_mask]
+        penalty = np.where(coverage < min_worker, min_worker - coverage, np.where(coverage > max_worker, coverage - max_worker, 0))
+        return penalty.sum(axis=(1, 2))
+
+    def _count_not_assigned_holiday_on_cycle(self, population: np.ndarray) -> np.ndarray:
+        # (サイクル, 休みかどうか) の組で数え、休みが1日もない完了サイクルの数を求める
+        N, R = population.shape[0], 2 * (self._n_rest_cycle_rows + 1)
+        key = self._individual_key(N, R) + self._rest_cycle_key + (population == self.rest_shift_idx)
+        counts = np.bincount(key.ravel(), minlength=N * R).reshape(N, -1, 2)
+        return self._n_complete_rest_cycles - np.count_nonzero(counts[:, :-1, 1], axis=1)
+
+    @staticmethod
+    def _count_true(mask: np.ndarray) -> np.ndarray:
+        # 個体ごとに True の数を数える。1個体なら軸指定なしの count_nonzero の方がずっと速い
+        if mask.shape[0] == 1:
+            return np.array([np.count_nonzero(mask)])
+        return np.count_nonzero(mask.reshape(mask.shape[0], -1), axis=1)
+
+    @staticmethod
+    def _individual_key(n_individuals: int, stride: int) -> np.ndarray:
+        # bincount のキーを個体ごとにずらすためのオフセット
+        return (np.arange(n_individuals, dtype=np.int64) * stride)[:, None, None]
@@ -0,0 +1,64 @@
+import numpy as np
+
+from consts import ProblemInstance, get_problem_instance
+
+
+def generate_population(
+    n_individuals: int,
+    instance: ProblemInstance | None = None,
+    rng: np.random.Generator | int | None = None,
+    dtype=np.int64,
+) -> np.ndarray:
+    """
+    Variables.generate_individual と同じ規則の個体を n_individuals 個まとめて作成します
+
+    ・休日は休み、勤務日はサイクルのシフト（NGシフト・スキル上NGのシフトと休み以外から一様に選ぶ）
+    ・サイクル終了日（休->休）ごとに、前のシフトから遷移NGでないシフトを選び直す
+      （遷移NGでないシフトが1つもなければ、遷移は無視して選ぶ）
+
+    Args:
+        n_individuals (int): 個体数
+        instance (ProblemInstance | None): 問題インスタンス。None なら consts のインスタンス
+        rng (np.random.Generator | int | None): 乱数生成器またはシード。
+            ワーカーごとに再現性のある別の系列を使うときは np.random.default_rng([seed, worker_id]) などを渡す
+        dtype: 返す配列の型（大きな個体群なら np.uint8 でメモリを抑えられる）
+
+    Returns:
+        np.ndarray: (n_individuals, E, D) のシフト idx 配列
+    """
+    instance = get_problem_instance() if instance is None else instance
+    rng = np.random.default_rng(rng)
+    N, E, S = n_individuals, instance.n_employees, instance.n_shifts
+
+    # 社員ごとに勤務日に選択可能なシフト
+    ok_shift = ~instance.forbidden_mask
+    ok_shift[:, instance.rest_shift_idx] = False
+    if not ok_shift.any(axis=1).all():
+        e = int(np.flatnonzero(~ok_shift.any(axis=1))[0])
+        raise Exception(f"利用可能なシフトがありません：{instance.employees[e]}")
+
+    # 前の区間のシフト（S は最初の区間を表す）ごとに、次の区間に選べるシフトの表
+    # next_shift[e, p, :n_next[e, p]] が選べるシフト
+    allowed = np.concatenate([ok_shift[:, None, :] & ~instance.forbidden_transitions[None, :, :], ok_shift[:, None, :]], axis=1)
+    # 遷移NGでないシフトがなければ、選択可能なシフトすべてから選ぶ
+    allowed = np.where(allowed.any(axis=2, keepdims=True), allowed, ok_shift[:, None, :])
+    n_next = allowed.sum(axis=2)
+    next_shift = np.argsort(~allowed, axis=2, kind="stable")
+
+    # サイクル終了日（休->休）で区切った区間ごとに1つのシフトを選ぶ
+    segment = np.cumsum(instance.cycle_end_rest_to_rest, axis=1)
+    n_segments = int(segment.max()) + 1 if segment.size else 1
+    employee = np.arange(E)[None, :]
+    segment_shift = np.empty((N, E, n_segments), dtype=dtype)
+    previous = np.full((N, E), S)
+    for k in range(n_segments):
+        choice = (rng.random((N, E)) * n_next[employee, previous]).astype(np.int64)
+        previous = next_shift[employee, previous, choice]
+        segment_shift[:, :, k] = previous
+
+    # 各セルが参照する (社員, 区間) の位置。休日は休みの列を参照する
+    # 最後の列は休日に入れる休み
+    flat = segment_shift.reshape(N, E * n_segments)
+    flat = np.concatenate([flat, np.full((N, 1), instance.rest_shift_idx, dtype=dtype)], axis=1)
+    cell_index = np.where(instance.rest_day_mask, E * n_segments, np.arange(E)[:, None] * n_segments + segment)
+    return np.take(flat, cell_index.ravel(), axis=1).reshape(N, E, instance.n_days)
@@ -0,0 +1,152 @@
+import csv
+import time
+
+from .penalty_engine import PenaltyEngine
+
+
+class Profiler:
+    """
+    評価関数・環境の呼び出し回数と累積時間を記録するプロファイラ
+
+    enable() で対象のメソッドを計測用のラッパーに差し替え、disable() で元に戻す。
+    無効のときは元のメソッドのままなので、計測のコストはかからない。
+    計測はプロセスごとに行う（SubprocVecEnv のワーカーの分は SchedulerEnv.get_profile で集める）。
+
+    記録する名前:
+        constraint.<name>  PenaltyEngine の各制約（個体群を受け取る _count_*）
+        variables.<name>   Variables の各制約（count_*）
+        env.<name>         SchedulerEnv の reset / _get_obs / step / terminal_eval
+        cycle_env.<name>   SchedulerCycleEnv の reset / step
+        vec_env.<name>     SchedulerVecEnv の reset / _get_obs / step_wait / terminal_eval
+        train.<name>       学習のロールアウト・更新（train_scheduler.ProfilingCallback）
+
+    step の時間には、その中で呼ぶ _get_obs や terminal_eval の時間も含まれる。
+    """
+
+    def __init__(self):
+        # 名前 -> [呼び出し回数, 累積秒数]
+        self.stats: dict[str, list] = {}
+        self._patches = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._patches)
+
+    def record(self, name: str, elapsed: float, count: int = 1) -> None:
+        stat = self.stats.get(name)
+        if stat is None:
+            self.stats[name] = [count, elapsed]
+        else:
+            stat[0] += count
+            stat[1] += elapsed
+
+    def instrument(self, owner, attr: str, name: str) -> None:
+        """
+        owner（クラスまたはモジュール）の attr を、呼び出しごとに name で記録するラッパーに差し替えます
+        """
+        original = owner.__dict__[attr]
+        record = self.record
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                record(name, perf_counter() - start)
+
+        wrapper.__name__ = getattr(original, "__name__", attr)
+        wrapper.__doc__ = getattr(original, "__doc__", None)
+        setattr(owner, attr, wrapper)
+        self._patches.append((owner, attr, original))
+
+    def enable(self, targets: list[tuple] | None = None) -> None:
+        """
+        計測を有効にします
+
+        Args:
+            targets (list[tuple] | None): (owner, attr, name) のリスト。None なら default_targets() を使う
+        """
+        if self.enabled:
+            return
+        for owner, attr, name in default_targets() if targets is None else targets:
+            self.instrument(owner, attr, name)
+
+    def disable(self) -> None:
+        # 差し替えたメソッドを元に戻す（記録した値は残す）
+        for owner, attr, original in reversed(self._patches):
+            setattr(owner, attr, original)
+        self._patches = []
+
+    def reset(self) -> None:
+        self.stats = {}
+
+    def snapshot(self) -> dict[str, tuple[int, float]]:
+        """
+        記録した値のコピーを返します（名前 -> (呼び出し回数, 累積秒数)）
+        """
+        return {name: (count, total) for name, (count, total) in self.stats.items()}
+
+    @staticmethod
+    def combine(snapshots: list[dict[str, tuple[int, float]]]) -> dict[str, tuple[int, float]]:
+        # 複数のプロセスの snapshot を足し合わせる
+        combined = {}
+        for snapshot in snapshots:
+            for name, (count, total) in snapshot.items():
+                old_count, old_total = combined.get(name, (0, 0.0))
+                combined[name] = (old_count + count, old_total + total)
+        return combined
+
+    @staticmethod
+    def to_rows(snapshot: dict[str, tuple[int, float]]) -> list[dict]:
+        # 累積時間の長い順に並べる
+        rows = []
+        for name, (count, total) in sorted(snapshot.items(), key=lambda item: -item[1][1]):
+            rows.append({"name": name, "count": count, "total_s": total, "mean_us": total / count * 1e6 if count else 0.0})
+        return rows
+
+    def to_csv(self, path: str, snapshot: dict[str, tuple[int, float]] | None = None) -> None:
+        """
+        記録した値を CSV（name, count, total_s, mean_us）に書き出します
+        """
+        rows = self.to_rows(self.snapshot() if snapshot is None else snapshot)
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["name", "count", "total_s", "mean_us"])
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def summary(self, snapshot: dict[str, tuple[int, float]] | None = None) -> str:
+        lines = [f"{'name':<55} {'count':>10} {'total_s':>10} {'mean_us':>10}"]
+        for row in self.to_rows(self.snapshot() if snapshot is None else snapshot):
+            lines.append(f"{row['name']:<55} {row['count']:>10} {row['total_s']:>10.4f} {row['mean_us']:>10.2f}")
+        return "\n".join(lines)
+
+
+def default_targets() -> list[tuple]:
+    """
+    既定の計測対象 (owner, attr, name) を返します
+    """
+    # 環境と Variables は extra に依存しているので、ここで読み込む
+    from scheduling_cycle_env import SchedulerCycleEnv
+    from scheduling_env_v2 import SchedulerEnv
+    from scheduling_vec_env import SchedulerVecEnv
+    from variables import Variables
+
+    targets = []
+    for attr in PenaltyEngine.__dict__:
+        if attr.startswith("_count_") and attr != "_count_true":
+            targets.append((PenaltyEngine, attr, f"constraint.{attr[1:]}"))
+    for attr in Variables.__dict__:
+        if attr.startswith("count_"):
+            targets.append((Variables, attr, f"variables.{attr}"))
+    for attr, name in [("reset", "reset"), ("_get_obs", "_get_obs"), ("step", "step"), ("_evaluate", "terminal_eval")]:
+        targets.append((SchedulerEnv, attr, f"env.{name}"))
+    for attr in ["reset", "step"]:
+        targets.append((SchedulerCycleEnv, attr, f"cycle_env.{attr}"))
+    for attr, name in [("reset", "reset"), ("_get_obs", "_get_obs"), ("step_wait", "step_wait"), ("_evaluate", "terminal_eval")]:
+        targets.append((SchedulerVecEnv, attr, f"vec_env.{name}"))
+    return targets
+
+
+# プロセス全体で共有するプロファイラ
+profiler = Profiler()
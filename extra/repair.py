@@ -0,0 +1,234 @@
+import random
+import time
+from datetime import date
+from typing import NamedTuple
+
+import numpy as np
+
+from consts import Day, ProblemInstance, get_problem_instance
+from .delta_evaluator import DeltaEvaluator
+from .funcs import get_penalty_engine
+from .local_search import DEFAULT_WEIGHTS
+from .penalty_engine import PenaltyEngine
+
+
+class RepairResult(NamedTuple):
+    """
+    Attributes:
+        schedule (np.ndarray): 直したシフト表 (E, D)
+        penalties (list[int]): その7種類のペナルティ
+        objective (int): その重み付きペナルティ（変更の数は含まない）
+        initial_objective (int): 欠勤のセルを休みにしただけのシフト表の重み付きペナルティ
+        absent_cells (list[tuple[int, int]]): 休みにした (社員, 日)
+        changes (list[tuple[int, int, int, int]]): 欠勤以外で変えたセル [(社員, 日, 変更前のシフト, 変更後のシフト), ...]
+        n_free_cells (int): 探索で変えてよいとしたセルの数
+        n_iters (int): 試した近傍の数
+        elapsed (float): 所要秒数
+    """
+
+    schedule: np.ndarray
+    penalties: list[int]
+    objective: int
+    initial_objective: int
+    absent_cells: list[tuple[int, int]]
+    changes: list[tuple[int, int, int, int]]
+    n_free_cells: int
+    n_iters: int
+    elapsed: float
+
+
+class ScheduleRepair:
+    """
+    作成済みのシフト表を、急な欠勤（新しく働けなくなった日）に合わせて少ない変更で直すクラス
+
+    ・欠勤のセルのうち勤務が入っているものを休みにする（希望休も反映するなら ProblemInstance.holidays を欠勤に含める）
+      入力のシフト表で勤務日に休みになっているセル（以前に直した欠勤など）も休みのまま変えない
+    ・変えてよいのは、欠勤の日を含むサイクルの日と重なる、各社員のサイクルの勤務日だけ（近傍）で、
+      それ以外のセルとアクションマスクで固定されたセルはそのままにする
+    ・近傍の前後 margin_cycles サイクル分の日だけを切り出した PenaltyEngine / DeltaEvaluator で評価するので、
+      計算量は社員数 × 切り出した日数に比例し、期間の長さにはほぼよらない（離れた欠勤は別々の範囲で探索する）
+    ・近傍は「サイクルの勤務日をまとめて同じシフトに変更」と「1セルのシフトを変更」で、
+      重み付きペナルティ + change_weight × 元のシフト表と異なるセルの数 が下がる変更だけを受理する（山登り法）
+      そのため、ペナルティが change_weight 未満しか下がらない変更はしない
+
+    切り出した範囲の端をまたぐシフト遷移は近似になるが、結果のペナルティはシフト表全体で計算し直す。
+    """
+
+    def __init__(
+        self,
+        instance: ProblemInstance | None = None,
+        weights: tuple[int, ...] = DEFAULT_WEIGHTS,
+        change_weight: float = 0.1,
+        margin_cycles: int = 1,
+        seed: int | None = None,
+    ):
+        """
+        Args:
+            instance (ProblemInstance | None): 問題インスタンス。None なら consts のインスタンス
+            weights (tuple[int, ...]): 7種類のペナルティの重み
+            change_weight (float): 元のシフト表と異なるセル1つあたりのコスト
+            margin_cycles (int): 評価のために近傍の前後に含める（最も長い）サイクルの数
+            seed (int | None): 近傍を試す順番の乱数のシード
+        """
+        self.instance = get_problem_instance() if instance is None else instance
+        self.engine = get_penalty_engine(instance)
+        self.weights = tuple(weights)
+        self.change_weight = change_weight
+        self.margin_days = margin_cycles * int(self.instance.n_cycle_days.max())
+        self.rng = random.Random(seed)
+        self._day_idx = {d.to_date(): i for i, d in enumerate(self.instance.days)}
+        self._employee_idx = {e.id: i for i, e in enumerate(self.instance.employees)}
+
+    def absences(self, items) -> np.ndarray:
+        """
+        (社員 id, 日) のリストを (E, D) の欠勤のマスクにします。日は date / Day / "YYYY-MM-DD" のいずれか
+        """
+        mask = np.zeros((self.instance.n_employees, self.instance.n_days), dtype=bool)
+        for employee_id, day in items:
+            if employee_id not in self._employee_idx:
+                raise ValueError(f"Invalid employee id: {employee_id}. Valid ids are {list(self._employee_idx)}")
+            if isinstance(day, Day):
+                day = day.to_date()
+            elif isinstance(day, str):
+                day = date.fromisoformat(day)
+            if day not in self._day_idx:
+                raise ValueError(f"{day} は期間（{self.instance.days[0].to_date()} から {self.instance.n_days} 日）に含まれません")
+            mask[self._employee_idx[employee_id], self._day_idx[day]] = True
+        return mask
+
+    def repair(self, schedule, absences: np.ndarray, time_budget: float = 0.5) -> RepairResult:
+        """
+        欠勤に合わせてシフト表を直します
+
+        Args:
+            schedule: 作成済みのシフト表。(E, D) の配列または長さ E*D の個体リスト
+            absences (np.ndarray): (E, D) 新しく働けなくなったセルなら True（absences() で作れる）
+            time_budget (float): 探索する秒数の上限（局所最適になったらそこで終える）
+
+        Returns:
+            RepairResult: 直したシフト表と、変えたセル
+        """
+        start = time.perf_counter()
+        inst, engine = self.instance, self.engine
+        rest = inst.rest_shift_idx
+        original = engine.to_schedule(schedule)
+        absent = np.asarray(absences, dtype=bool) & (original != rest)
+        schedule = np.where(absent, rest, original)
+        initial_objective = self._objective(engine.evaluate(schedule).tolist())
+
+        free = self._free_cells(original, absent)
+        n_iters = 0
+        for lo, hi in self._windows(free):
+            window, n = self._search(schedule[:, lo:hi], original[:, lo:hi], free[:, lo:hi], absent[:, lo:hi], lo, hi, start + time_budget)
+            schedule[:, lo:hi] = window
+            n_iters += n
+
+        penalties = engine.evaluate(schedule).tolist()
+        changed = (schedule != original) & ~absent
+        return RepairResult(
+            schedule=schedule,
+            penalties=penalties,
+            objective=self._objective(penalties),
+            initial_objective=initial_objective,
+            absent_cells=[(int(e), int(d)) for e, d in zip(*np.nonzero(absent))],
+            changes=[(int(e), int(d), int(original[e, d]), int(schedule[e, d])) for e, d in zip(*np.nonzero(changed))],
+            n_free_cells=int(np.count_nonzero(free)),
+            n_iters=n_iters,
+            elapsed=time.perf_counter() - start,
+        )
+
+    def _objective(self, penalties: list[int]) -> int:
+        return sum(w * p for w, p in zip(self.weights, penalties))
+
+    def _free_cells(self, original: np.ndarray, absent: np.ndarray) -> np.ndarray:
+        # 欠勤の日を含むサイクルの日と重なる、各社員のサイクルのセルのうち変えてよいもの
+        inst, cycle_id = self.instance, self.engine.cycle_id
+        E, D = cycle_id.shape
+        n_cycles = int(cycle_id.max()) + 1
+        cycle_key = np.arange(E)[:, None] * n_cycles + cycle_id
+
+        absent_cycles = np.zeros(E * n_cycles, dtype=bool)
+        absent_cycles[cycle_key[absent]] = True
+        affected_days = absent_cycles[cycle_key].any(axis=0)
+        hit = np.zeros(E * n_cycles, dtype=bool)
+        hit[cycle_key[:, affected_days]] = True
+
+        choosable = inst.action_masks.sum(axis=2) > 1
+        kept_rest = inst.work_day_mask & (original == inst.rest_shift_idx)
+        return hit[cycle_key] & choosable & ~kept_rest & ~absent
+
+    def _windows(self, free: np.ndarray) -> list[tuple[int, int]]:
+        # 近傍の日を、前後 margin_days 日を含めた範囲が重ならないように分けた [lo, hi) の一覧
+        days = np.flatnonzero(free.any(axis=0))
+        if len(days) == 0:
+            return []
+        breaks = np.flatnonzero(np.diff(days) > 2 * self.margin_days)
+        firsts, lasts = days[np.append(0, breaks + 1)], days[np.append(breaks, len(days) - 1)]
+        return [(max(0, int(a) - self.margin_days), min(self.instance.n_days, int(b) + 1 + self.margin_days)) for a, b in zip(firsts, lasts)]
+
+    def _search(self, schedule: np.ndarray, original: np.ndarray, free: np.ndarray, absent: np.ndarray, lo: int, hi: int, deadline: float) -> tuple[np.ndarray, int]:
+        # 切り出した日の範囲 [lo, hi) で、変えてよいセルだけを山登り法で変更する
+        inst = self.instance
+        engine = PenaltyEngine(
+            work_day_mask=inst.work_day_mask[:, lo:hi],
+            cycle_end_rest_to_rest=inst.cycle_end_rest_to_rest[:, lo:hi],
+            cycle_end_work_to_rest=inst.cycle_end_work_to_rest[:, lo:hi],
+            skill_forbidden=inst.skill_forbidden,
+            weekend=inst.weekend[lo:hi],
+            min_worker=inst.min_worker,
+            max_worker=inst.max_worker,
+            forbidden_transitions=inst.forbidden_transitions,
+            rest_shift_idx=inst.rest_shift_idx,
+        )
+        evaluator = DeltaEvaluator(schedule, engine=engine)
+        original = original.tolist()
+        masks = inst.action_masks[:, lo:hi]
+
+        # 近傍の一覧：(社員, サイクルの変えてよい日, 変更後のシフト)
+        moves = []
+        cycles = {}
+        for e, d in zip(*np.nonzero(free)):
+            e, d = int(e), int(d)
+            cycles.setdefault((e, int(engine.cycle_id[e, d])), []).append(d)
+        absent_employees = set(np.flatnonzero(absent.any(axis=1)).tolist())
+        for (e, _), days in cycles.items():
+            common = np.logical_and.reduce(masks[e, days], axis=0)
+            moves.extend((e, days, int(s)) for s in np.flatnonzero(common))
+            # 1セルの変更は1サイクル1シフトを崩すので、欠勤した社員のサイクルだけで試す
+            if len(days) > 1 and e in absent_employees:
+                for d in days:
+                    moves.extend((e, [d], int(s)) for s in np.flatnonzero(masks[e, d]))
+
+        weights, change_weight = self.weights, self.change_weight
+        n_iters = 0
+        improved = True
+        while improved:
+            improved = False
+            self.rng.shuffle(moves)
+            for e, days, new_shift in moves:
+                # 時間の確認は 64 回ごとに行う
+                if n_iters % 64 == 0 and time.perf_counter() >= deadline:
+                    return evaluator.schedule, n_iters
+                n_iters += 1
+
+                changes = [(d, evaluator.shift_at(e, d)) for d in days if evaluator.shift_at(e, d) != new_shift]
+                if not changes:
+                    continue
+                n_changed = sum((new_shift != original[e][d]) - (old_shift != original[e][d]) for d, old_shift in changes)
+                if len(changes) == 1:
+                    d = changes[0][0]
+                    diff = evaluator.delta(e, d, new_shift)
+                    if sum(w * dp for w, dp in zip(weights, diff)) + change_weight * n_changed < 0:
+                        evaluator.apply(e, d, new_shift)
+                        improved = True
+                    continue
+
+                diff = [0] * PenaltyEngine.N_PENALTIES
+                for d, _ in changes:
+                    diff = [x + y for x, y in zip(diff, evaluator.apply(e, d, new_shift))]
+                if sum(w * dp for w, dp in zip(weights, diff)) + change_weight * n_changed < 0:
+                    improved = True
+                else:
+                    for d, old_shift in reversed(changes):
+                        evaluator.apply(e, d, old_shift)
+        return evaluator.schedule, n_iters
@@ -0,0 +1,238 @@
+import os
+import time
+from datetime import date, timedelta
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from consts import ProblemInstance
+from consts.instance_loader import compile_spec, read_employees, read_spec
+from .funcs import get_penalty_engine
+from .local_search import DEFAULT_WEIGHTS, LocalSearch
+from .population import generate_population
+
+
+class CarryOver(NamedTuple):
+    """
+    前の期間から引き継ぐ状態（直前の context 日分の割り当て）
+
+    サイクルの位置（何日目か）は各社員の cycle_start と日付から決まるので、引き継ぐのは割り当てだけでよい。
+
+    Attributes:
+        start (date): 引き継ぐ最初の日
+        employee_ids (list[str]): 社員 id
+        shift_ids (list[list[str]]): 社員ごとの、start から続く日のシフト id
+    """
+
+    start: date
+    employee_ids: list[str]
+    shift_ids: list[list[str]]
+
+    @property
+    def n_days(self) -> int:
+        return len(self.shift_ids[0]) if self.shift_ids else 0
+
+    @property
+    def end(self) -> date:
+        # 引き継いだ日の翌日（次の期間の最初の日）
+        return self.start + timedelta(days=self.n_days)
+
+    def to_dict(self) -> dict:
+        return {"start": self.start.isoformat(), "employee_ids": list(self.employee_ids), "shift_ids": [list(row) for row in self.shift_ids]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CarryOver":
+        return cls(date.fromisoformat(data["start"]), list(data["employee_ids"]), [list(row) for row in data["shift_ids"]])
+
+
+class PeriodResult(NamedTuple):
+    """
+    Attributes:
+        start (date): 期間の最初の日
+        schedule (np.ndarray): 期間のシフト表 (E, 期間の日数)
+        penalties (list[int]): 引き継いだ日を含めたウィンドウの7種類のペナルティ
+        objective (int): その重み付きペナルティ
+        instance (ProblemInstance): 引き継いだ日を含めたウィンドウの問題インスタンス（引き継いだ日は固定）
+        carry (CarryOver): 次の期間に引き継ぐ状態
+        elapsed (float): 所要秒数
+    """
+
+    start: date
+    schedule: np.ndarray
+    penalties: list[int]
+    objective: int
+    instance: ProblemInstance
+    carry: CarryOver
+    elapsed: float
+
+
+class RollingHorizonScheduler:
+    """
+    期間（1か月など）ごとにシフト表を作り、前の期間の最後の数日を引き継いで次の期間を作るクラス
+
+    ・各期間は「引き継いだ context_days 日 + 新しい期間」のウィンドウで解き、引き継いだ日の割り当ては
+      ProblemInstance.with_fixed_shifts で固定する（アクションマスクがそのシフトだけになる）
+    ・そのため期間の境目をまたぐサイクル（1サイクル1シフト、シフトの遷移、サイクル内の休み）も、
+      通しのシフト表と同じようにウィンドウの中で評価される
+    ・計算量はウィンドウの日数（context_days + 期間の日数）に比例し、過去の期間は解き直さない
+    ・cycle_start を省略した社員は、ウィンドウの初日ではなく元の仕様の初日からサイクルを数える
+      （期間ごとにサイクルが最初からやり直しにならないようにする）
+    ・新しい期間の最初のサイクルの勤務日は、引き継いだサイクルと同じシフトを初期解にする
+
+    solver は (ウィンドウの問題インスタンス, 初期スケジュール (E, D)) を受け取り、アクションマスクを守った
+    (E, D) のスケジュールを返す関数。省略時は LocalSearch（焼きなまし法）で time_budget 秒改善する。
+    """
+
+    def __init__(
+        self,
+        spec: dict,
+        base_dir: str = ".",
+        context_days: int | None = None,
+        solver: Callable[[ProblemInstance, np.ndarray], np.ndarray] | None = None,
+        time_budget: float = 5.0,
+        weights: tuple[int, ...] = DEFAULT_WEIGHTS,
+        seed: int | None = None,
+    ):
+        """
+        Args:
+            spec (dict): 問題インスタンスの仕様（instance_loader を参照）。horizon / days は期間ごとに置き換える
+            base_dir (str): 社員一覧の CSV を探すディレクトリ
+            context_days (int | None): 引き継ぐ日数。None なら最も長いサイクルの2倍
+                （境目をまたぐサイクルとその前のサイクルが入る長さ）
+            solver: ウィンドウを解く関数（上を参照）
+            time_budget (float): 既定の solver（LocalSearch）で1期間あたりに探索する秒数
+            weights (tuple[int, ...]): 7種類のペナルティの重み
+            seed (int | None): 乱数のシード
+        """
+        self.spec = spec
+        self.base_dir = base_dir
+        # cycle_start を省略した社員のサイクルの基準日（instance_loader の既定と同じく仕様の初日）
+        self.cycle_anchor = spec["days"][0] if "days" in spec else spec.get("horizon", {}).get("start")
+        self.context_days = context_days
+        self.solver = solver
+        self.time_budget = time_budget
+        self.weights = tuple(weights)
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "RollingHorizonScheduler":
+        """
+        仕様ファイル（.json / .yaml）から作成します
+        """
+        return cls(read_spec(path), base_dir=os.path.dirname(os.path.abspath(path)), **kwargs)
+
+    def window_instance(self, start: date, n_days: int) -> ProblemInstance:
+        """
+        start から n_days 日の問題インスタンスを作成します（社員・シフト・希望休などは仕様のまま）
+        """
+        spec = {key: value for key, value in self.spec.items() if key != "days"}
+        spec["horizon"] = {"start": start.isoformat(), "n_days": n_days}
+        employees = read_employees(self.spec, self.base_dir)
+        if any("cycle_start" not in emp for emp in employees):
+            if self.cycle_anchor is None:
+                raise ValueError("cycle_start を省略した社員がいるときは、仕様に horizon.start か days が必要です")
+            spec["employees"] = [emp if "cycle_start" in emp else dict(emp, cycle_start=self.cycle_anchor) for emp in employees]
+        return compile_spec(spec, base_dir=self.base_dir)
+
+    def schedule_period(self, start: date, n_days: int, carry: CarryOver | None = None) -> PeriodResult:
+        """
+        start から n_days 日のシフト表を、carry（前の期間の schedule_period の結果）を引き継いで作ります
+
+        Args:
+            start (date): 期間の最初の日
+            n_days (int): 期間の日数
+            carry (CarryOver | None): 前の期間から引き継ぐ状態。None なら何も引き継がない（最初の期間）
+
+        Returns:
+            PeriodResult: 期間のシフト表と、次の期間に引き継ぐ状態
+        """
+        started = time.perf_counter()
+        n_context = 0 if carry is None else carry.n_days
+        if carry is not None and carry.end != start:
+            raise ValueError(f"引き継いだ日（{carry.start} から {n_context} 日）が期間の最初の日 {start} に続いていません")
+
+        instance = self.window_instance(start - timedelta(days=n_context), n_context + n_days)
+        fixed = self._fixed_shifts(instance, carry)
+        instance = instance.with_fixed_shifts(fixed)
+
+        initial = self._initial_schedule(instance, n_context)
+        if self.solver is None:
+            schedule = LocalSearch(instance, weights=self.weights, seed=int(self.rng.integers(2**31))).improve(initial, time_budget=self.time_budget).schedule
+        else:
+            schedule = np.asarray(self.solver(instance, initial), dtype=np.int64).reshape(instance.n_employees, instance.n_days)
+
+        penalties = get_penalty_engine(instance).evaluate(schedule).tolist()
+        return PeriodResult(
+            start=start,
+            schedule=schedule[:, n_context:],
+            penalties=penalties,
+            objective=sum(w * p for w, p in zip(self.weights, penalties)),
+            instance=instance,
+            carry=self._carry(instance, schedule),
+            elapsed=time.perf_counter() - started,
+        )
+
+    def run(self, start: date, period_days: int, n_periods: int, carry: CarryOver | None = None, verbose: bool = False) -> list[PeriodResult]:
+        """
+        start から period_days 日ずつ n_periods 期間のシフト表を、順に引き継ぎながら作ります
+        """
+        results = []
+        for k in range(n_periods):
+            result = self.schedule_period(start + timedelta(days=k * period_days), period_days, carry)
+            carry = result.carry
+            results.append(result)
+            if verbose:
+                print(f"{result.start} から {period_days} 日  ペナルティ {result.objective}  {result.penalties}  {result.elapsed:.1f} 秒")
+        return results
+
+    def _context_days(self, instance: ProblemInstance) -> int:
+        if self.context_days is not None:
+            return self.context_days
+        return int(2 * instance.n_cycle_days.max())
+
+    def _fixed_shifts(self, instance: ProblemInstance, carry: CarryOver | None) -> np.ndarray:
+        # 引き継いだ日の割り当てを固定する。引き継ぎにない社員（新しく入った社員）は固定しない
+        fixed = np.full((instance.n_employees, instance.n_days), -1, dtype=np.int64)
+        if carry is None:
+            return fixed
+        shift_idx = {s.id: i for i, s in enumerate(instance.shifts)}
+        carried = dict(zip(carry.employee_ids, carry.shift_ids))
+        for e, employee in enumerate(instance.employees):
+            if employee.id not in carried:
+                continue
+            for d, shift_id in enumerate(carried[employee.id]):
+                if shift_id not in shift_idx:
+                    raise ValueError(f"Invalid shift id: {shift_id}. Valid ids are {list(shift_idx)}")
+                fixed[e, d] = shift_idx[shift_id]
+        return fixed
+
+    def _initial_schedule(self, instance: ProblemInstance, n_context: int) -> np.ndarray:
+        # generate_population の個体に固定した日を入れ、境目をまたぐサイクルの勤務日は引き継いだシフトにそろえる
+        schedule = generate_population(1, instance, rng=self.rng)[0]
+        fixed = instance.fixed_shifts
+        schedule = np.where(fixed >= 0, fixed, schedule)
+        if n_context == 0:
+            return schedule
+        cycle_id = get_penalty_engine(instance).cycle_id
+        masks = instance.action_masks
+        for e in range(instance.n_employees):
+            working = np.flatnonzero((fixed[e, :n_context] >= 0) & (fixed[e, :n_context] != instance.rest_shift_idx))
+            if len(working) == 0:
+                continue
+            last = working[-1]
+            shift = fixed[e, last]
+            for d in range(n_context, instance.n_days):
+                if cycle_id[e, d] != cycle_id[e, last]:
+                    break
+                if instance.work_day_mask[e, d] and masks[e, d, shift]:
+                    schedule[e, d] = shift
+        return schedule
+
+    def _carry(self, instance: ProblemInstance, schedule: np.ndarray) -> CarryOver:
+        # ウィンドウの最後の context 日分を次の期間に引き継ぐ
+        n_carry = min(self._context_days(instance), instance.n_days)
+        return CarryOver(
+            start=instance.days[-1].to_date() + timedelta(days=1 - n_carry),
+            employee_ids=[e.id for e in instance.employees],
+            shift_ids=[[instance.shifts[s].id for s in row] for row in schedule[:, instance.n_days - n_carry :].tolist()],
+        )
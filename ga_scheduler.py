@@ -0,0 +1,41 @@
+import argparse
+import os
+
+from consts import load_problem_instance
+from extra import GeneticAlgorithm, show_shift
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="遺伝的アルゴリズムでシフト表を作成する")
+    parser.add_argument("--instance", default=None, help="問題インスタンスの仕様ファイル（.json / .yaml）。省略時は consts の定義を使う")
+    parser.add_argument("--population", type=int, default=200, help="個体数")
+    parser.add_argument("--generations", type=int, default=500, help="世代数の上限")
+    parser.add_argument("--time-budget", type=float, default=None, help="秒数の上限")
+    parser.add_argument("--crossover", choices=["row", "cycle"], default="row", help="row: 社員の行ごと / cycle: 社員・サイクルのブロックごと")
+    parser.add_argument("--mutation-prob", type=float, default=0.3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="評価に使うプロセス数")
+    parser.add_argument("--log-path", default="logs/ga.csv", help="世代ごとの統計を書き出す CSV")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    instance = None if args.instance is None else load_problem_instance(args.instance)
+    os.makedirs(os.path.dirname(args.log_path) or ".", exist_ok=True)
+
+    ga = GeneticAlgorithm(
+        instance,
+        population_size=args.population,
+        crossover=args.crossover,
+        mutation_prob=args.mutation_prob,
+        n_workers=args.workers,
+        seed=args.seed,
+    )
+    result = ga.run(n_generations=args.generations, time_budget=args.time_budget, log_path=args.log_path, verbose=True)
+
+    print(f"最良のペナルティ: {result.objective}（{result.n_generations} 世代、{result.elapsed:.1f} 秒）")
+    print(f"世代ごとの統計を {args.log_path} に保存しました。")
+    show_shift(result.schedule.ravel().tolist(), instance=instance)
+    for i, p in enumerate(result.penalties):
+        print(f"p{i+1}: {p}")
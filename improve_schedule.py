@@ -0,0 +1,55 @@
+import argparse
+import random
+
+from consts import load_problem_instance
+from extra import LocalSearch, show_shift
+from extra.local_search import DEFAULT_WEIGHTS, EVAL_SHIFT_WEIGHTS
+from scheduling_env_v2 import SchedulerEnv
+from variables import Variables
+
+
+def rollout_policy(model_path: str, env: SchedulerEnv) -> list[int]:
+    """
+    学習済みモデルで1エピソードを実行し、得られたシフト表を返します
+    """
+    from stable_baselines3 import A2C, PPO
+
+    algo = A2C if "a2c" in model_path.lower() else PPO
+    model = algo.load(model_path, device="cpu")
+    obs, _ = env.reset()
+    done = False
+    while not done:
+        action, _ = model.predict(obs, deterministic=True)
+        obs, reward, terminated, truncated, info = env.step(action)
+        done = terminated or truncated
+    return info["schedule"].tolist()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="焼きなまし法でシフト表を改善する")
+    parser.add_argument("--instance", default=None, help="問題インスタンスの仕様ファイル（.json / .yaml）。省略時は consts の定義を使う")
+    parser.add_argument("--model-path", default=None, help="初期解を作る学習済みモデル。省略時は Variables.generate_individual で作る")
+    parser.add_argument("--time-budget", type=float, default=10.0, help="探索する秒数")
+    parser.add_argument("--objective", choices=["full", "evalshift"], default="full", help="full: 全ペナルティの重み付き和 / evalshift: 環境の報酬と同じ c1 + c4")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    instance = None if args.instance is None else load_problem_instance(args.instance)
+    random.seed(args.seed)
+
+    if args.model_path is None:
+        initial = Variables.generate_individual(instance)
+    else:
+        initial = rollout_policy(args.model_path, SchedulerEnv(instance))
+
+    weights = DEFAULT_WEIGHTS if args.objective == "full" else EVAL_SHIFT_WEIGHTS
+    result = LocalSearch(instance, weights=weights, seed=args.seed).improve(initial, time_budget=args.time_budget)
+
+    print(f"ペナルティ: {result.initial_objective} -> {result.objective}")
+    print(f"近傍 {result.n_iters} 回（受理 {result.n_accepted} 回）、{result.elapsed:.1f} 秒")
+    show_shift(result.schedule.ravel().tolist(), instance=instance)
+    for i, p in enumerate(result.penalties):
+        print(f"p{i+1}: {p}")
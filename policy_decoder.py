@@ -0,0 +1,231 @@
+import time
+from typing import NamedTuple
+
+import numpy as np
+import torch
+
+from consts import ProblemInstance
+from extra import PenaltyEngine
+from extra.local_search import DEFAULT_WEIGHTS
+from scheduling_env_v2 import SchedulerEnv
+from scheduling_vec_env import SchedulerVecEnv
+
+
+class DecodeResult(NamedTuple):
+    """
+    Attributes:
+        schedule (np.ndarray): 選んだシフト表 (E, D)
+        penalties (list[int]): その7種類のペナルティ
+        objective (int): その重み付きペナルティ
+        log_prob (float): 方策（マスク後）でのシフト表の対数確率
+        n_candidates (int): 最後に評価した完成したシフト表の数
+        n_pruned (int): 下界が upper_bound を超えて捨てた候補の数
+        elapsed (float): 所要秒数
+    """
+
+    schedule: np.ndarray
+    penalties: list[int]
+    objective: int
+    log_prob: float
+    n_candidates: int
+    n_pruned: int
+    elapsed: float
+
+
+class PolicyDecoder:
+    """
+    学習済みの方策の行動確率から、アクションマスクを守ったシフト表を作るクラス
+
+    ・beam_search: ビーム幅の候補を SchedulerVecEnv でまとめて進め、方策の順伝播も全候補で1回にする
+      候補の順位は「対数確率 - penalty_weight * ペナルティの下界」で決める
+    ・sample: n_samples 個を方策からサンプリングし、重み付きペナルティが最小のものを選ぶ（best-of-N）
+
+    どちらも観測の "action_mask" で選択できない行動の確率を 0 にしてから正規化する。
+    ステップ数は環境のエピソードの長さで決まるので、所要時間はビーム幅・サンプル数にほぼ比例する。
+
+    ペナルティの下界は社員の行が埋まるたびに更新する。
+        ・p6 以外は社員ごとに独立なので、埋まった行の分はその社員だけの PenaltyEngine で確定させる
+        ・p6 は埋まった行の人数で、max を超えた分と、残りの社員が全員入っても min に届かない分
+    """
+
+    def __init__(
+        self,
+        model,
+        instance: ProblemInstance | None = None,
+        env_class: type[SchedulerEnv] = SchedulerEnv,
+        rich_observation: bool = False,
+        weights: tuple[int, ...] = DEFAULT_WEIGHTS,
+    ):
+        """
+        Args:
+            model: 学習済みモデル（SB3 の PPO / A2C など、行動空間が Discrete のもの）
+            instance (ProblemInstance | None): 問題インスタンス。None なら consts のインスタンス
+            env_class (type[SchedulerEnv]): 学習に使った環境（SchedulerEnv か SchedulerCycleEnv）
+            rich_observation (bool): 学習時に rich_observation を指定したか
+            weights (tuple[int, ...]): 7種類のペナルティの重み
+        """
+        self.model = model
+        self.env_class = env_class
+        self.rich_observation = rich_observation
+        self.weights = np.asarray(weights, dtype=np.int64)
+        env = self._make_env(1, instance)
+        self.instance = env.instance
+        self.engine = env.engine
+        self.total_steps = env.total_steps
+
+        # 各ステップで埋まる社員と、そのステップで社員の行が埋まり終わるかどうか
+        self._step_employee = env.state_table[:, 0].astype(np.int64)
+        self._row_end = np.append(self._step_employee[1:-1] != self._step_employee[:-2], True)
+        self._row_engines = {}
+
+        inst = self.instance
+        self._coverage_shift_mask = np.ones(inst.n_shifts, dtype=bool)
+        self._coverage_shift_mask[inst.rest_shift_idx] = False
+        self._weekday_mask = ~inst.weekend
+
+    def beam_search(self, beam_width: int = 8, penalty_weight: float = 1.0, upper_bound: int | None = None) -> DecodeResult:
+        """
+        ビームサーチでシフト表を作ります。beam_width=1, penalty_weight=0 ならマスクを守った貪欲法
+
+        Args:
+            beam_width (int): ビーム幅
+            penalty_weight (float): 候補の順位づけでペナルティの下界にかける重み
+            upper_bound (int | None): 下界がこの値を超えた候補は捨てる（GA などで得た解の重み付きペナルティを渡す）
+
+        Returns:
+            DecodeResult: 最後に残った候補のうち重み付きペナルティが最小のシフト表
+        """
+        start = time.perf_counter()
+        B = beam_width
+        D, S = self.instance.n_days, self.instance.n_shifts
+        env = self._make_env(B, self.instance)
+        obs = env.reset()
+
+        # 最初は1つの候補だけが有効（他は -inf で選ばれない）
+        log_probs = np.full(B, -np.inf)
+        log_probs[0] = 0.0
+        bounds = np.zeros(B)
+        row_penalties = np.zeros(B, dtype=np.int64)
+        coverage = np.zeros((B, D, S), dtype=np.int64)
+        n_pruned = 0
+
+        for step in range(self.total_steps):
+            scores = log_probs[:, None] + self._masked_log_probs(obs)
+            keys = scores - penalty_weight * bounds[:, None]
+            if upper_bound is not None:
+                live = np.isfinite(keys)
+                pruned = live & (bounds[:, None] > upper_bound)
+                # 有効な候補をすべて捨てることになるときは下界で順位づけしたまま残す
+                if pruned.any() and (pruned != live).any():
+                    n_pruned += int(np.count_nonzero(pruned.any(axis=1)))
+                    keys = np.where(pruned, -np.inf, keys)
+
+            flat = keys.ravel()
+            n_valid = min(B, int(np.count_nonzero(np.isfinite(flat))))
+            top = np.argsort(-flat, kind="stable")[:B]
+            parents, actions = top // S, top % S
+            # 有効な候補が B 個に満たないときは、残りの枠は最良の候補の写しにして -inf にする
+            parents[n_valid:], actions[n_valid:] = parents[0], actions[0]
+            log_probs = scores[parents, actions]
+            log_probs[n_valid:] = -np.inf
+            row_penalties, coverage = row_penalties[parents], coverage[parents]
+
+            env.select(parents)
+            obs, _, _, infos = env.step(actions)
+
+            if self._row_end[step]:
+                e = int(self._step_employee[step])
+                row = np.stack([info["schedule"] for info in infos]) if step == self.total_steps - 1 else env.schedules
+                row = row[:, e * D : (e + 1) * D].astype(np.int64)
+                row_penalties = row_penalties + self._row_penalty(e, row)
+                coverage[np.arange(B)[:, None], np.arange(D)[None, :], row] += 1
+                bounds = row_penalties + self.weights[5] * self._coverage_bound(coverage, e)
+
+        schedules = np.stack([info["schedule"] for info in infos])
+        return self._select(schedules, log_probs, n_valid, n_pruned, start)
+
+    def sample(self, n_samples: int = 32, temperature: float = 1.0, seed: int | None = None) -> DecodeResult:
+        """
+        方策から n_samples 個のシフト表をサンプリングし、重み付きペナルティが最小のものを選びます
+
+        Args:
+            n_samples (int): サンプル数（方策の順伝播は全サンプルで1回にまとめる）
+            temperature (float): 行動確率の温度
+            seed (int | None): 乱数のシード
+        """
+        start = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        env = self._make_env(n_samples, self.instance)
+        obs = env.reset()
+        log_probs = np.zeros(n_samples)
+        rows = np.arange(n_samples)
+        for _ in range(self.total_steps):
+            step_log_probs = self._masked_log_probs(obs, temperature)
+            # Gumbel-max でマスク後の分布からまとめてサンプリングする
+            actions = np.argmax(step_log_probs + rng.gumbel(size=step_log_probs.shape), axis=1)
+            log_probs += step_log_probs[rows, actions]
+            obs, _, _, infos = env.step(actions)
+
+        schedules = np.stack([info["schedule"] for info in infos])
+        return self._select(schedules, log_probs, n_samples, 0, start)
+
+    def _make_env(self, num_envs: int, instance: ProblemInstance | None) -> SchedulerVecEnv:
+        return SchedulerVecEnv(num_envs, instance, env_class=self.env_class, rich_observation=self.rich_observation)
+
+    @torch.no_grad()
+    def _masked_log_probs(self, obs: dict[str, np.ndarray], temperature: float = 1.0) -> np.ndarray:
+        # 方策の行動の logits に観測のアクションマスクをかけて正規化した (K, S) の対数確率
+        policy = self.model.policy
+        policy.set_training_mode(False)
+        obs_tensor, _ = policy.obs_to_tensor(obs)
+        logits = policy.get_distribution(obs_tensor).distribution.logits / temperature
+        mask = torch.as_tensor(obs["action_mask"], dtype=torch.bool, device=logits.device)
+        logits = logits.masked_fill(~mask, -torch.inf)
+        return torch.log_softmax(logits, dim=1).cpu().numpy().astype(np.float64)
+
+    def _row_penalty(self, e: int, rows: np.ndarray) -> np.ndarray:
+        # 社員 e の行だけの p6 以外の重み付きペナルティ
+        engine = self._row_engines.get(e)
+        if engine is None:
+            inst = self.instance
+            engine = PenaltyEngine(
+                work_day_mask=inst.work_day_mask[e : e + 1],
+                cycle_end_rest_to_rest=inst.cycle_end_rest_to_rest[e : e + 1],
+                cycle_end_work_to_rest=inst.cycle_end_work_to_rest[e : e + 1],
+                skill_forbidden=inst.skill_forbidden[e : e + 1],
+                weekend=inst.weekend,
+                min_worker=inst.min_worker,
+                max_worker=inst.max_worker,
+                forbidden_transitions=inst.forbidden_transitions,
+                rest_shift_idx=inst.rest_shift_idx,
+            )
+            self._row_engines[e] = engine
+        penalties = engine.evaluate_population(rows)
+        penalties[:, 5] = 0
+        return penalties @ self.weights
+
+    def _coverage_bound(self, coverage: np.ndarray, e: int) -> np.ndarray:
+        # 社員 e までの行の人数から分かる p6 の下界
+        n_remaining = self.instance.n_employees - 1 - e
+        coverage = coverage[:, self._weekday_mask][..., self._coverage_shift_mask]
+        min_worker = self.instance.min_worker[self._coverage_shift_mask]
+        max_worker = self.instance.max_worker[self._coverage_shift_mask]
+        excess = np.maximum(coverage - max_worker, 0)
+        shortage = np.maximum(min_worker - coverage - n_remaining, 0)
+        return (excess + shortage).sum(axis=(1, 2))
+
+    def _select(self, schedules: np.ndarray, log_probs: np.ndarray, n_valid: int, n_pruned: int, start: float) -> DecodeResult:
+        # 有効な候補のうち重み付きペナルティが最小（同じなら対数確率が大きい）ものを選ぶ
+        schedules, log_probs = schedules[:n_valid], log_probs[:n_valid]
+        penalties = self.engine.evaluate_population(schedules)
+        objectives = penalties @ self.weights
+        best = int(np.lexsort((-log_probs, objectives))[0])
+        return DecodeResult(
+            schedule=schedules[best].reshape(self.instance.n_employees, self.instance.n_days),
+            penalties=penalties[best].tolist(),
+            objective=int(objectives[best]),
+            log_prob=float(log_probs[best]),
+            n_candidates=len(schedules),
+            n_pruned=n_pruned,
+            elapsed=time.perf_counter() - start,
+        )
@@ -0,0 +1,115 @@
+import argparse
+import json
+
+import numpy as np
+import torch
+from torch import nn
+
+from stable_baselines3.common.preprocessing import preprocess_obs
+
+FORMATS = ("torchscript", "onnx")
+
+
+class PolicyLogits(nn.Module):
+    """
+    SB3 の MultiInputPolicy から行動の logits を計算する部分だけを取り出したモジュール
+
+    入力は観測のキーを input_keys の順に並べた float32 のテンソル（先頭の次元がバッチ）。
+    価値関数の部分は含まない。
+    """
+
+    def __init__(self, policy):
+        super().__init__()
+        self.observation_space = policy.observation_space
+        self.input_keys = list(policy.observation_space.spaces)
+        self.features_extractor = policy.pi_features_extractor
+        self.mlp_extractor = policy.mlp_extractor
+        self.action_net = policy.action_net
+
+    def forward(self, *inputs: torch.Tensor) -> torch.Tensor:
+        obs = preprocess_obs(dict(zip(self.input_keys, inputs)), self.observation_space)
+        latent = self.mlp_extractor.forward_actor(self.features_extractor(obs))
+        return self.action_net(latent)
+
+
+def export_policy(model, path: str, fmt: str = "torchscript", action_mode: str = "cell", rich_observation: bool = False) -> dict:
+    """
+    学習済みモデルの方策を TorchScript か ONNX で書き出し、入力の情報を <path>.json に書きます
+    書き出したものは policy_runner.PolicyRunner で stable_baselines3 なしに実行できる
+
+    Args:
+        model: 学習済みモデル（SB3 の PPO / A2C など、MultiInputPolicy で行動空間が Discrete のもの）
+        path (str): 書き出すファイル
+        fmt (str): "torchscript" または "onnx"
+        action_mode (str): 学習に使った環境（"cell" / "cycle"）
+        rich_observation (bool): 学習時に rich_observation を指定したか
+
+    Returns:
+        dict: <path>.json に書いた内容
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid format: {fmt}. Valid values are {', '.join(FORMATS)}")
+    module = PolicyLogits(model.policy).cpu().eval()
+    spaces = model.policy.observation_space.spaces
+    example = tuple(torch.zeros((2, *spaces[key].shape), dtype=torch.float32) for key in module.input_keys)
+
+    with torch.no_grad():
+        if fmt == "torchscript":
+            torch.jit.trace(module, example).save(path)
+        else:
+            try:
+                import onnx  # noqa: F401
+            except ImportError:
+                raise ImportError("ONNX で書き出すには onnx が必要です（pip install onnx）")
+            torch.onnx.export(
+                module,
+                example,
+                path,
+                input_names=module.input_keys,
+                output_names=["logits"],
+                dynamic_axes={**{key: {0: "batch"} for key in module.input_keys}, "logits": {0: "batch"}},
+                dynamo=False,
+            )
+
+    meta = {
+        "format": fmt,
+        "input_keys": module.input_keys,
+        "input_shapes": {key: list(spaces[key].shape) for key in module.input_keys},
+        "n_actions": int(model.action_space.n),
+        "action_mode": action_mode,
+        "rich_observation": rich_observation,
+    }
+    with open(path + ".json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="学習済みモデルの方策を TorchScript / ONNX で書き出す")
+    parser.add_argument("--model-path", default="logs/best_model.zip")
+    parser.add_argument("--algo", choices=["a2c", "ppo"], default=None, help="省略時はファイル名から判定する（a2c を含めば A2C、それ以外は PPO）")
+    parser.add_argument("--output", default="logs/policy.pt", help="書き出すファイル（入力の情報は <output>.json）")
+    parser.add_argument("--format", choices=FORMATS, default="torchscript")
+    parser.add_argument("--action-mode", choices=["cell", "cycle"], default="cell", help="学習時と同じものを指定する")
+    parser.add_argument("--rich-obs", action="store_true", help="学習時に --rich-obs を指定したモデルのとき")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from eval_scheduler import load_model
+
+    args = parse_args()
+    model = load_model(args.model_path, args.algo)
+    export_policy(model, args.output, args.format, args.action_mode, args.rich_obs)
+
+    # 書き出したものが元の方策と同じ行動確率になるか確かめる（Categorical の logits は正規化されているので揃える）
+    from policy_runner import PolicyRunner
+
+    runner = PolicyRunner(args.output)
+    obs = runner.observation_batch()
+    with torch.no_grad():
+        obs_tensor, _ = model.policy.obs_to_tensor(obs)
+        expected = model.policy.get_distribution(obs_tensor).distribution.logits.numpy()
+        actual = torch.log_softmax(torch.from_numpy(runner.logits(obs)), dim=1).numpy()
+    error = float(np.abs(actual - expected).max())
+    print(f"{args.output} に書き出しました（対数確率の最大誤差 {error:.2e}）。")
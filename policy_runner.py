@@ -0,0 +1,194 @@
+import copy
+import json
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from consts import ProblemInstance
+from extra.funcs import get_penalty_engine
+from extra.local_search import DEFAULT_WEIGHTS
+from scheduling_cycle_env import SchedulerCycleEnv
+from scheduling_env_v2 import SchedulerEnv
+
+ENV_CLASSES = {"cell": SchedulerEnv, "cycle": SchedulerCycleEnv}
+
+
+class RunnerResult(NamedTuple):
+    """
+    Attributes:
+        schedule (np.ndarray): 選んだシフト表 (E, D)
+        penalties (list[int]): その7種類のペナルティ
+        objective (int): その重み付きペナルティ
+        n_samples (int): 作ったシフト表の数
+        elapsed (float): 所要秒数
+    """
+
+    schedule: np.ndarray
+    penalties: list[int]
+    objective: int
+    n_samples: int
+    elapsed: float
+
+
+class PolicyRunner:
+    """
+    policy_export.export_policy で書き出した方策でシフト表を作るクラス（stable_baselines3 を読み込まない）
+
+    ・TorchScript は torch、ONNX は onnxruntime（オプション）で実行する
+    ・アクションマスクは環境の事前計算済みの表（action_mask_table）を使い、選べない行動の logits は -inf にする
+    ・rich_observation でなければ観測は行動によらずステップだけで決まるので、
+      全ステップの観測を1回の順伝播で計算して logits を保持し、以降のロールアウトは表を引くだけにする
+    ・rich_observation のときは SchedulerEnv を1ステップずつ進める
+    """
+
+    def __init__(self, path: str, instance: ProblemInstance | None = None):
+        """
+        Args:
+            path (str): 書き出した方策のファイル（<path>.json に入力の情報がある）
+            instance (ProblemInstance | None): 問題インスタンス。None なら consts のインスタンス
+        """
+        with open(path + ".json", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.input_keys = self.meta["input_keys"]
+        self.rich_observation = self.meta["rich_observation"]
+
+        if self.meta["format"] == "torchscript":
+            import torch
+
+            self._module = torch.jit.load(path, map_location="cpu").eval()
+            self._session = None
+        else:
+            try:
+                import onnxruntime
+            except ImportError:
+                raise ImportError("ONNX の方策を実行するには onnxruntime が必要です（pip install onnxruntime）")
+            self._module = None
+            self._session = onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self._bind(instance)
+
+    def for_instance(self, instance: ProblemInstance | None) -> "PolicyRunner":
+        """
+        読み込んだ方策を共有して、別の問題インスタンス用の PolicyRunner を作ります
+        """
+        runner = copy.copy(self)
+        runner._bind(instance)
+        return runner
+
+    def _bind(self, instance: ProblemInstance | None) -> None:
+        # 問題インスタンスごとの環境・マスクの表を用意する
+        env_class = ENV_CLASSES[self.meta["action_mode"]]
+        self.env = env_class(instance, rich_observation=True) if self.rich_observation else env_class(instance)
+        self.instance = self.env.instance
+        self.engine = get_penalty_engine(instance)
+        for key in self.input_keys:
+            shape = list(self.env.observation_space[key].shape)
+            if shape != self.meta["input_shapes"][key]:
+                raise ValueError(f"観測 {key} の形が書き出した方策と異なります：{shape} != {self.meta['input_shapes'][key]}")
+
+        # 各ステップで選べない行動（最後の行は終端状態）
+        self._forbidden = self.env.action_mask_table[: self.env.total_steps] == 0
+        self._step_logits = None
+
+    def logits(self, obs: dict[str, np.ndarray]) -> np.ndarray:
+        """
+        バッチの観測（キーごとに先頭の次元がバッチの配列）の (K, 行動数) の logits を返します
+        """
+        inputs = [np.ascontiguousarray(obs[key], dtype=np.float32) for key in self.input_keys]
+        if self._session is not None:
+            return self._session.run(None, dict(zip(self.input_keys, inputs)))[0]
+        import torch
+
+        with torch.no_grad():
+            return self._module(*(torch.from_numpy(x) for x in inputs)).numpy()
+
+    def observation_batch(self) -> dict[str, np.ndarray]:
+        """
+        全ステップの観測をまとめた (total_steps, ...) の観測を返します（rich_observation の特徴量は 0 のまま）
+        """
+        env = self.env
+        steps = np.arange(env.total_steps)
+        obs = {
+            "state": env.state_table[steps],
+            "action_mask": env.action_mask_table[steps],
+            "avail_actions": np.broadcast_to(env.avail_actions_table[0], (env.total_steps, env.n_shifts)),
+        }
+        for key in self.input_keys:
+            if key not in obs:
+                obs[key] = np.zeros((env.total_steps, *env.observation_space[key].shape), dtype=env.observation_space[key].dtype)
+        return obs
+
+    def rollout(self, n_samples: int = 1, deterministic: bool = True, masked: bool = True, seed: int | None = None) -> np.ndarray:
+        """
+        n_samples 個のシフト表を作ります
+
+        Args:
+            n_samples (int): 作るシフト表の数（deterministic なら同じものになる）
+            deterministic (bool): True なら logits が最大の行動、False なら方策からサンプリングする
+            masked (bool): False ならアクションマスクをかけない（model.predict と同じ行動になる）
+            seed (int | None): サンプリングの乱数のシード
+
+        Returns:
+            np.ndarray: (n_samples, E*D) の uint8 のシフト表
+        """
+        rng = np.random.default_rng(seed)
+        if self.rich_observation:
+            return np.stack([self._rollout_steps(deterministic, masked, rng) for _ in range(n_samples)])
+
+        if self._step_logits is None:
+            self._step_logits = self.logits(self.observation_batch()).astype(np.float64)
+        logits = np.where(self._forbidden, -np.inf, self._step_logits) if masked else self._step_logits
+        if deterministic:
+            actions = np.broadcast_to(logits.argmax(axis=1), (n_samples, len(logits)))
+        else:
+            # Gumbel-max で全サンプル・全ステップをまとめてサンプリングする
+            actions = np.argmax(logits + rng.gumbel(size=(n_samples, *logits.shape)), axis=2)
+        return self._to_schedules(actions)
+
+    def run(
+        self,
+        n_samples: int = 1,
+        deterministic: bool = True,
+        masked: bool = True,
+        seed: int | None = None,
+        weights: tuple[int, ...] = DEFAULT_WEIGHTS,
+    ) -> RunnerResult:
+        """
+        rollout で作ったシフト表のうち、重み付きペナルティが最小のものを返します
+        """
+        start = time.perf_counter()
+        schedules = self.rollout(n_samples, deterministic, masked, seed)
+        penalties = self.engine.evaluate_population(schedules)
+        objectives = penalties @ np.asarray(weights, dtype=np.int64)
+        best = int(np.argmin(objectives))
+        return RunnerResult(
+            schedule=schedules[best].reshape(self.instance.n_employees, self.instance.n_days),
+            penalties=penalties[best].tolist(),
+            objective=int(objectives[best]),
+            n_samples=n_samples,
+            elapsed=time.perf_counter() - start,
+        )
+
+    def _rollout_steps(self, deterministic: bool, masked: bool, rng: np.random.Generator) -> np.ndarray:
+        # 観測が行動によって変わるときは、環境を1ステップずつ進める
+        env = self.env
+        obs, _ = env.reset()
+        done = False
+        while not done:
+            logits = self.logits({key: obs[key][None] for key in self.input_keys})[0].astype(np.float64)
+            if masked:
+                logits = np.where(obs["action_mask"] == 0, -np.inf, logits)
+            if not deterministic:
+                logits = logits + rng.gumbel(size=logits.shape)
+            obs, _, terminated, truncated, info = env.step(int(logits.argmax()))
+            done = terminated or truncated
+        return np.asarray(info["schedule"], dtype=np.uint8)
+
+    def _to_schedules(self, actions: np.ndarray) -> np.ndarray:
+        # ステップごとの行動を、長さ E*D のシフト表に並べる
+        unit_cells = getattr(self.env, "unit_cells", None)
+        if unit_cells is None:
+            return actions.astype(np.uint8)
+        schedules = np.tile(self.env.initial_schedule, (len(actions), 1))
+        schedules[np.arange(len(actions))[:, None, None], unit_cells[None]] = actions[:, :, None]
+        return schedules[:, : self.env.n_cells]
@@ -0,0 +1,77 @@
+import argparse
+import json
+from datetime import date, timedelta
+
+import numpy as np
+
+from consts import get_problem_instance, load_problem_instance
+from extra import LocalSearch, ScheduleRepair, generate_population, show_shift
+from extra.local_search import DEFAULT_WEIGHTS, EVAL_SHIFT_WEIGHTS
+
+
+def parse_absence(value: str) -> list[tuple[str, date]]:
+    """
+    "社員id:YYYY-MM-DD" または "社員id:YYYY-MM-DD:YYYY-MM-DD"（最終日を含む）を (社員 id, 日) のリストにします
+    """
+    employee_id, *days = value.split(":")
+    if len(days) not in (1, 2):
+        raise argparse.ArgumentTypeError(f"Invalid absence: {value}. Use EMPLOYEE:YYYY-MM-DD[:YYYY-MM-DD]")
+    first = date.fromisoformat(days[0])
+    last = date.fromisoformat(days[-1])
+    return [(employee_id, first + timedelta(days=k)) for k in range((last - first).days + 1)]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="作成済みのシフト表を、急な欠勤に合わせて少ない変更で直す")
+    parser.add_argument("--instance", default=None, help="問題インスタンスの仕様ファイル（.json / .yaml）。省略時は consts の定義を使う")
+    parser.add_argument("--schedule", default=None, help="直すシフト表の JSON（\"schedule\" に (E, D) のシフト idx。scheduler_service.py のレスポンスなど）。省略時は焼きなまし法で作る")
+    parser.add_argument("--absent", type=parse_absence, action="append", default=[], metavar="EMPLOYEE:DAY[:LAST]", help="欠勤（何回でも指定できる）")
+    parser.add_argument("--holidays", action="store_true", help="仕様の希望休も欠勤として反映する")
+    parser.add_argument("--time-budget", type=float, default=0.5, help="探索する秒数の上限")
+    parser.add_argument("--change-weight", type=float, default=0.1, help="元のシフト表と異なるセル1つあたりのコスト")
+    parser.add_argument("--initial-budget", type=float, default=5.0, help="--schedule を省略したときに最初のシフト表を作る秒数")
+    parser.add_argument("--objective", choices=["full", "evalshift"], default="full", help="full: 全ペナルティの重み付き和 / evalshift: 環境の報酬と同じ c1 + c4")
+    parser.add_argument("--output", default=None, help="直したシフト表を書き出す JSON（--schedule と同じ形式）")
+    parser.add_argument("--show", action="store_true", help="直したシフト表を表示する")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    instance = get_problem_instance() if args.instance is None else load_problem_instance(args.instance)
+    weights = DEFAULT_WEIGHTS if args.objective == "full" else EVAL_SHIFT_WEIGHTS
+
+    if args.schedule is not None:
+        with open(args.schedule, encoding="utf-8") as f:
+            schedule = np.asarray(json.load(f)["schedule"], dtype=np.int64)
+    else:
+        initial = generate_population(1, instance, rng=args.seed)[0]
+        schedule = LocalSearch(instance, weights=weights, seed=args.seed).improve(initial, time_budget=args.initial_budget).schedule
+
+    repairer = ScheduleRepair(instance, weights=weights, change_weight=args.change_weight, seed=args.seed)
+    absences = repairer.absences([item for items in args.absent for item in items])
+    if args.holidays:
+        absences |= instance.holidays
+    result = repairer.repair(schedule, absences, time_budget=args.time_budget)
+
+    print(f"欠勤 {len(result.absent_cells)} セル、ペナルティ: {result.initial_objective} -> {result.objective}")
+    print(f"変更 {len(result.changes)} セル（候補 {result.n_free_cells} セル、近傍 {result.n_iters} 回）、{result.elapsed * 1000:.0f} ms")
+    for e, d, old_shift, new_shift in result.changes:
+        print(f"  {instance.employees[e].id} {instance.days[d].to_date()}: {instance.shifts[old_shift].id} -> {instance.shifts[new_shift].id}")
+    if args.show:
+        show_shift(result.schedule.ravel().tolist(), instance=instance)
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "schedule": result.schedule.tolist(),
+                    "shift_labels": list(instance.shift_labels),
+                    "penalties": result.penalties,
+                    "objective": result.objective,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        print(f"{args.output} に書き出しました。")
@@ -0,0 +1,58 @@
+import argparse
+import json
+from datetime import date
+
+import numpy as np
+
+from extra import show_shift
+from extra.local_search import DEFAULT_WEIGHTS, EVAL_SHIFT_WEIGHTS
+from extra.rolling_horizon import CarryOver, RollingHorizonScheduler
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="期間ごとに前の期間の最後の日を引き継いでシフト表を作成する（ローリングホライズン）")
+    parser.add_argument("--instance", default="instances/default.json", help="問題インスタンスの仕様ファイル（.json / .yaml）。horizon は期間ごとに置き換える")
+    parser.add_argument("--start", default=None, help="最初の期間の最初の日（YYYY-MM-DD）。省略時は仕様の horizon.start か --carry-in の続き")
+    parser.add_argument("--period-days", type=int, default=28, help="1期間の日数")
+    parser.add_argument("--n-periods", type=int, default=3, help="期間の数")
+    parser.add_argument("--context-days", type=int, default=None, help="引き継ぐ日数。省略時は最も長いサイクルの2倍")
+    parser.add_argument("--time-budget", type=float, default=5.0, help="1期間あたりに焼きなまし法で探索する秒数")
+    parser.add_argument("--objective", choices=["full", "evalshift"], default="full", help="full: 全ペナルティの重み付き和 / evalshift: 環境の報酬と同じ c1 + c4")
+    parser.add_argument("--carry-in", default=None, help="前回の --carry-out で書き出した引き継ぎの JSON")
+    parser.add_argument("--carry-out", default=None, help="最後の期間の引き継ぎを書き出す JSON（次の月を作るときに --carry-in で渡す）")
+    parser.add_argument("--show", action="store_true", help="期間ごとのシフト表を表示する")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    weights = DEFAULT_WEIGHTS if args.objective == "full" else EVAL_SHIFT_WEIGHTS
+    scheduler = RollingHorizonScheduler.from_file(
+        args.instance, context_days=args.context_days, time_budget=args.time_budget, weights=weights, seed=args.seed
+    )
+
+    carry = None
+    if args.carry_in is not None:
+        with open(args.carry_in, encoding="utf-8") as f:
+            carry = CarryOver.from_dict(json.load(f))
+    if args.start is not None:
+        start = date.fromisoformat(args.start)
+    elif carry is not None:
+        start = carry.end
+    else:
+        start = date.fromisoformat(str(scheduler.spec["horizon"]["start"]))
+
+    results = scheduler.run(start, args.period_days, args.n_periods, carry=carry, verbose=True)
+    print(f"合計ペナルティ {sum(r.objective for r in results)}、{sum(r.elapsed for r in results):.1f} 秒")
+    if args.show:
+        for r in results:
+            n_context = r.instance.n_days - r.schedule.shape[1]
+            # 引き継いだ日も含めたウィンドウを表示する
+            window = np.concatenate([r.instance.fixed_shifts[:, :n_context], r.schedule], axis=1)
+            show_shift(window.ravel().tolist(), instance=r.instance)
+
+    if args.carry_out is not None:
+        with open(args.carry_out, "w", encoding="utf-8") as f:
+            json.dump(results[-1].carry.to_dict(), f, ensure_ascii=False, indent=2)
+        print(f"引き継ぎを {args.carry_out} に書き出しました。")
@@ -0,0 +1,464 @@
+"""
+シフト表を作る HTTP サービス（asyncio のみで動き、追加の依存はない）
+
+    python scheduler_service.py --policy logs/policy.pt --instance instances/default.json --port 8080
+
+エンドポイント:
+    POST /schedule  {"instance": <仕様の辞書 または --instance で読み込んだ名前>, "n_samples": 1, "deterministic": true}
+                    -> {"schedule", "shift_labels", "penalties", "objective", "batch_size", "latency_ms"}
+                    n_samples は 1 以上 --max-samples 以下の整数、deterministic は true / false（それ以外は 400）
+    GET  /metrics   レイテンシ（p50 / p95 / p99）、スループット、バッチの大きさなど
+    GET  /health
+
+・読み込んだ方策（policy_export で書き出したもの）とコンパイル済みの問題インスタンスはメモリに保持する
+・同時に来たリクエストは max_batch_size 個まで、最初のリクエストから max_wait_ms だけ待ってまとめ、
+  問題インスタンスごとに方策の推論（PolicyRunner.rollout）とペナルティの評価（get_population_penalties）を1回で行う
+・--policy を省略すると、方策の代わりに generate_population で作った個体を返す（方策なしで動作を確かめる用）
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+
+from consts import ProblemInstance, load_problem_instance
+from consts.instance_loader import compile_spec
+from extra import PenaltyEngine, generate_population, get_population_penalties
+from extra.local_search import DEFAULT_WEIGHTS
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+
+class RequestError(Exception):
+    # クライアントに 400 で返すエラー
+    pass
+
+
+class _InstanceEntry(NamedTuple):
+    instance: ProblemInstance
+    engine: PenaltyEngine
+    runner: object
+
+
+class _Pending:
+    # キューに入れたリクエスト
+    __slots__ = ("key", "spec", "n_samples", "deterministic", "future", "received")
+
+    def __init__(self, key: str, spec, n_samples: int, deterministic: bool, future: asyncio.Future):
+        self.key = key
+        self.spec = spec
+        self.n_samples = n_samples
+        self.deterministic = deterministic
+        self.future = future
+        self.received = time.perf_counter()
+
+
+class ServiceMetrics:
+    """
+    リクエストのレイテンシ・スループットとバッチの統計
+
+    レイテンシは受け付けてから結果ができるまでの秒数で、直近 window 件から百分位を求める。
+    """
+
+    def __init__(self, window: int = 10000):
+        self.started = time.time()
+        self.n_requests = 0
+        self.n_errors = 0
+        self.n_batches = 0
+        self.n_batched_requests = 0
+        self.busy_seconds = 0.0
+        self._latencies = deque(maxlen=window)
+        self._finished = deque(maxlen=window)
+
+    def record_batch(self, batch_size: int, seconds: float) -> None:
+        self.n_batches += 1
+        self.n_batched_requests += batch_size
+        self.busy_seconds += seconds
+
+    def record_request(self, latency: float) -> None:
+        self.n_requests += 1
+        self._latencies.append(latency)
+        self._finished.append(time.time())
+
+    def record_error(self) -> None:
+        self.n_errors += 1
+
+    def snapshot(self, queue_size: int = 0, n_instances: int = 0) -> dict:
+        now = time.time()
+        latencies = np.array(self._latencies) * 1e3
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).tolist() if len(latencies) else (None, None, None)
+        recent = sum(1 for t in self._finished if t >= now - 60)
+        uptime = now - self.started
+        return {
+            "uptime_s": uptime,
+            "requests": self.n_requests,
+            "errors": self.n_errors,
+            "batches": self.n_batches,
+            "mean_batch_size": self.n_batched_requests / self.n_batches if self.n_batches else 0.0,
+            "latency_ms": {"p50": p50, "p95": p95, "p99": p99},
+            "throughput_rps": self.n_requests / uptime if uptime > 0 else 0.0,
+            "throughput_rps_60s": recent / min(60.0, uptime) if uptime > 0 else 0.0,
+            "busy_ratio": self.busy_seconds / uptime if uptime > 0 else 0.0,
+            "queue_size": queue_size,
+            "instances": n_instances,
+        }
+
+
+class SchedulerService:
+    """
+    リクエストをまとめてシフト表を作るサービス
+
+    HTTP を通さずに schedule() を直接呼んでも同じようにまとめて処理する。
+    推論と評価はイベントループを止めないよう、1つのスレッドでバッチごとに行う。
+    """
+
+    def __init__(
+        self,
+        policy_path: str | None = None,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_instances: int = 64,
+        weights: tuple[int, ...] = DEFAULT_WEIGHTS,
+        seed: int | None = None,
+        max_samples: int = 256,
+    ):
+        """
+        Args:
+            policy_path (str | None): policy_export で書き出した方策。None なら generate_population の個体を返す
+            max_batch_size (int): 1回のバッチにまとめるリクエスト数の上限
+            max_wait_ms (float): 最初のリクエストから、後続のリクエストを待つミリ秒数の上限
+            max_instances (int): メモリに保持する問題インスタンスの数（超えたら古いものから捨てる）
+            weights (tuple[int, ...]): サンプルから選ぶときの7種類のペナルティの重み
+            seed (int | None): サンプリングの乱数のシード
+            max_samples (int): 1リクエストの n_samples の上限（1回のバッチで (n_samples, E*D) の配列を作るため）
+        """
+        self.max_batch_size = max_batch_size
+        self.max_samples = max_samples
+        self.max_wait = max_wait_ms / 1e3
+        self.max_instances = max_instances
+        self.weights = np.asarray(weights, dtype=np.int64)
+        self.rng = np.random.default_rng(seed)
+        self.metrics = ServiceMetrics()
+        self._runner = None
+        if policy_path is not None:
+            from policy_runner import PolicyRunner
+
+            self._runner = PolicyRunner(policy_path)
+        self._instances: OrderedDict[str, _InstanceEntry] = OrderedDict()
+        self._names: dict[str, str] = {}
+        self._queue: asyncio.Queue | None = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._batch_task = None
+
+    def preload(self, path: str, name: str | None = None) -> str:
+        """
+        仕様ファイルの問題インスタンスを読み込んでおき、リクエストで name（省略時はファイル名）で指定できるようにします
+        """
+        name = os.path.splitext(os.path.basename(path))[0] if name is None else name
+        key = f"preload:{name}"
+        self._names[name] = key
+        self._get_entry(key, None, instance=load_problem_instance(path))
+        return name
+
+    async def start(self) -> None:
+        # バッチを処理するタスクを起動する（schedule() を呼ぶ前に必要）
+        if self._batch_task is None:
+            self._queue = asyncio.Queue()
+            self._batch_task = asyncio.create_task(self._batch_loop())
+
+    async def stop(self) -> None:
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+            try:
+                await self._batch_task
+            except asyncio.CancelledError:
+                pass
+            self._batch_task = None
+        self._executor.shutdown(wait=False)
+
+    async def schedule(self, instance, n_samples: int = 1, deterministic: bool = True) -> dict:
+        """
+        シフト表を1つ作ります（他のリクエストとまとめて処理する）
+
+        Args:
+            instance: 問題インスタンスの仕様の辞書、または preload した名前
+            n_samples (int): 方策からサンプリングする数（deterministic=False のとき。最良のものを返す）
+            deterministic (bool): True なら logits が最大の行動を選ぶ
+
+        Returns:
+            dict: "schedule"（(E, D) のシフト idx）、"shift_labels"、"penalties"、"objective" などのレスポンス
+        """
+        try:
+            return await self._schedule(instance, n_samples, deterministic)
+        except RequestError:
+            self.metrics.record_error()
+            raise
+
+    async def _schedule(self, instance, n_samples: int, deterministic: bool) -> dict:
+        if isinstance(instance, str):
+            if instance not in self._names:
+                raise RequestError(f"Unknown instance: {instance}. Loaded instances are {list(self._names)}")
+            key, spec = self._names[instance], None
+        elif isinstance(instance, dict):
+            if isinstance(instance.get("employees"), str):
+                raise RequestError("employees にはファイルのパスではなく社員のリストを指定してください")
+            key, spec = spec_key(instance), instance
+        else:
+            raise RequestError("instance には仕様の辞書か、読み込み済みのインスタンスの名前を指定してください")
+        # JSON の true は Python の bool（int のサブクラス）になるので、n_samples では除く
+        if isinstance(n_samples, bool) or not isinstance(n_samples, int) or not 1 <= n_samples <= self.max_samples:
+            raise RequestError(f"Invalid n_samples: {n_samples}. n_samples should be an integer in [1, {self.max_samples}]")
+        if not isinstance(deterministic, bool):
+            raise RequestError(f"Invalid deterministic: {deterministic!r}. deterministic should be true or false")
+
+        future = asyncio.get_running_loop().create_future()
+        pending = _Pending(key, spec, n_samples if not deterministic else 1, deterministic, future)
+        await self._queue.put(pending)
+        result = await future
+        latency = time.perf_counter() - pending.received
+        self.metrics.record_request(latency)
+        result["latency_ms"] = latency * 1e3
+        return result
+
+    async def _batch_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # 最初のリクエストから max_wait だけ、max_batch_size 個まで後続を待つ
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0 and self._queue.empty():
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), max(remaining, 0)))
+                except asyncio.TimeoutError:
+                    break
+
+            start = time.perf_counter()
+            results = await loop.run_in_executor(self._executor, self._run_batch, batch)
+            self.metrics.record_batch(len(batch), time.perf_counter() - start)
+            for pending, result in zip(batch, results):
+                if pending.future.done():
+                    continue
+                if isinstance(result, Exception):
+                    pending.future.set_exception(result)
+                else:
+                    pending.future.set_result(result)
+
+    def _run_batch(self, batch: list[_Pending]) -> list:
+        # 問題インスタンスごとに、推論と評価をまとめて1回ずつ行う
+        results = [None] * len(batch)
+        groups: dict[str, list[int]] = {}
+        for i, pending in enumerate(batch):
+            groups.setdefault(pending.key, []).append(i)
+
+        for key, indices in groups.items():
+            try:
+                entry = self._get_entry(key, batch[indices[0]].spec)
+                schedules = self._generate(entry, [batch[i] for i in indices])
+                penalties = get_population_penalties(schedules, engine=entry.engine)
+            except Exception as e:
+                for i in indices:
+                    results[i] = e if isinstance(e, RequestError) else RequestError(f"{type(e).__name__}: {e}")
+                continue
+
+            objectives = penalties @ self.weights
+            E, D = entry.instance.n_employees, entry.instance.n_days
+            offset = 0
+            for i in indices:
+                n = batch[i].n_samples
+                best = offset + int(np.argmin(objectives[offset : offset + n]))
+                offset += n
+                results[i] = {
+                    "schedule": schedules[best].reshape(E, D).tolist(),
+                    "shift_labels": list(entry.instance.shift_labels),
+                    "penalties": {f"p{k+1}": int(v) for k, v in enumerate(penalties[best])},
+                    "objective": int(objectives[best]),
+                    "n_samples": n,
+                    "batch_size": len(batch),
+                }
+        return results
+
+    def _generate(self, entry: _InstanceEntry, requests: list[_Pending]) -> np.ndarray:
+        # リクエストの順に n_samples 個ずつ並べた (合計, E*D) のシフト表
+        n_total = sum(r.n_samples for r in requests)
+        seed = int(self.rng.integers(2**63))
+        if entry.runner is None:
+            return generate_population(n_total, entry.instance, rng=seed, dtype=np.uint8).reshape(n_total, -1)
+
+        deterministic = [r.deterministic for r in requests]
+        schedules = np.empty((n_total, entry.instance.n_employees * entry.instance.n_days), dtype=np.uint8)
+        if any(deterministic):
+            greedy = entry.runner.rollout(1, deterministic=True)[0]
+        n_sampled = sum(r.n_samples for r in requests if not r.deterministic)
+        sampled = entry.runner.rollout(n_sampled, deterministic=False, seed=seed) if n_sampled else None
+        offset, sampled_offset = 0, 0
+        for r in requests:
+            if r.deterministic:
+                schedules[offset] = greedy
+            else:
+                schedules[offset : offset + r.n_samples] = sampled[sampled_offset : sampled_offset + r.n_samples]
+                sampled_offset += r.n_samples
+            offset += r.n_samples
+        return schedules
+
+    def _get_entry(self, key: str, spec: dict | None, instance: ProblemInstance | None = None) -> _InstanceEntry:
+        # コンパイル済みの問題インスタンスを LRU で保持する（preload したものは捨てない）
+        entry = self._instances.get(key)
+        if entry is not None:
+            self._instances.move_to_end(key)
+            return entry
+        if instance is None:
+            try:
+                instance = compile_spec(spec)
+            except (KeyError, ValueError, TypeError) as e:
+                raise RequestError(f"Invalid instance spec: {type(e).__name__}: {e}")
+        runner = None if self._runner is None else self._runner.for_instance(instance)
+        entry = _InstanceEntry(instance, PenaltyEngine.from_instance(instance), runner)
+        self._instances[key] = entry
+        preloaded = set(self._names.values())
+        for old in list(self._instances):
+            if len(self._instances) <= self.max_instances:
+                break
+            if old not in preloaded and old != key:
+                del self._instances[old]
+        return entry
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # HTTP/1.1 の1リクエストを処理して接続を閉じる
+        try:
+            status, body = await self._dispatch(reader)
+        except Exception as e:
+            status, body = 500, {"error": f"{type(e).__name__}: {e}"}
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+        writer.write(
+            f"HTTP/1.1 {status} {reason.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: close\r\n\r\n".encode("ascii")
+            + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _dispatch(self, reader: asyncio.StreamReader) -> tuple[int, dict]:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) < 2:
+            return 400, {"error": "Invalid request line"}
+        method, path = request_line[0], request_line[1].split("?")[0]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            return 200, self.metrics.snapshot(self._queue.qsize() if self._queue else 0, len(self._instances))
+        if path != "/schedule":
+            return 404, {"error": f"Not found: {path}"}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY_BYTES:
+            return 413, {"error": f"Body too large: {length} bytes"}
+        try:
+            payload = json.loads(await reader.readexactly(length))
+            result = await self.schedule(
+                payload.get("instance"),
+                n_samples=payload.get("n_samples", 1),
+                deterministic=payload.get("deterministic", True),
+            )
+        except (json.JSONDecodeError, UnicodeDecodeError, AttributeError) as e:
+            self.metrics.record_error()
+            return 400, {"error": f"Invalid JSON body: {e}"}
+        except RequestError as e:
+            return 400, {"error": str(e)}
+        return 200, result
+
+
+def spec_key(spec: dict) -> str:
+    # 仕様の辞書のハッシュ（キーの順番によらない）
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+async def serve(service: SchedulerService, host: str = "127.0.0.1", port: int = 8080) -> asyncio.AbstractServer:
+    """
+    サービスを起動して asyncio のサーバーを返します（port=0 なら空いているポート）
+    """
+    await service.start()
+    return await asyncio.start_server(service.handle, host, port)
+
+
+async def request(host: str, port: int, method: str = "GET", path: str = "/health", payload: dict | None = None) -> tuple[int, dict]:
+    """
+    サービスに HTTP リクエストを1つ送り、(ステータス, JSON) を返します（ローカルで動作を確かめる用）
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("ascii") + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    data = await reader.readexactly(length)
+    writer.close()
+    await writer.wait_closed()
+    return status, json.loads(data)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="シフト表を作る HTTP サービス")
+    parser.add_argument("--policy", default=None, help="policy_export で書き出した方策。省略時は generate_population の個体を返す")
+    parser.add_argument("--instance", action="append", default=[], help="起動時に読み込む仕様ファイル（複数指定可）。リクエストではファイル名（拡張子なし）で指定できる")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-size", type=int, default=32, help="1回のバッチにまとめるリクエスト数の上限")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="後続のリクエストを待つミリ秒数の上限")
+    parser.add_argument("--max-instances", type=int, default=64, help="メモリに保持する問題インスタンスの数")
+    parser.add_argument("--max-samples", type=int, default=256, help="1リクエストの n_samples の上限（超えたら 400 を返す）")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args()
+
+
+async def main(args) -> None:
+    service = SchedulerService(args.policy, args.max_batch_size, args.max_wait_ms, args.max_instances, seed=args.seed, max_samples=args.max_samples)
+    for path in args.instance:
+        print(f"{path} を {service.preload(path)} として読み込みました。")
+    server = await serve(service, args.host, args.port)
+    print(f"http://{args.host}:{args.port} で待ち受けています。")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main(parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,104 @@
+import numpy as np
+from gymnasium import spaces
+
+from consts import ProblemInstance
+from scheduling_env_v2 import SchedulerEnv
+
+
+class SchedulerCycleEnv(SchedulerEnv):
+    """
+    1ステップで社員の1サイクル分の勤務日のシフトをまとめて決める SchedulerEnv
+
+    ・サイクルはサイクル終了日（休->休、WorkCycle.check_is_cycle_end）で区切る（count_ignore_cycle と同じ）
+    ・各ステップの対象は (社員, サイクル) の勤務日の組で、選んだシフトをその勤務日すべてに入れる
+    ・休日は reset の時点で休みが入っており、行動では変えない
+    ・アクションマスクは、対象の勤務日すべてで選択可能なシフト
+    ・エピソードの長さは (社員, サイクル) の数（既定のインスタンスで 126 -> 18 ステップ）
+
+    "state" は [社員 idx, 対象の最初の日 idx, 決定済みのステップ数]。
+    info["schedule"] は SchedulerEnv と同じ長さ E*D のシフト表。
+    """
+
+    def __init__(self, instance: ProblemInstance | None = None, rich_observation: bool = False):
+        # rich_observation の特徴量は1日ずつ決めることが前提なので、複数日をまとめて決めるこの環境では使えない
+        if rich_observation:
+            raise ValueError("rich_observation は SchedulerEnv のみ対応しています")
+        super(SchedulerCycleEnv, self).__init__(instance)
+        inst = self.instance
+        E, D, S = self.n_employees, self.n_days, self.n_shifts
+        self.n_cells = E * D
+
+        # (社員, サイクル) ごとの勤務日
+        units = []
+        cycle_id = self.engine.cycle_id
+        for e in range(E):
+            work_days = np.flatnonzero(inst.work_day_mask[e])
+            for c in np.unique(cycle_id[e, work_days]):
+                units.append((e, work_days[cycle_id[e, work_days] == c]))
+        self.n_units = len(units)
+        self.total_steps = self.n_units
+
+        # 各ステップで書き込むセル（社員ごとに日が並ぶ個体の idx）。長さを揃えるため、余りは最後の捨て場のセルを指す
+        max_len = max((len(days) for _, days in units), default=1)
+        self.unit_cells = np.full((self.n_units, max_len), self.n_cells, dtype=np.int64)
+        unit_masks = np.zeros((self.n_units, S), dtype=np.uint8)
+        for k, (e, days) in enumerate(units):
+            self.unit_cells[k, : len(days)] = e * D + days
+            masks = inst.action_masks[e, days].astype(bool)
+            # 勤務日ならマスクは同じはずだが、異なるときはいずれかの日で選べるシフトを許す
+            unit_masks[k] = masks.all(axis=0) if masks.all(axis=0).any() else masks.any(axis=0)
+
+        # 休日に休みを入れた初期のシフト表（最後の要素は捨て場）
+        self.initial_schedule = np.zeros(self.n_cells + 1, dtype=np.uint8)
+        self.initial_schedule[:-1][inst.rest_day_mask.ravel()] = inst.rest_shift_idx
+        self._buffer = None
+
+        state_low = np.array([0, 0, 0], dtype=np.int32)
+        state_high = np.array([E - 1, D - 1, self.total_steps], dtype=np.int32)
+        self.observation_space = spaces.Dict(
+            {
+                "state": spaces.Box(low=state_low, high=state_high, shape=(3,), dtype=np.int32),
+                "action_mask": spaces.Box(low=0, high=1, shape=(S,), dtype=np.uint8),
+                "avail_actions": spaces.Box(low=0, high=1, shape=(S,), dtype=np.uint8),
+            }
+        )
+
+        # 観測の表（最後の行は終端状態）
+        self.state_table = np.zeros((self.total_steps + 1, 3), dtype=np.int32)
+        for k, (e, days) in enumerate(units):
+            self.state_table[k] = [e, days[0], k]
+        self.state_table[-1] = [E - 1, D - 1, self.total_steps]
+        self.action_mask_table = np.zeros((self.total_steps + 1, S), dtype=np.uint8)
+        self.action_mask_table[:-1] = unit_masks
+        self.avail_actions_table = np.ones((2, S), dtype=np.uint8)
+        self.avail_actions_table[1] = 0
+        for table in (self.state_table, self.action_mask_table, self.avail_actions_table, self.unit_cells, self.initial_schedule):
+            table.setflags(write=False)
+
+    def reset(self, seed=None, options=None):
+        """
+        エピソード開始時の初期化。休日に休みを入れたシフト表から始める
+        """
+        if self._buffer is None:
+            self._buffer = self.initial_schedule.copy()
+            self.schedule = self._buffer[:-1]
+        else:
+            self._buffer[:] = self.initial_schedule
+        self.current_step = 0
+        return self._get_obs(), {}
+
+    def step(self, action):
+        """
+        現在の (社員, サイクル) の勤務日すべてに、選択されたシフト(action)を記録。
+        エピソード終了時の報酬は SchedulerEnv と同じ
+        """
+        self._buffer[self.unit_cells[self.current_step]] = action
+
+        self.current_step += 1
+        done = self.current_step >= self.total_steps
+        if not done:
+            return self._get_obs(), 0.0, False, False, {}
+
+        reward = -self._evaluate()
+        info = {"schedule": self.schedule.copy()}
+        return self._get_obs(), reward, done, False, info
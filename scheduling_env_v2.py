@@ -1,9 +1,9 @@
 import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
-from consts import Day, Employee, Shift
+from consts import ProblemInstance, get_problem_instance
 from variables import Variables
-from extra import show_shift, get_penalties, evalShift
+from extra import show_shift, get_penalties, evalShift, get_penalty_engine, profiler
 
 
 class SchedulerEnv(gym.Env):
@@ -13,25 +13,32 @@ class SchedulerEnv(gym.Env):
     "avail_actions": 固定的に全行動が選択可能かを示す（今回は全て1）
 
     ・社員数×日数のシフト表を埋めていく。初期値は0(休み)
+
+    rich_observation=True のときは、次の観測も加える（step で書いたセルから差分で更新する）
+    "coverage": 現在の日に、これまでに割り当てたシフトごとの人数
+    "previous_cycle_shift": 現在の社員の前のサイクルのシフト（休み以外で最後に入れたもの）の one-hot
+    "current_cycle_shift": 現在の社員の今のサイクルでこれまでに入れたシフト（休み以外で最後のもの）の one-hot
     """
 
     metadata = {"render.modes": ["human"]}
 
-    def __init__(self):
+    def __init__(self, instance: ProblemInstance | None = None, rich_observation: bool = False):
         super(SchedulerEnv, self).__init__()
 
-        # 社員・日の定義（従来通り固定のものを利用）
-        self.employees = Employee.get_instances()
-        self.days = Day.get_instances()
-        self.n_employees = len(self.employees)
-        self.n_days = len(self.days)
+        # 社員・日の定義（指定がなければ従来通り consts の固定のものを利用）
+        self.instance = get_problem_instance() if instance is None else instance
+        self.engine = get_penalty_engine(instance)
+        self.employees = self.instance.employees
+        self.days = self.instance.days
+        self.n_employees = self.instance.n_employees
+        self.n_days = self.instance.n_days
         self.total_steps = self.n_employees * self.n_days
 
         # 利用するシフト候補（すべてのシフトを候補とする）
-        self.shifts = Shift.get_instances()
-        self.n_shifts = len(self.shifts)
+        self.shifts = self.instance.shifts
+        self.n_shifts = self.instance.n_shifts
 
-        # エピソード内に決定するシフト割当（整数リスト：各要素が各ポジションでのシフト idx）
+        # エピソード内に決定するシフト割当（uint8 の1次元配列：各要素が各ポジションでのシフト idx）
         self.schedule = None
 
         # 現在のステップ（0～total_steps-1）
@@ -46,10 +53,54 @@ class SchedulerEnv(gym.Env):
         avail_actions_space = spaces.Box(low=0, high=1, shape=(self.n_shifts,), dtype=np.uint8)
 
         self.observation_space = spaces.Dict({"state": state_space, "action_mask": action_mask_space, "avail_actions": avail_actions_space})
+        self.rich_observation = rich_observation
+        if rich_observation:
+            self.observation_space = spaces.Dict(
+                {
+                    **self.observation_space.spaces,
+                    "coverage": spaces.Box(low=0, high=self.n_employees, shape=(self.n_shifts,), dtype=np.int32),
+                    "previous_cycle_shift": spaces.Box(low=0, high=1, shape=(self.n_shifts,), dtype=np.uint8),
+                    "current_cycle_shift": spaces.Box(low=0, high=1, shape=(self.n_shifts,), dtype=np.uint8),
+                }
+            )
 
         # 行動空間：離散値（0～n_shifts-1）
         self.action_space = spaces.Discrete(self.n_shifts)
 
+        # 観測はステップ番号で引けるよう事前に作っておく（最後の行は終端状態）
+        # 返す配列はこれらの表の読み取り専用ビューなので、ステップごとの計算・確保はない
+        steps = np.arange(self.total_steps + 1)
+        self.state_table = np.stack([steps // self.n_days, steps % self.n_days, steps], axis=1).astype(np.int32)
+        self.state_table[-1] = [self.n_employees - 1, self.n_days - 1, self.total_steps]
+        self.action_mask_table = np.zeros((self.total_steps + 1, self.n_shifts), dtype=np.uint8)
+        self.action_mask_table[:-1] = self.instance.action_masks.reshape(self.total_steps, self.n_shifts)
+        # avail_actions は、常に全アクションが存在するものとする（終端状態のみ 0）
+        self.avail_actions_table = np.ones((2, self.n_shifts), dtype=np.uint8)
+        self.avail_actions_table[1] = 0
+
+        # rich_observation 用：各ステップで社員・サイクルが切り替わるか、シフト idx -> one-hot（最後の行は「なし」）
+        cycle_id = self.engine.cycle_id.ravel()
+        self.employee_start_table = np.zeros(self.total_steps + 1, dtype=bool)
+        self.employee_start_table[:-1] = steps[:-1] % self.n_days == 0
+        self.cycle_start_table = np.zeros(self.total_steps + 1, dtype=bool)
+        self.cycle_start_table[1:-1] = (cycle_id[1:] != cycle_id[:-1]) & ~self.employee_start_table[1:-1]
+        self.one_hot_table = np.eye(self.n_shifts + 1, self.n_shifts, dtype=np.uint8)
+        self.one_hot_table[-1] = 0
+        # 日ごとのシフトの人数。観測はこの行の読み取り専用ビューを返す（毎ステップ配列を作らない）
+        self._coverage = np.zeros((self.n_days, self.n_shifts), dtype=np.int32)
+        self._coverage_view = self._coverage.view()
+        self._coverage_view.setflags(write=False)
+        # step で1セルずつ読むものは Python のリストで持つ（NumPy のスカラー参照より速い）
+        self._step_day = self.state_table[:, 1].tolist()
+        self._employee_start = self.employee_start_table.tolist()
+        self._cycle_start = self.cycle_start_table.tolist()
+        self._one_hot_rows = list(self.one_hot_table)
+        self._previous_cycle_shift = self.n_shifts
+        self._current_cycle_shift = self.n_shifts
+
+        for table in (self.state_table, self.action_mask_table, self.avail_actions_table, self.employee_start_table, self.cycle_start_table, self.one_hot_table):
+            table.setflags(write=False)
+
     def reset(self, seed=None, options=None):
         """
         エピソード開始時の初期化。
@@ -57,8 +108,14 @@ class SchedulerEnv(gym.Env):
         ・ステップカウンタを0にする
         ・状態（obs）を更新して返す
         """
-        self.schedule = [0] * self.total_steps
+        if self.schedule is None:
+            self.schedule = np.zeros(self.total_steps, dtype=np.uint8)
+        else:
+            self.schedule.fill(0)
         self.current_step = 0
+        if self.rich_observation:
+            self._coverage.fill(0)
+            self._previous_cycle_shift = self._current_cycle_shift = self.n_shifts
         obs = self._get_obs()
         # Gymnasium では (observation, info) のタプルを返すのが仕様
         return obs, {}
@@ -77,42 +134,20 @@ class SchedulerEnv(gym.Env):
         ② それ以外の場合は、社員が forbidden_shifts, スキルが forbiden_shifts に含むシフトは不可とする
         （※元の個体生成関数 generate_individual の論理を参考）
         - マスクは長さ n_shifts の 0/1 ベクトル
+        ※返す配列は事前計算した表の読み取り専用ビュー（"coverage" は後の step で同じ日のセルを書くと値が変わる）
         """
-        e_idx = self.current_step // self.n_days
-        d_idx = self.current_step % self.n_days
+        step = self.current_step
         # 状態情報としてはシンプルに [e_idx, d_idx, 採用済み割当数]
-        progress = self.current_step  # すでに決定済みの数
-        state_vector = np.array([e_idx, d_idx, progress], dtype=np.int32)
-
-        # 現在対象の社員、日オブジェクト
-        current_employee = self.employees[e_idx]
-        current_day = self.days[d_idx]
-
-        # アクションマスクの作成
-        # まずすべて選択可能とし、その後制約に合わないものを 0 に設定
-        mask = np.ones(self.n_shifts, dtype=np.uint8)
-
-        # ① 日の勤務状況に応じた制約：
-        # もし current_day が休みの日（work_cycle.check_is_rest_day）なら、通常「休」以外は不可
-        if current_employee.work_cycle.check_is_rest_day(current_day):
-            for s in self.shifts:
-                if s.id != "O":  # 「休」以外は不可
-                    mask[s.idx] = 0
-        else:
-            # ② 社員の個別制約（forbidden_shifts）およびスキルによる制約を反映
-            for s in self.shifts:
-                if s in current_employee.forbidden_shifts:
-                    mask[s.idx] = 0
-                if s in current_employee.skill.forbidden_shifts:
-                    mask[s.idx] = 0
-                # ※シフト "O"（休み）は、休み出ない日には通常選ばせない（個体生成時と同様）のなら除外
-                if s.id == "O":
-                    mask[s.idx] = 0
-
-        # avail_actions は、常に全アクションが存在するものとする
-        avail_actions = np.ones(self.n_shifts, dtype=np.uint8)
-
-        obs = {"state": state_vector, "action_mask": mask, "avail_actions": avail_actions}
+        # マスクは ProblemInstance.action_masks（社員・日・シフトのテンソル）から引く
+        obs = {
+            "state": self.state_table[step],
+            "action_mask": self.action_mask_table[step],
+            "avail_actions": self.avail_actions_table[int(step >= self.total_steps)],
+        }
+        if self.rich_observation:
+            obs["coverage"] = self._coverage_view[self._step_day[step]]
+            obs["previous_cycle_shift"] = self._one_hot_rows[self._previous_cycle_shift]
+            obs["current_cycle_shift"] = self._one_hot_rows[self._current_cycle_shift]
         return obs
 
     def step(self, action):
@@ -123,42 +158,57 @@ class SchedulerEnv(gym.Env):
         """
         # 現在のステップに対して行動を記録
         self.schedule[self.current_step] = action
+        if self.rich_observation:
+            self._update_features(int(action))
 
         self.current_step += 1
         done = self.current_step >= self.total_steps
 
         # 途中は報酬は 0; エピソード終了時に全体評価
         if not done:
-            reward = 0.0
-            obs = self._get_obs()
+            return self._get_obs(), 0.0, False, False, {}
 
-        ## ペナルティ定義
-        total_penalty = evalShift(self.schedule)
-
-        reward = -total_penalty  # 目的はペナルティ最小化
+        reward = -self._evaluate()  # 目的はペナルティ最小化
         # 最終状態は適当な情報にする（たとえば進捗が終端を示す）
-        obs = {
-            "state": np.array([self.n_employees - 1, self.n_days - 1, self.total_steps], dtype=np.int32),
-            "action_mask": np.zeros(self.n_shifts, dtype=np.uint8),
-            "avail_actions": np.zeros(self.n_shifts, dtype=np.uint8),
-        }
+        obs = self._get_obs()
 
+        # スケジュールは次の reset で上書きされるのでコピーを渡す
         info = {"schedule": self.schedule.copy()}
         return obs, reward, done, False, info
 
+    def _update_features(self, action: int) -> None:
+        # 書いたセルの分だけ人数とサイクルのシフトを更新する
+        step = self.current_step
+        self._coverage[self._step_day[step], action] += 1
+        if action != self.instance.rest_shift_idx:
+            self._current_cycle_shift = action
+        if self._employee_start[step + 1]:
+            self._previous_cycle_shift = self._current_cycle_shift = self.n_shifts
+        elif self._cycle_start[step + 1]:
+            self._previous_cycle_shift = self._current_cycle_shift
+            self._current_cycle_shift = self.n_shifts
+
+    def _evaluate(self) -> int:
+        # 終端でのシフト表全体の評価
+        return evalShift(self.schedule, engine=self.engine)
+
+    def get_profile(self) -> dict[str, tuple[int, float]]:
+        # このプロセスで計測したプロファイル（SubprocVecEnv のワーカーから env_method で集める）
+        return profiler.snapshot()
+
     def render(self, mode="human"):
         # スケジュールの各要素がNumPyのarrayなどの場合は、plain intに変換して表示する
         clean_schedule = [int(x) if isinstance(x, (np.ndarray, np.generic)) else x for x in self.schedule]
         if self.current_step >= self.total_steps:
             print("最終スケジュール:")
             # show_shift() にplainなリストを渡す、もしくは自前で整形表示
-            show_shift(clean_schedule)
-            pena_list = get_penalties(clean_schedule)
+            show_shift(clean_schedule, instance=self.instance)
+            pena_list = get_penalties(clean_schedule, engine=self.engine)
             for i, p in enumerate(pena_list):
                 print(f"p{i+1}: {p}")
         else:
             print("現在のステップ:", self.current_step)
-            show_shift(clean_schedule)
+            show_shift(clean_schedule, instance=self.instance)
 
     def close(self):
         pass
@@ -0,0 +1,173 @@
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+from consts import ProblemInstance
+from extra import evalPopulation, show_shift
+from scheduling_env_v2 import SchedulerEnv
+
+
+class SchedulerVecEnv(VecEnv):
+    """
+    SchedulerEnv を num_envs 個まとめて1つの配列で進めるベクトル化環境（SB3 の VecEnv 互換）
+
+    ・各環境のシフト表は (num_envs, 社員数×日数) の uint8 配列で持つ
+    ・観測とアクションマスクは SchedulerEnv の事前計算済みの表から全環境分まとめて引く
+    ・エピソードが終わった環境は自動でリセットし、終了時の報酬は全環境分を一度に評価する
+      （infos には "terminal_observation" と "schedule" を入れる）
+    ・env_class に SchedulerCycleEnv を渡すと、1ステップで (社員, サイクル) の勤務日をまとめて決める
+    ・rich_observation=True なら SchedulerEnv と同じ観測を加え、全環境分を差分でまとめて更新する（SchedulerEnv のみ）
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        instance: ProblemInstance | None = None,
+        env_class: type[SchedulerEnv] = SchedulerEnv,
+        rich_observation: bool = False,
+    ):
+        # 観測・行動空間と観測の表は env_class のものを共有する
+        self._template = env_class(instance, rich_observation=True) if rich_observation else env_class(instance)
+        self.rich_observation = rich_observation
+        self.instance = self._template.instance
+        self.engine = self._template.engine
+        self.total_steps = self._template.total_steps
+        self.state_table = self._template.state_table
+        self.action_mask_table = self._template.action_mask_table
+        self.avail_actions_table = self._template.avail_actions_table
+        self.render_mode = None
+
+        super().__init__(num_envs, self._template.observation_space, self._template.action_space)
+
+        # サイクル単位の環境では、各ステップで書き込むセルの表と初期のシフト表（最後の列は捨て場）を使う
+        self.unit_cells = getattr(self._template, "unit_cells", None)
+        if self.unit_cells is None:
+            self.n_cells = self.total_steps
+            self.initial_schedule = np.zeros(self.total_steps, dtype=np.uint8)
+        else:
+            self.n_cells = self._template.n_cells
+            self.initial_schedule = self._template.initial_schedule
+        self.schedules = np.tile(self.initial_schedule, (num_envs, 1))
+        self.current_steps = np.zeros(num_envs, dtype=np.int64)
+        self._env_idx = np.arange(num_envs)
+        self._actions = None
+
+        if rich_observation:
+            if self.unit_cells is not None:
+                raise ValueError("rich_observation は SchedulerEnv のみ対応しています")
+            n_shifts = self._template.n_shifts
+            self.rest_shift_idx = self.instance.rest_shift_idx
+            self.employee_start_table = self._template.employee_start_table
+            self.cycle_start_table = self._template.cycle_start_table
+            self.one_hot_table = self._template.one_hot_table
+            self._coverage = np.zeros((num_envs, self._template.n_days, n_shifts), dtype=np.int32)
+            self._previous_cycle_shift = np.full(num_envs, n_shifts, dtype=np.int64)
+            self._current_cycle_shift = np.full(num_envs, n_shifts, dtype=np.int64)
+
+    def reset(self):
+        self.schedules[:] = self.initial_schedule
+        self.current_steps.fill(0)
+        if self.rich_observation:
+            self._reset_features(self._env_idx)
+        self._reset_seeds()
+        self._reset_options()
+        return self._get_obs()
+
+    def _get_obs(self) -> dict[str, np.ndarray]:
+        steps = self.current_steps
+        obs = {
+            "state": self.state_table[steps],
+            "action_mask": self.action_mask_table[steps],
+            "avail_actions": self.avail_actions_table[(steps >= self.total_steps).astype(np.int64)],
+        }
+        if self.rich_observation:
+            obs["coverage"] = self._coverage[self._env_idx, self.state_table[steps, 1]]
+            obs["previous_cycle_shift"] = self.one_hot_table[self._previous_cycle_shift]
+            obs["current_cycle_shift"] = self.one_hot_table[self._current_cycle_shift]
+        return obs
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions = actions
+
+    def step_wait(self):
+        # 全環境の現在のステップに対して行動を記録
+        if self.unit_cells is None:
+            self.schedules[self._env_idx, self.current_steps] = self._actions
+        else:
+            self.schedules[self._env_idx[:, None], self.unit_cells[self.current_steps]] = np.asarray(self._actions)[:, None]
+        if self.rich_observation:
+            self._update_features(np.asarray(self._actions, dtype=np.int64))
+        self.current_steps += 1
+        dones = self.current_steps >= self.total_steps
+
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        infos = [{} for _ in range(self.num_envs)]
+        if dones.any():
+            # 終了した環境はまとめて評価し、終端の観測・スケジュールを infos に入れてからリセットする
+            done_idx = np.flatnonzero(dones)
+            rewards[done_idx] = -self._evaluate(self.schedules[done_idx, : self.n_cells])
+            terminal_obs = self._get_obs()
+            for k in done_idx:
+                infos[k]["terminal_observation"] = {key: value[k] for key, value in terminal_obs.items()}
+                infos[k]["schedule"] = self.schedules[k, : self.n_cells].copy()
+                infos[k]["TimeLimit.truncated"] = False
+            self.schedules[done_idx] = self.initial_schedule
+            self.current_steps[done_idx] = 0
+            if self.rich_observation:
+                self._reset_features(done_idx)
+
+        return self._get_obs(), rewards, dones, infos
+
+    def _update_features(self, actions: np.ndarray) -> None:
+        # 書いたセルの分だけ人数とサイクルのシフトを全環境まとめて更新する（SchedulerEnv._update_features と同じ）
+        steps = self.current_steps
+        self._coverage[self._env_idx, self.state_table[steps, 1], actions] += 1
+        current = np.where(actions != self.rest_shift_idx, actions, self._current_cycle_shift)
+        employee_start = self.employee_start_table[steps + 1]
+        cycle_start = self.cycle_start_table[steps + 1]
+        none = self.one_hot_table.shape[0] - 1
+        self._previous_cycle_shift = np.where(employee_start, none, np.where(cycle_start, current, self._previous_cycle_shift))
+        self._current_cycle_shift = np.where(employee_start | cycle_start, none, current)
+
+    def _reset_features(self, env_idx: np.ndarray) -> None:
+        none = self.one_hot_table.shape[0] - 1
+        self._coverage[env_idx] = 0
+        self._previous_cycle_shift[env_idx] = none
+        self._current_cycle_shift[env_idx] = none
+
+    def select(self, indices: np.ndarray) -> None:
+        """
+        各環境の状態（シフト表・ステップ・観測の特徴量）を indices 番目の環境の状態で置き換えます
+        ビームサーチで残す候補を選び直すときに使う
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        self.schedules[:] = self.schedules[indices]
+        self.current_steps[:] = self.current_steps[indices]
+        if self.rich_observation:
+            self._coverage[:] = self._coverage[indices]
+            self._previous_cycle_shift = self._previous_cycle_shift[indices]
+            self._current_cycle_shift = self._current_cycle_shift[indices]
+
+    def _evaluate(self, schedules: np.ndarray) -> np.ndarray:
+        # 終了した環境のシフト表をまとめて評価
+        return evalPopulation(schedules, engine=self.engine)
+
+    def close(self) -> None:
+        pass
+
+    def render(self, mode: str | None = None) -> None:
+        # 先頭の環境のシフト表を表示する
+        print("現在のステップ:", int(self.current_steps[0]))
+        show_shift(self.schedules[0, : self.n_cells].tolist(), instance=self.instance)
+
+    def get_attr(self, attr_name: str, indices=None) -> list:
+        # 環境ごとの実体はないので、すべての環境でこのオブジェクトの属性を返す
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name: str, value, indices=None) -> None:
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> list:
+        return [getattr(self, method_name)(*method_args, **method_kwargs) for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> list[bool]:
+        return [False for _ in self._get_indices(indices)]
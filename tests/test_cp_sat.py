@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from consts import get_problem_instance
+from consts.instance_generator import generate_instance
+from extra import generate_population, get_penalty_engine
+
+pytest.importorskip("ortools")
+
+from extra.cp_sat import CpSatSolver  # noqa: E402
+
+
+def solver_objective(instance, schedule: np.ndarray, weights: tuple[int, ...]) -> int:
+    # すべてのセルを schedule に固定したモデルの目的関数値
+    result = CpSatSolver(instance.with_fixed_shifts(schedule), weights=weights).solve(time_limit=10, n_workers=1)
+    assert (result.schedule == schedule).all()
+    return result.history[-1][1]
+
+
+@pytest.mark.parametrize(
+    "instance",
+    [get_problem_instance(), generate_instance(8, 21, n_work_days_choices=(4, 5), seed=1)],
+    ids=["consts", "generated"],
+)
+def test_encoding_matches_engine(instance):
+    engine = get_penalty_engine(instance)
+    rng = np.random.default_rng(0)
+    population = generate_population(4, instance, rng=rng)
+    for individual in population:
+        schedule = engine.to_schedule(individual)
+        weights = tuple(int(w) for w in rng.integers(1, 5, size=7))
+        expected = int(engine.evaluate(schedule) @ np.asarray(weights))
+        assert solver_objective(instance, schedule, weights) == expected
+
+
+def test_encoding_with_rest_pinned_on_work_days():
+    # 直した欠勤を引き継いだときのように、勤務日（区切り候補日を含む）に休みを固定する
+    instance = generate_instance(8, 21, n_work_days_choices=(4, 5), n_rest_days=1, seed=3)
+    engine = get_penalty_engine(instance)
+    rng = np.random.default_rng(1)
+    candidates = np.flatnonzero((instance.cycle_end_rest_to_rest & instance.work_day_mask).ravel())
+    for individual in generate_population(10, instance, rng=rng):
+        schedule = engine.to_schedule(individual).copy()
+        cells = rng.choice(candidates, size=3, replace=False)
+        schedule.ravel()[cells] = instance.rest_shift_idx
+        schedule.ravel()[rng.choice(schedule.size, size=3)] = instance.rest_shift_idx
+        weights = tuple(int(w) for w in rng.integers(1, 5, size=7))
+        expected = int(engine.evaluate(schedule) @ np.asarray(weights))
+        assert solver_objective(instance, schedule, weights) == expected
@@ -0,0 +1,44 @@
+import random
+
+import numpy as np
+import pytest
+
+from consts.instance_generator import generate_instance
+from extra import DeltaEvaluator, generate_population, get_penalty_engine
+
+INSTANCES = {
+    "consts": lambda: None,
+    "generated": lambda: generate_instance(12, 30, n_work_days_choices=(4, 5), seed=4),
+}
+
+
+@pytest.mark.parametrize("name", list(INSTANCES))
+@pytest.mark.parametrize("initial", ["random", "population"])
+def test_random_edits_match_engine(name, initial):
+    instance = INSTANCES[name]()
+    engine = get_penalty_engine(instance)
+    E, D, S = engine.n_employees, engine.n_days, engine.n_shifts
+    rng = random.Random(5)
+    np_rng = np.random.default_rng(5)
+    # 休みを多めに選ぶ（サイクルの区切りやサイクル内の休みが変わる変更を増やす）
+    choices = [engine.rest_shift_idx] * 2 + list(range(S))
+
+    for _ in range(20):
+        if initial == "random":
+            schedule = np_rng.integers(0, S, size=(E, D))
+        else:
+            schedule = generate_population(1, instance, rng=np_rng)[0].reshape(E, D)
+        evaluator = DeltaEvaluator(schedule, engine=engine)
+        assert evaluator.penalties == engine.evaluate(schedule).tolist()
+
+        current = schedule.copy()
+        for _ in range(50):
+            e, d, s = rng.randrange(E), rng.randrange(D), rng.choice(choices)
+            diff = evaluator.delta(e, d, s)
+            current[e, d] = s
+            expected = engine.evaluate(current).tolist()
+            assert [p + dp for p, dp in zip(evaluator.penalties, diff)] == expected
+            assert evaluator.apply(e, d, s) == diff
+            assert evaluator.penalties == expected
+            assert evaluator.shift_at(e, d) == s
+        assert (evaluator.schedule == current).all()
@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+from eval_scheduler import summarize
+from extra import generate_population
+
+
+def test_throughput_uses_wall_clock_time():
+    population = generate_population(6, rng=0, dtype=np.uint8).reshape(6, -1)
+    # 2つのワーカーが同じ 2 秒間に 3 エピソードずつ作った
+    results = [
+        {"schedules": population[:3], "rewards": np.zeros(3), "elapsed": 2.0, "started": 100.0, "finished": 102.0},
+        {"schedules": population[3:], "rewards": np.zeros(3), "elapsed": 2.0, "started": 100.0, "finished": 102.0},
+    ]
+    summary = summarize(None, results)
+    assert summary["n_episodes"] == 6
+    assert summary["wall_seconds"] == pytest.approx(2.0)
+    assert summary["worker_seconds"] == pytest.approx(4.0)
+    assert summary["episodes_per_sec"] == pytest.approx(3.0)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from consts.instance_generator import generate_instance
+from extra import GeneticAlgorithm, get_penalty_engine
+
+INSTANCE = generate_instance(8, 21, n_work_days_choices=(4, 5), seed=6)
+
+
+def pinned_instance(instance, seed: int = 0):
+    # 社員ごとに勤務日の1セルを、選択可能なシフトのうちランダムな1つに固定する
+    rng = np.random.default_rng(seed)
+    fixed = np.full((instance.n_employees, instance.n_days), -1, dtype=np.int64)
+    for e in range(instance.n_employees):
+        d = rng.choice(np.flatnonzero(instance.work_day_mask[e]))
+        fixed[e, d] = rng.choice(np.flatnonzero(instance.action_masks[e, d]))
+    return instance.with_fixed_shifts(fixed), fixed
+
+
+def assert_respects_masks(instance, schedule: np.ndarray):
+    E, D = np.indices(schedule.shape)
+    assert instance.action_masks[E, D, schedule].all()
+
+
+@pytest.mark.parametrize("crossover", ["row", "cycle"])
+def test_result_respects_masks_and_penalties(crossover):
+    ga = GeneticAlgorithm(INSTANCE, population_size=30, crossover=crossover, mutation_prob=1.0, seed=0)
+    result = ga.run(20)
+    assert_respects_masks(INSTANCE, result.schedule)
+    assert result.penalties == get_penalty_engine(INSTANCE).evaluate(result.schedule).tolist()
+    assert result.objective == int(np.asarray(result.penalties) @ ga.weights)
+    # エリートを残すので最良値は悪くならない
+    best = [row["best"] for row in result.history]
+    assert all(a >= b for a, b in zip(best, best[1:]))
+    assert best[-1] == result.objective
+
+
+def test_pinned_cells_are_preserved():
+    instance, fixed = pinned_instance(INSTANCE)
+    ga = GeneticAlgorithm(instance, population_size=30, mutation_prob=1.0, seed=1)
+    population = ga.initial_population()
+    for _ in range(30):
+        children = ga._make_offspring(population, np.zeros(len(population)), len(population))
+        for child in children:
+            assert_respects_masks(instance, child)
+        population = children
+    result = ga.run(30)
+    pinned = fixed >= 0
+    assert (result.schedule[pinned] == fixed[pinned]).all()
+    assert_respects_masks(instance, result.schedule)
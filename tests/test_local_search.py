@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from consts import get_problem_instance
+from consts.instance_generator import generate_instance
+from extra import LocalSearch, get_penalty_engine
+from extra.local_search import EVAL_SHIFT_WEIGHTS
+
+GENERATED = generate_instance(8, 21, n_work_days_choices=(4, 5), seed=7)
+
+
+def pinned(instance):
+    # 社員ごとに勤務日の最初のセルを、選択可能な最後のシフトに固定する
+    fixed = np.full((instance.n_employees, instance.n_days), -1, dtype=np.int64)
+    for e in range(instance.n_employees):
+        d = int(np.flatnonzero(instance.work_day_mask[e])[0])
+        fixed[e, d] = int(np.flatnonzero(instance.action_masks[e, d])[-1])
+    return instance.with_fixed_shifts(fixed)
+
+
+def assert_respects_masks(instance, schedule: np.ndarray):
+    E, D = np.indices(schedule.shape)
+    assert instance.action_masks[E, D, schedule].all()
+
+
+@pytest.mark.parametrize("instance", [get_problem_instance(), GENERATED, pinned(GENERATED)], ids=["consts", "generated", "pinned"])
+def test_repair_respects_masks(instance):
+    search = LocalSearch(instance)
+    rng = np.random.default_rng(0)
+    schedule = rng.integers(0, instance.n_shifts, size=(instance.n_employees, instance.n_days))
+    repaired = search.repair(schedule)
+    assert_respects_masks(instance, repaired)
+    # 選択可能なシフトが入っていたセルは変えない
+    E, D = np.indices(schedule.shape)
+    allowed = instance.action_masks[E, D, schedule].astype(bool)
+    assert (repaired[allowed] == schedule[allowed]).all()
+
+
+@pytest.mark.parametrize("instance", [get_problem_instance(), GENERATED, pinned(GENERATED)], ids=["consts", "generated", "pinned"])
+@pytest.mark.parametrize("weights", [None, EVAL_SHIFT_WEIGHTS], ids=["default", "evalshift"])
+def test_improve_is_consistent(instance, weights):
+    search = LocalSearch(instance, seed=0) if weights is None else LocalSearch(instance, weights=weights, seed=0)
+    # マスクを守っていない初期スケジュールから始める（先に repair で直す）
+    initial = np.random.default_rng(1).integers(0, instance.n_shifts, size=(instance.n_employees, instance.n_days))
+    result = search.improve(initial, time_budget=10.0, max_iters=3000)
+    assert_respects_masks(instance, result.schedule)
+    assert result.penalties == get_penalty_engine(instance).evaluate(result.schedule).tolist()
+    assert result.objective == sum(w * p for w, p in zip(search.weights, result.penalties))
+    assert result.objective <= result.initial_objective
+    assert result.n_iters <= 3000
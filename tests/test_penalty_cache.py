@@ -0,0 +1,79 @@
+import numpy as np
+
+from consts import get_problem_instance
+from consts.instance_generator import generate_instance
+from extra import PenaltyCache, evalShift, generate_population, get_penalties, get_penalty_cache, get_penalty_engine
+from scheduling_env_v2 import SchedulerEnv
+
+INSTANCE = generate_instance(8, 21, n_work_days_choices=(4, 5), seed=5)
+
+
+def test_default_engine_is_shared():
+    engine = get_penalty_engine()
+    assert get_penalty_engine(None) is engine
+    assert get_penalty_engine(get_problem_instance()) is engine
+    assert get_penalty_cache() is get_penalty_cache(engine)
+
+
+def test_eval_shift_and_get_penalties_share_one_entry():
+    engine = get_penalty_engine(INSTANCE)
+    cache = PenaltyCache(engine)
+    individual = np.random.default_rng(0).integers(0, INSTANCE.n_shifts, size=INSTANCE.n_employees * INSTANCE.n_days)
+    expected = engine.evaluate(engine.to_schedule(individual)).tolist()
+
+    # c1 と c4 だけを保存し、penalties() は残りを埋めて同じ項目を使う
+    assert cache.subset(individual, (0, 3)) == (expected[0], expected[3])
+    assert cache.info().misses == 1
+    assert list(cache.penalties(individual)) == expected
+    assert cache.subset(individual, (0, 3)) == (expected[0], expected[3])
+    assert len(cache) == 1
+    assert cache.info().hits == 2
+
+
+def test_population_penalties_match_engine():
+    engine = get_penalty_engine(INSTANCE)
+    cache = PenaltyCache(engine)
+    population = generate_population(6, INSTANCE, rng=1).reshape(6, -1)
+    cache.subset(population[0], (0, 3))
+    cache.penalties(population[1])
+    assert (cache.population_penalties(population) == engine.evaluate_population(population)).all()
+    assert len(cache) == 6
+    assert (cache.population_penalties(population) == engine.evaluate_population(population)).all()
+    assert cache.info().hits == 1 + 6
+
+
+def test_resize_evicts_least_recently_used():
+    engine = get_penalty_engine(INSTANCE)
+    cache = PenaltyCache(engine, maxsize=2)
+    population = generate_population(3, INSTANCE, rng=2).reshape(3, -1)
+    for individual in population:
+        cache.penalties(individual)
+    assert len(cache) == 2
+    cache.penalties(population[1])
+    cache.resize(1)
+    assert cache.info().currsize == 1
+    cache.penalties(population[1])
+    assert cache.info().hits == 2
+    cache.resize(0)
+    cache.penalties(population[0])
+    assert len(cache) == 0
+
+
+def test_env_episode_and_render_hit_the_cache(capsys):
+    env = SchedulerEnv(INSTANCE)
+    cache = get_penalty_cache(env.engine)
+    cache.clear()
+    env.reset()
+    actions = env.action_mask_table.argmax(axis=1).tolist()
+    for step in range(env.total_steps):
+        _, reward, terminated, _, _ = env.step(actions[step])
+    assert terminated
+    assert cache.info().misses == 1
+
+    # 終端で保存した c1 と c4 を render の get_penalties が使う
+    env.render()
+    assert cache.info().misses == 1 and cache.info().hits == 1
+    expected = env.engine.evaluate(env.engine.to_schedule(env.schedule)).tolist()
+    assert get_penalties(env.schedule, engine=env.engine) == expected
+    assert reward == -evalShift(env.schedule, engine=env.engine) == -(expected[0] + expected[3])
+    assert "p7" in capsys.readouterr().out
@@ -0,0 +1,65 @@
+import random
+
+import numpy as np
+import pytest
+
+from consts.instance_generator import generate_instance
+from extra import evalShift, generate_population, get_penalties, get_penalty_engine
+from variables import Variables
+
+
+def reference_penalties(individual: list[int]) -> list[int]:
+    # Variables の count_* による参照実装（consts のインスタンスのみ）
+    v = Variables(individual)
+    return [
+        v.count_assigned_holiday_on_weekdays(),
+        v.count_assigned_not_have_required_skill(),
+        v.count_assinged_shift_on_holiday(),
+        v.count_ignore_cycle(),
+        v.count_ignore_shift_transition_constraint(),
+        v.count_difference_need_and_actual(),
+        v.count_not_assigned_holiday_on_cycle(),
+    ]
+
+
+def random_individual(rng: random.Random, n_cells: int, n_shifts: int) -> list[int]:
+    # 一様な個体、生成した個体を一部壊したもの、使うシフトを絞ったものを混ぜる
+    r = rng.random()
+    if r < 0.3:
+        return [rng.randrange(n_shifts) for _ in range(n_cells)]
+    if r < 0.6:
+        individual = Variables.generate_individual()
+        for _ in range(rng.randrange(10)):
+            individual[rng.randrange(n_cells)] = rng.randrange(n_shifts)
+        return individual
+    shifts = list(range(n_shifts))[: rng.randrange(1, n_shifts + 1)]
+    return [rng.choice(shifts) for _ in range(n_cells)]
+
+
+def test_engine_matches_variables():
+    engine = get_penalty_engine()
+    rng = random.Random(1)
+    n_cells = engine.n_employees * engine.n_days
+    for _ in range(300):
+        individual = random_individual(rng, n_cells, engine.n_shifts)
+        expected = reference_penalties(individual)
+        assert get_penalties(individual) == expected
+        assert engine.evaluate(engine.to_schedule(individual)).tolist() == expected
+        assert evalShift(individual) == expected[0] + expected[3]
+
+
+@pytest.mark.parametrize("chunk_size", [None, 7])
+def test_evaluate_population_matches_evaluate(chunk_size):
+    instance = generate_instance(15, 30, n_work_days_choices=(4, 5), seed=2)
+    engine = get_penalty_engine(instance)
+    rng = np.random.default_rng(0)
+    population = np.concatenate(
+        [
+            generate_population(10, instance, rng=rng).reshape(10, -1),
+            rng.integers(0, instance.n_shifts, size=(10, instance.n_employees * instance.n_days)),
+        ]
+    )
+    penalties = engine.evaluate_population(population, chunk_size=chunk_size)
+    assert penalties.shape == (len(population), 7)
+    for individual, row in zip(population, penalties):
+        assert engine.evaluate(engine.to_schedule(individual)).tolist() == row.tolist()
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from stable_baselines3 import PPO
+
+from consts.instance_generator import generate_instance
+from policy_decoder import PolicyDecoder
+from scheduling_env_v2 import SchedulerEnv
+
+INSTANCE = generate_instance(6, 14, n_work_days_choices=(4, 5), seed=3)
+
+
+@pytest.fixture(scope="module")
+def decoder():
+    # 学習していない方策でも、マスクとペナルティの扱いは確かめられる
+    model = PPO("MultiInputPolicy", SchedulerEnv(INSTANCE), n_steps=64, seed=0, device="cpu")
+    return PolicyDecoder(model, INSTANCE)
+
+
+def assert_consistent(decoder, result):
+    inst = decoder.instance
+    assert result.schedule.shape == (inst.n_employees, inst.n_days)
+    E, D = np.indices(result.schedule.shape)
+    assert inst.action_masks[E, D, result.schedule].all()
+    assert result.penalties == decoder.engine.evaluate(result.schedule).tolist()
+    assert result.objective == int(np.asarray(result.penalties) @ decoder.weights)
+
+
+@pytest.mark.parametrize("beam_width,penalty_weight", [(1, 0.0), (4, 1.0)])
+def test_beam_search(decoder, beam_width, penalty_weight):
+    result = decoder.beam_search(beam_width=beam_width, penalty_weight=penalty_weight)
+    assert_consistent(decoder, result)
+    assert 1 <= result.n_candidates <= beam_width
+    assert result.n_pruned == 0
+
+
+@pytest.mark.parametrize("upper_bound", [0, -1])
+def test_beam_search_with_unreachable_upper_bound(decoder, upper_bound):
+    # 有効な候補がすべて下界で捨てられる場合でも、下界で順位づけした候補から結果を返す
+    result = decoder.beam_search(beam_width=4, upper_bound=upper_bound)
+    assert_consistent(decoder, result)
+    assert result.n_candidates >= 1
+
+
+def test_sample(decoder):
+    result = decoder.sample(n_samples=8, seed=0)
+    assert_consistent(decoder, result)
+    assert result.n_candidates == 8
+    assert (decoder.sample(n_samples=8, seed=0).schedule == result.schedule).all()
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+import torch
+from stable_baselines3 import PPO
+
+from consts.instance_generator import generate_instance
+from policy_export import export_policy
+from policy_runner import ENV_CLASSES, PolicyRunner
+
+INSTANCE = generate_instance(6, 14, n_work_days_choices=(4, 5), seed=3)
+CASES = [("torchscript", "cell", False), ("torchscript", "cell", True), ("torchscript", "cycle", False), ("onnx", "cell", False), ("onnx", "cell", True)]
+
+
+def make_env(action_mode, rich_observation):
+    env_class = ENV_CLASSES[action_mode]
+    return env_class(INSTANCE, rich_observation=True) if rich_observation else env_class(INSTANCE)
+
+
+def predict_episode(model, env) -> np.ndarray:
+    # model.predict（マスクなし、決定的）で1エピソード進めたシフト表
+    obs, _ = env.reset()
+    done = False
+    while not done:
+        action, _ = model.predict(obs, deterministic=True)
+        obs, _, terminated, truncated, info = env.step(int(action))
+        done = terminated or truncated
+    return info["schedule"]
+
+
+@pytest.mark.parametrize("fmt,action_mode,rich_observation", CASES)
+def test_export_round_trip(tmp_path, fmt, action_mode, rich_observation):
+    if fmt == "onnx":
+        pytest.importorskip("onnx")
+        pytest.importorskip("onnxruntime")
+    model = PPO("MultiInputPolicy", make_env(action_mode, rich_observation), n_steps=64, seed=0, device="cpu")
+    path = str(tmp_path / f"policy.{fmt}")
+    meta = export_policy(model, path, fmt, action_mode, rich_observation)
+    runner = PolicyRunner(path, INSTANCE)
+    assert runner.meta == meta
+
+    # 書き出した方策の行動確率が元の方策と同じ
+    obs = runner.observation_batch()
+    with torch.no_grad():
+        obs_tensor, _ = model.policy.obs_to_tensor(obs)
+        expected = model.policy.get_distribution(obs_tensor).distribution.logits.numpy()
+    actual = torch.log_softmax(torch.from_numpy(runner.logits(obs)), dim=1).numpy()
+    assert np.abs(actual - expected).max() < 1e-4
+
+    # マスクなしの決定的なロールアウトは model.predict と同じシフト表になる
+    assert (runner.rollout(masked=False)[0] == predict_episode(model, make_env(action_mode, rich_observation))).all()
+
+    # マスクありなら選択可能なシフトだけを使い、ペナルティは PenaltyEngine と一致する
+    result = runner.run(n_samples=4, deterministic=False, seed=0)
+    E, D = np.indices(result.schedule.shape)
+    assert INSTANCE.action_masks[E, D, result.schedule].all()
+    assert result.penalties == runner.engine.evaluate(result.schedule).tolist()
+
+
+def test_runner_rejects_other_instance_shapes(tmp_path):
+    model = PPO("MultiInputPolicy", make_env("cell", False), n_steps=64, seed=0, device="cpu")
+    path = str(tmp_path / "policy.pt")
+    export_policy(model, path)
+    runner = PolicyRunner(path, INSTANCE)
+    with pytest.raises(ValueError):
+        runner.for_instance(generate_instance(6, 14, n_shifts=5, seed=3))
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from consts import get_problem_instance
+from consts.instance_generator import generate_instance
+from extra import generate_population, get_penalty_engine
+
+INSTANCES = [get_problem_instance(), generate_instance(8, 21, n_work_days_choices=(4, 5), seed=7), generate_instance(20, 60, seed=3)]
+
+
+@pytest.mark.parametrize("instance", INSTANCES, ids=["consts", "generated", "large"])
+def test_individuals_respect_masks_and_rules(instance):
+    population = generate_population(50, instance, rng=0)
+    assert population.shape == (50, instance.n_employees, instance.n_days)
+    E, D = np.indices(population.shape[1:])
+    for individual in population:
+        assert instance.action_masks[E, D, individual].all()
+    # 人数制限（p6）以外は生成の規則で満たされる
+    penalties = get_penalty_engine(instance).evaluate_population(population)
+    assert (np.delete(penalties, 5, axis=1) == 0).all()
+
+
+def test_seed_and_dtype():
+    instance = INSTANCES[1]
+    population = generate_population(10, instance, rng=3, dtype=np.uint8)
+    assert population.dtype == np.uint8
+    assert (population == generate_population(10, instance, rng=3)).all()
+    assert not (population == generate_population(10, instance, rng=4)).all()
+    # 個体ごとに異なる個体を作る
+    assert len(np.unique(population.reshape(10, -1), axis=0)) > 1
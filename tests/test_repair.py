@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from consts.instance_generator import generate_instance
+from extra import LocalSearch, ScheduleRepair, generate_population, get_penalty_engine
+
+INSTANCE = generate_instance(10, 28, n_work_days_choices=(4, 5), seed=8)
+
+
+@pytest.fixture(scope="module")
+def schedule():
+    # ペナルティが 0 の（最適な）シフト表から始める
+    initial = generate_population(1, INSTANCE, rng=0)[0]
+    result = LocalSearch(INSTANCE, seed=0).improve(initial, time_budget=10.0, max_iters=20000)
+    assert result.objective == 0
+    return result.schedule
+
+
+def working_cells(schedule, n: int, seed: int) -> list[tuple[int, int]]:
+    rng = np.random.default_rng(seed)
+    cells = np.argwhere(schedule != INSTANCE.rest_shift_idx)
+    return [tuple(int(x) for x in cells[i]) for i in rng.choice(len(cells), size=n, replace=False)]
+
+
+def test_no_absence_changes_nothing(schedule):
+    repairer = ScheduleRepair(INSTANCE, seed=0)
+    result = repairer.repair(schedule, repairer.absences([]))
+    assert (result.schedule == schedule).all()
+    assert result.changes == [] and result.absent_cells == [] and result.n_free_cells == 0
+    assert result.objective == result.initial_objective == 0
+
+
+def test_high_change_cost_only_rests_absent_cells(schedule):
+    # 変更のコストがどのペナルティの改善よりも大きければ、欠勤のセル以外は変えない
+    cells = working_cells(schedule, 3, seed=1)
+    repairer = ScheduleRepair(INSTANCE, change_weight=1e9, seed=0)
+    absences = repairer.absences([(INSTANCE.employees[e].id, INSTANCE.days[d]) for e, d in cells])
+    result = repairer.repair(schedule, absences)
+    expected = schedule.copy()
+    for e, d in cells:
+        expected[e, d] = INSTANCE.rest_shift_idx
+    assert sorted(result.absent_cells) == sorted(cells)
+    assert result.changes == []
+    assert (result.schedule == expected).all()
+
+
+def test_repair_is_local_and_consistent(schedule):
+    cells = working_cells(schedule, 2, seed=2)
+    repairer = ScheduleRepair(INSTANCE, seed=0)
+    absences = repairer.absences([(INSTANCE.employees[e].id, INSTANCE.days[d].to_date().isoformat()) for e, d in cells])
+    result = repairer.repair(schedule, absences, time_budget=5.0)
+
+    for e, d in cells:
+        assert result.schedule[e, d] == INSTANCE.rest_shift_idx
+    # 欠勤で休みにしたセル以外は選択可能なシフト
+    E, D = np.indices(schedule.shape)
+    assert INSTANCE.action_masks[E, D, result.schedule][~absences].all()
+    assert result.penalties == get_penalty_engine(INSTANCE).evaluate(result.schedule).tolist()
+    assert result.objective <= result.initial_objective
+    # 変えたセルは、欠勤の日を含むサイクルの日と重なるセルだけ
+    changed = (result.schedule != schedule) & ~absences
+    assert len(result.changes) == int(np.count_nonzero(changed)) <= result.n_free_cells
+    cycle_id = get_penalty_engine(INSTANCE).cycle_id
+    affected_days = np.zeros(INSTANCE.n_days, dtype=bool)
+    for e, d in cells:
+        affected_days |= cycle_id[e] == cycle_id[e, d]
+    for e, d, old_shift, new_shift in result.changes:
+        assert old_shift == schedule[e, d] and new_shift == result.schedule[e, d]
+        assert affected_days[cycle_id[e] == cycle_id[e, d]].any()
+
+
+def test_absences_rejects_unknown_cells():
+    repairer = ScheduleRepair(INSTANCE)
+    with pytest.raises(ValueError):
+        repairer.absences([("nobody", INSTANCE.days[0])])
+    with pytest.raises(ValueError):
+        repairer.absences([(INSTANCE.employees[0].id, "1999-01-01")])
@@ -0,0 +1,44 @@
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from consts.instance_loader import read_spec
+from extra.rolling_horizon import RollingHorizonScheduler
+
+DEFAULT_SPEC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instances", "default.json")
+
+
+def work_days_by_date(result) -> dict[tuple[int, date], bool]:
+    # 期間のウィンドウの (社員, 日付) -> 労働日か
+    instance = result.instance
+    return {(e, d.to_date()): bool(instance.work_day_mask[e, i]) for e in range(instance.n_employees) for i, d in enumerate(instance.days)}
+
+
+@pytest.mark.parametrize("with_cycle_start", [True, False])
+def test_work_rest_pattern_is_continuous_across_periods(with_cycle_start):
+    spec = read_spec(DEFAULT_SPEC)
+    if not with_cycle_start:
+        spec["employees"] = [{key: value for key, value in emp.items() if key != "cycle_start"} for emp in spec["employees"]]
+    scheduler = RollingHorizonScheduler(spec, time_budget=0.1, seed=0)
+    results = scheduler.run(date(2024, 4, 1), 10, 3)
+
+    # 通しの期間で作ったインスタンスの労働日と、各ウィンドウの労働日が同じ日付で一致する
+    whole = scheduler.window_instance(date(2024, 4, 1), 30)
+    expected = {(e, d.to_date()): bool(whole.work_day_mask[e, i]) for e in range(whole.n_employees) for i, d in enumerate(whole.days)}
+    for result in results:
+        for key, is_work_day in work_days_by_date(result).items():
+            if key in expected:
+                assert is_work_day == expected[key], key
+
+
+def test_carried_days_are_pinned():
+    scheduler = RollingHorizonScheduler.from_file(DEFAULT_SPEC, time_budget=0.1, seed=0)
+    first, second = scheduler.run(date(2024, 4, 1), 10, 2)
+    n_context = first.carry.n_days
+    assert first.carry.start == date(2024, 4, 1) + timedelta(days=10 - first.carry.n_days)
+    shift_idx = {s.id: i for i, s in enumerate(second.instance.shifts)}
+    carried = np.array([[shift_idx[s] for s in row] for row in first.carry.shift_ids])
+    assert (second.instance.fixed_shifts[:, :n_context] == carried).all()
+    assert (first.schedule[:, -n_context:] == carried).all()
@@ -0,0 +1,53 @@
+import asyncio
+import os
+
+import pytest
+
+from scheduler_service import SchedulerService, request, serve
+
+DEFAULT_SPEC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instances", "default.json")
+
+
+async def post_schedules(payloads: list[dict]) -> list[tuple[int, dict]]:
+    service = SchedulerService(seed=0, max_samples=8)
+    service.preload(DEFAULT_SPEC, name="default")
+    server = await serve(service, port=0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        return [await request("127.0.0.1", port, "POST", "/schedule", payload) for payload in payloads]
+    finally:
+        server.close()
+        await server.wait_closed()
+        await service.stop()
+
+
+def test_valid_requests():
+    responses = asyncio.run(
+        post_schedules(
+            [
+                {"instance": "default"},
+                {"instance": "default", "n_samples": 8, "deterministic": False},
+            ]
+        )
+    )
+    for status, body in responses:
+        assert status == 200
+        assert len(body["penalties"]) == 7
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"instance": "default", "deterministic": "false"},
+        {"instance": "default", "deterministic": 0},
+        {"instance": "default", "n_samples": True},
+        {"instance": "default", "n_samples": 0},
+        {"instance": "default", "n_samples": 9},
+        {"instance": "default", "n_samples": 2.0},
+        {"instance": "unknown"},
+    ],
+)
+def test_invalid_requests_are_rejected(payload):
+    [(status, body)] = asyncio.run(post_schedules([payload]))
+    assert status == 400
+    assert "error" in body
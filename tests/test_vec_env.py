@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from consts.instance_generator import generate_instance
+from scheduling_cycle_env import SchedulerCycleEnv
+from scheduling_env_v2 import SchedulerEnv
+from scheduling_vec_env import SchedulerVecEnv
+
+CASES = [
+    (None, SchedulerEnv, False),
+    (None, SchedulerEnv, True),
+    (None, SchedulerCycleEnv, False),
+    ("generated", SchedulerEnv, True),
+    ("generated", SchedulerCycleEnv, False),
+]
+
+
+def make_env(instance, env_class, rich_observation):
+    return env_class(instance, rich_observation=True) if rich_observation else env_class(instance)
+
+
+@pytest.mark.parametrize("instance_name,env_class,rich_observation", CASES)
+def test_vec_env_matches_single_envs(instance_name, env_class, rich_observation):
+    instance = None if instance_name is None else generate_instance(8, 21, n_work_days_choices=(4, 5), seed=4)
+    K = 3
+    vec_env = SchedulerVecEnv(K, instance, env_class=env_class, rich_observation=rich_observation)
+    envs = [make_env(instance, env_class, rich_observation) for _ in range(K)]
+    vec_obs = vec_env.reset()
+    obs = [env.reset()[0] for env in envs]
+    rng = np.random.default_rng(0)
+
+    # 2エピソード強を進め、自動リセットも含めて1ステップずつ比べる
+    for _ in range(2 * vec_env.total_steps + 3):
+        for k in range(K):
+            for key in obs[k]:
+                assert (vec_obs[key][k] == obs[k][key]).all(), key
+        # マスクの外の行動も混ぜる
+        actions = rng.integers(0, vec_env.action_space.n, size=K)
+        vec_obs, rewards, dones, infos = vec_env.step(actions)
+        for k, env in enumerate(envs):
+            obs[k], reward, terminated, truncated, info = env.step(int(actions[k]))
+            done = terminated or truncated
+            assert rewards[k] == reward
+            assert dones[k] == done
+            if done:
+                assert (infos[k]["schedule"] == info["schedule"]).all()
+                for key in obs[k]:
+                    assert (infos[k]["terminal_observation"][key] == obs[k][key]).all(), key
+                obs[k], _ = env.reset()
+
+
+def test_rich_observation_is_rejected_for_cycle_env():
+    with pytest.raises(ValueError):
+        SchedulerCycleEnv(rich_observation=True)
+    with pytest.raises(ValueError):
+        SchedulerVecEnv(2, env_class=SchedulerCycleEnv, rich_observation=True)
+
+
+def test_rich_observation_coverage_counts_assigned_shifts():
+    env = SchedulerEnv(rich_observation=True)
+    obs, _ = env.reset()
+    rng = np.random.default_rng(1)
+    for step in range(env.total_steps):
+        # 個体は社員ごとに日が並ぶので、これまでに書いたセルのうち同じ日のもの
+        same_day = np.arange(step) % env.n_days == env.state_table[step, 1]
+        counts = np.bincount(env.schedule[:step][same_day], minlength=env.n_shifts)
+        assert (obs["coverage"] == counts).all()
+        assert obs["coverage"].dtype == np.int32 and not obs["coverage"].flags.writeable
+        obs, *_ = env.step(int(rng.integers(env.n_shifts)))
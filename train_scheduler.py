@@ -1,40 +1,218 @@
+import argparse
+import glob
+import json
+import multiprocessing as mp
+import os
+import time
+
+import pandas as pd
 from scheduling_env_v2 import SchedulerEnv
+from scheduling_cycle_env import SchedulerCycleEnv
+from scheduling_vec_env import SchedulerVecEnv
+from consts import get_problem_instance, load_problem_instance
+from extra import Profiler, get_penalty_engine, profiler
 from stable_baselines3 import PPO, A2C
-from stable_baselines3.common.callbacks import EvalCallback, StopTrainingOnRewardThreshold
+from stable_baselines3.common.callbacks import BaseCallback, CallbackList, EvalCallback, StopTrainingOnRewardThreshold
 from stable_baselines3.common.monitor import Monitor
+from stable_baselines3.common.vec_env import SubprocVecEnv, VecMonitor
+
+ALGOS = {"a2c": A2C, "ppo": PPO}
+
+# cell: 1ステップで1セル / cycle: 1ステップで社員の1サイクルの勤務日
+ENV_CLASSES = {"cell": SchedulerEnv, "cycle": SchedulerCycleEnv}
+
+
+def make_env(rank: int, monitor_dir: str, instance_path: str | None = None, env_class: type[SchedulerEnv] = SchedulerEnv, env_kwargs: dict | None = None):
+    """
+    SubprocVecEnv のワーカーで環境を作る関数を返します
+    Monitor の出力はワーカーごとに monitor_dir/<rank>.monitor.csv に書く
+    instance_path を指定すると、その仕様ファイルの問題インスタンスを使う（ワーカーではキャッシュの .npz を読むだけ）
+    """
+
+    def _init():
+        instance = None if instance_path is None else load_problem_instance(instance_path)
+        env = env_class(instance, **(env_kwargs or {}))
+        return Monitor(env, os.path.join(monitor_dir, str(rank)), allow_early_resets=True)
+
+    return _init
+
+
+def merge_monitor_logs(monitor_dir: str, output_path: str) -> pd.DataFrame:
+    """
+    ワーカーごとの Monitor の出力を時刻順に1つにまとめ、Monitor と同じ形式で書き出します
+    """
+    data_frames, t_starts = [], []
+    for file_name in sorted(glob.glob(os.path.join(monitor_dir, f"*{Monitor.EXT}"))):
+        with open(file_name) as f:
+            header = json.loads(f.readline()[1:])
+            data_frame = pd.read_csv(f, index_col=None)
+        data_frame["t"] += header["t_start"]
+        data_frames.append(data_frame)
+        t_starts.append(header["t_start"])
+
+    if not data_frames:
+        return pd.DataFrame(columns=["r", "l", "t"])
+
+    t_start = min(t_starts)
+    merged = pd.concat(data_frames).sort_values("t")
+    merged["t"] -= t_start
+    with open(output_path, "w") as f:
+        f.write("#" + json.dumps({"t_start": t_start, "env_id": "SchedulerEnv"}) + "\n")
+        merged.to_csv(f, index=False)
+    return merged
+
+
+class ProfilingCallback(BaseCallback):
+    """
+    ロールアウト（環境を進める部分）と方策の更新の時間を profiler に記録し、
+    ロールアウトごとに全プロセスの計測値を SB3 の logger（TensorBoard など）に "profile/" として書き、
+    学習終了時に csv_path に書き出すコールバック
+    """
+
+    def __init__(self, csv_path: str, collect_workers: bool = False, verbose: int = 0):
+        super().__init__(verbose)
+        self.csv_path = csv_path
+        self.collect_workers = collect_workers
+        self._rollout_start = None
+        self._rollout_end = None
+
+    def _on_rollout_start(self) -> None:
+        self._rollout_start = time.perf_counter()
+        if self._rollout_end is not None:
+            profiler.record("train.update", self._rollout_start - self._rollout_end)
+
+    def _on_step(self) -> bool:
+        return True
+
+    def _on_rollout_end(self) -> None:
+        self._rollout_end = time.perf_counter()
+        profiler.record("train.rollout", self._rollout_end - self._rollout_start)
+        for name, (count, total) in self.collect().items():
+            # 項目が多く標準出力の表は崩れるので、TensorBoard などにだけ書く
+            self.logger.record(f"profile/{name}/count", count, exclude="stdout")
+            self.logger.record(f"profile/{name}/total_s", total, exclude="stdout")
+
+    def _on_training_end(self) -> None:
+        snapshot = self.collect()
+        profiler.to_csv(self.csv_path, snapshot)
+        if self.verbose > 0:
+            print(profiler.summary(snapshot))
+
+    def collect(self) -> dict[str, tuple[int, float]]:
+        # SubprocVecEnv のときはワーカーで計測した分も足し合わせる
+        snapshots = [profiler.snapshot()]
+        if self.collect_workers:
+            snapshots += self.training_env.env_method("get_profile")
+        return Profiler.combine(snapshots)
+
+
+def env_kwargs(args) -> dict:
+    # rich_observation は SchedulerEnv（--action-mode cell）のみ
+    return {"rich_observation": True} if args.rich_obs else {}
+
+
+def load_instance(args):
+    # --instance がなければ consts の問題インスタンスを使う
+    return None if args.instance is None else load_problem_instance(args.instance)
+
+
+def build_train_env(args):
+    if args.vec_env == "native":
+        # 1プロセスで全環境をまとめて進める
+        vec_env = SchedulerVecEnv(args.n_envs, load_instance(args), env_class=ENV_CLASSES[args.action_mode], **env_kwargs(args))
+        return VecMonitor(vec_env, os.path.join(args.log_dir, "monitor.csv"))
+
+    # 問題インスタンスは親プロセスで一度読み込んでキャッシュの .npz を作っておき、
+    # consts のインスタンスと評価エンジンは fork で起動したワーカーがそのメモリをそのまま共有する
+    if args.instance is None:
+        get_problem_instance()
+        get_penalty_engine()
+    else:
+        load_instance(args)
+    start_method = "fork" if "fork" in mp.get_all_start_methods() else None
+    monitor_dir = os.path.join(args.log_dir, "workers")
+    os.makedirs(monitor_dir, exist_ok=True)
+    return SubprocVecEnv([make_env(rank, monitor_dir, args.instance, ENV_CLASSES[args.action_mode], env_kwargs(args)) for rank in range(args.n_envs)], start_method=start_method)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--algo", choices=list(ALGOS), default="a2c")
+    parser.add_argument("--instance", default=None, help="問題インスタンスの仕様ファイル（.json / .yaml）。省略時は consts の定義を使う")
+    parser.add_argument("--action-mode", choices=list(ENV_CLASSES), default="cell", help="cell: 1ステップで1セル / cycle: 1ステップで社員の1サイクルの勤務日をまとめて決める")
+    parser.add_argument("--rich-obs", action="store_true", help="観測にその日のシフトごとの人数と前・今のサイクルのシフトを加える（--action-mode cell のみ）")
+    parser.add_argument("--device", default="cpu", help='"cpu"（既定）、"cuda" など')
+    parser.add_argument("--n-envs", type=int, default=os.cpu_count(), help="並列に動かす環境（ワーカー）の数")
+    parser.add_argument("--vec-env", choices=["subproc", "native"], default="subproc", help="subproc: 環境ごとにプロセスを分ける / native: SchedulerVecEnv")
+    parser.add_argument("--total-timesteps", type=int, default=20000)
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--model-path", default="nurse_scheduling/logs/ppo_scheduling.zip")
+    parser.add_argument("--profile", action="store_true", help="制約・環境・ロールアウトごとの時間を計測し、<log-dir>/profile.csv に書き出す")
+    parser.add_argument("--tensorboard-log", default=None, help="TensorBoard のログを書き出すディレクトリ（--profile の値も書く）")
+    args = parser.parse_args()
+    if args.rich_obs and args.action_mode != "cell":
+        parser.error("--rich-obs は --action-mode cell のときのみ指定できます")
+    return args
+
 
 if __name__ == "__main__":
+    args = parse_args()
+    os.makedirs(args.log_dir, exist_ok=True)
+
+    # 計測はワーカーを起動する前に有効にしておく（fork したワーカーにも引き継がれる）
+    if args.profile:
+        profiler.enable()
+
     # 環境を作成
-    env = SchedulerEnv()
-    env = Monitor(env, "logs", allow_early_resets=True)
+    env = build_train_env(args)
 
     # 例：エピソードごとに報酬がある閾値に達したら学習終了
     stop_callback = StopTrainingOnRewardThreshold(reward_threshold=0, verbose=1)
 
     # 学習用の評価環境（学習中のベストモデル保存）
-    eval_env = SchedulerEnv()
-    eval_callback = EvalCallback(eval_env, best_model_save_path="logs", log_path="logs", callback_on_new_best=stop_callback)
+    # eval_freq は環境1つあたりのステップ数なので、並列数で割っておく
+    instance = load_instance(args)
+    env_class = ENV_CLASSES[args.action_mode]
+    eval_env = Monitor(env_class(instance, **env_kwargs(args)))
+    eval_callback = EvalCallback(
+        eval_env,
+        best_model_save_path=args.log_dir,
+        log_path=args.log_dir,
+        eval_freq=max(10000 // args.n_envs, 1),
+        callback_on_new_best=stop_callback,
+    )
+
+    callbacks = [eval_callback]
+    if args.profile:
+        callbacks.append(ProfilingCallback(os.path.join(args.log_dir, "profile.csv"), collect_workers=args.vec_env == "subproc", verbose=1))
 
     # エージェント
-    model = A2C("MultiInputPolicy", env, verbose=1, device="cuda")
+    model = ALGOS[args.algo]("MultiInputPolicy", env, verbose=1, device=args.device, tensorboard_log=args.tensorboard_log)
 
     # 学習
-    model.learn(total_timesteps=20000, callback=eval_callback, progress_bar=True)
+    model.learn(total_timesteps=args.total_timesteps, callback=CallbackList(callbacks), progress_bar=True)
+    env.close()
 
-    model.save("nurse_scheduling/logs/ppo_scheduling.zip")
-    print("モデルを ppo_scheduling.zip に保存しました。")
+    if args.vec_env == "subproc":
+        merged = merge_monitor_logs(os.path.join(args.log_dir, "workers"), os.path.join(args.log_dir, "monitor.csv"))
+        print(f"{len(merged)} エピソード分の Monitor ログを {args.log_dir}/monitor.csv にまとめました。")
+
+    os.makedirs(os.path.dirname(args.model_path) or ".", exist_ok=True)
+    model.save(args.model_path)
+    print(f"モデルを {args.model_path} に保存しました。")
 
     # 学習終了後，テストエピソードを１回実行して結果表示
-    obs, _ = env.reset()
+    test_env = env_class(instance, **env_kwargs(args))
+    obs, _ = test_env.reset()
     done = False
     total_reward = 0
     while not done:
         # 学習済み方策から行動決定 (deterministic=True を指定してもよい)
         action, _ = model.predict(obs)
-        obs, reward, terminated, truncated, info = env.step(action)
+        obs, reward, terminated, truncated, info = test_env.step(action)
         done = terminated or truncated
         total_reward += reward
-        print("Total reward:", total_reward)
+    print("Total reward:", total_reward)
 
-    env.render()
-    env.close()
+    test_env.render()
+    test_env.close()
@@ -1,30 +1,30 @@
 import random
-from consts import Condition, Day, Employee, Shift
+from consts import Condition, ProblemInstance, Shift, get_problem_instance
 
 
 class Variables:
     def __init__(self, indivisual_list: list[int] = None):
+        self.instance = get_problem_instance()
         if indivisual_list is None:
-            self.ind_list = self.get_random_list()
+            self.ind_list = self.set_random_list()
         else:
             self.ind_list = indivisual_list
 
         index = 0
         self._shift_idx_var_dict: dict[Condition, Shift] = {}
-        for e in Employee.get_instances():
-            for d in Day.get_instances():
+        for e in self.instance.employees:
+            for d in self.instance.days:
                 c = Condition(employee=e, day=d)
-                self._shift_idx_var_dict[c] = Shift.from_idx(indivisual_list[index])
+                self._shift_idx_var_dict[c] = self.instance.shifts[self.ind_list[index]]
                 index += 1
 
     def set_random_list(self) -> list[int]:
         ind_random = []
-        shift_list = Shift.get_instances()
+        n_shifts = self.instance.n_shifts
 
-        for e in Employee.get_instances():
-            for d in Day.get_instances():
-                shift = random.choice(shift_list)
-                ind_random.append(shift.idx)
+        for e in self.instance.employees:
+            for d in self.instance.days:
+                ind_random.append(random.randrange(n_shifts))
 
         return ind_random
 
@@ -42,92 +42,86 @@ class Variables:
 
     # indivisual初期値
     @classmethod
-    def generate_individual(cls) -> list[int]:
+    def generate_individual(cls, instance: ProblemInstance | None = None) -> list[int]:
+        instance = get_problem_instance() if instance is None else instance
         individual = []
-        forbidden_trans = Shift.get_forbidden_transitions()
+        rest = instance.rest_shift_idx
 
-        for e in Employee.get_instances():
+        for e_idx in range(instance.n_employees):
             # NGシフトでないかつ休みでないシフトを選ぶ
-            ok_shift = []
-            for s in Shift.get_instances():
-                if s in e.forbidden_shifts:
-                    continue
-                if s in e.skill.forbidden_shifts:
-                    continue
-                if s == Shift.init("O"):
-                    continue
-                ok_shift.append(s)
+            ok_shift = [s for s in range(instance.n_shifts) if not instance.forbidden_mask[e_idx, s] and s != rest]
 
             if not ok_shift:
-                raise Exception(f"利用可能なシフトがありません：{e}")
+                raise Exception(f"利用可能なシフトがありません：{instance.employees[e_idx]}")
 
             app_shift = random.choice(ok_shift)
-            for d in Day.get_instances():
-                if e.work_cycle.check_is_cycle_end(current_day=d, pattern="rest_to_rest"):
+            for d_idx in range(instance.n_days):
+                if instance.cycle_end_rest_to_rest[e_idx, d_idx]:
                     # シフト遷移NGでないものの中から次のシフトを選ぶ
-                    forbidden_shifts = [pair[1] for pair in forbidden_trans if pair[0] == app_shift]
-                    app_ok_shift = [shift for shift in ok_shift if shift not in forbidden_shifts]
+                    app_ok_shift = [shift for shift in ok_shift if not instance.forbidden_transitions[app_shift, shift]]
                     app_shift = random.choice(app_ok_shift)
 
-                if e.work_cycle.check_is_rest_day(d):
+                if instance.rest_day_mask[e_idx, d_idx]:
                     # 休みの日は休もう
-                    individual.append(Shift.init(id="O").idx)
+                    individual.append(rest)
                     continue
 
-                individual.append(app_shift.idx)
+                individual.append(app_shift)
         return individual
 
     """or-toolsと同じ制約を下記で定義"""
 
     def count_assigned_holiday_on_weekdays(self):
         # 勤務日に割り当てられた休みをカウント(本当は割り当ててほしくない)
+        inst = self.instance
         count = 0
-        for e in Employee.get_instances():
-            for d in Day.get_instances():
+        for e_idx, e in enumerate(inst.employees):
+            for d_idx, d in enumerate(inst.days):
                 c = Condition(employee=e, day=d)
-                if e.work_cycle.check_is_work_day(current_day=d):
-                    if self.get_appshift(c) == Shift.init(id="O"):
+                if inst.work_day_mask[e_idx, d_idx]:
+                    if self.get_appshift(c) == inst.rest_shift:
                         count += 1
         return count
 
     def count_assigned_not_have_required_skill(self):
         # 必要なスキルを持っていない人が割り当てられた回数をカウント(本当は割り当ててほしくない)
+        inst = self.instance
         count = 0
-        for e in Employee.get_instances():
-            for d in Day.get_instances():
+        for e_idx, e in enumerate(inst.employees):
+            for d_idx, d in enumerate(inst.days):
                 c = Condition(employee=e, day=d)
-                if not e.work_cycle.check_is_work_day(current_day=d):
+                if not inst.work_day_mask[e_idx, d_idx]:
                     continue
 
-                for s_forbidden in e.skill.forbidden_shifts:
-                    if self.get_appshift(c) == s_forbidden:
-                        count += 1
+                if inst.skill_forbidden[e_idx, inst.shift_idx[self.get_appshift(c)]]:
+                    count += 1
         return count
 
     def count_assinged_shift_on_holiday(self):
         # 休日にシフトが割り当てられている数をカウント
+        inst = self.instance
         count = 0
-        for e in Employee.get_instances():
-            for d in Day.get_instances():
+        for e_idx, e in enumerate(inst.employees):
+            for d_idx, d in enumerate(inst.days):
                 c = Condition(employee=e, day=d)
-                # if not e.work_cycle.check_is_cycle_end(current_day=d):
-                if not e.work_cycle.check_is_rest_day(current_day=d):
+                if not inst.rest_day_mask[e_idx, d_idx]:
                     continue
 
-                if self.get_appshift(c) != Shift.init(id="O"):
+                if self.get_appshift(c) != inst.rest_shift:
                     count += 1
         return count
 
     def count_ignore_cycle(self):
         # 1サイクルで1シフトの制約を無視した回数をカウント
+        inst = self.instance
         count = 0
-        for e in Employee.get_instances():
+        for e_idx, e in enumerate(inst.employees):
             shifts_in_cycle = set()
-            for d in Day.get_instances():
+            for d_idx, d in enumerate(inst.days):
                 c = Condition(employee=e, day=d)
-                shifts_in_cycle.add(self.get_appshift(c).idx)
+                shifts_in_cycle.add(inst.shift_idx[self.get_appshift(c)])
 
-                if not (e.work_cycle.check_is_cycle_end(current_day=d, pattern="rest_to_rest") or d.is_final_day):
+                if not (inst.cycle_end_rest_to_rest[e_idx, d_idx] or d_idx == inst.n_days - 1):
                     continue
 
                 if len(shifts_in_cycle) > 1:
@@ -139,18 +133,20 @@ class Variables:
 
     def count_ignore_shift_transition_constraint(self):
         # シフトの遷移制限を無視した回数をカウントする(先週のシフトと今週のシフトが遷移NGの場合、カウント＋)
+        inst = self.instance
+        forbidden_transitions = [(inst.shifts[p], inst.shifts[c]) for p, c in zip(*inst.forbidden_transitions.nonzero())]
         count = 0
-        for e in Employee.get_instances():
+        for e_idx, e in enumerate(inst.employees):
             shift_in_cycle = []
             shift_in_cycle_prev = []
-            for d in Day.get_instances():
+            for d_idx, d in enumerate(inst.days):
                 c = Condition(employee=e, day=d)
                 day_shift = self.get_appshift(c)
-                if day_shift == Shift.init(id="O"):
+                if day_shift == inst.rest_shift:
                     continue
                 shift_in_cycle.append(day_shift)
 
-                if not (e.work_cycle.check_is_cycle_end(current_day=d, pattern="rest_to_rest") or d.is_final_day):
+                if not (inst.cycle_end_rest_to_rest[e_idx, d_idx] or d_idx == inst.n_days - 1):
                     continue
 
                 if not shift_in_cycle_prev:
@@ -159,7 +155,7 @@ class Variables:
                     shift_in_cycle.clear()
                     continue
 
-                for s_previous, s_currenct in Shift.get_forbidden_transitions():
+                for s_previous, s_currenct in forbidden_transitions:
                     if shift_in_cycle_prev.count(s_previous) > 0 and shift_in_cycle.count(s_currenct) > 0:
                         count += shift_in_cycle.count(s_currenct)
 
@@ -170,49 +166,51 @@ class Variables:
 
     def count_difference_need_and_actual(self):
         # 各シフトの人数制限と割り当てられた人数の差分を取得する
+        inst = self.instance
         result = []
 
-        for d in Day.get_instances():
-            if d.is_weekend:
+        for d_idx, d in enumerate(inst.days):
+            if inst.weekend[d_idx]:
                 continue
 
-            for s in Shift.get_instances():
-                if s == Shift.init(id="O"):
+            for s_idx, s in enumerate(inst.shifts):
+                if s_idx == inst.rest_shift_idx:
                     continue
 
                 warker = 0
-                for e in Employee.get_instances():
+                for e in inst.employees:
                     c = Condition(employee=e, day=d)
                     if self.get_appshift(c) == s:
                         warker += 1
 
                 # 割り当てられた従業員数がmaxとminの間に入っていなければペナルティ
                 penalty = 0
-                min_warker = s.min_worker
-                max_warker = s.max_worker
+                min_warker = inst.min_worker[s_idx]
+                max_warker = inst.max_worker[s_idx]
 
                 if warker < min_warker:
                     penalty = min_warker - warker
                 elif warker > max_warker:
                     penalty = warker - max_warker
 
-                result.append(penalty)
+                result.append(int(penalty))
 
         return sum(result)
 
     def count_not_assigned_holiday_on_cycle(self):
         # 1サイクルで1日以上休みがない人数をカウント
+        inst = self.instance
         count = 0
-        for e in Employee.get_instances():
+        for e_idx, e in enumerate(inst.employees):
             shift_in_cycle = []
-            for d in Day.get_instances():
+            for d_idx, d in enumerate(inst.days):
                 c = Condition(employee=e, day=d)
                 shift_in_cycle.append(self.get_appshift(c))
 
-                if not e.work_cycle.check_is_cycle_end(current_day=d, pattern="work_to_rest"):
+                if not inst.cycle_end_work_to_rest[e_idx, d_idx]:
                     continue
 
-                if shift_in_cycle.count(Shift.init(id="O")) < 1:
+                if shift_in_cycle.count(inst.rest_shift) < 1:
                     count += 1
 
                 shift_in_cycle.clear()